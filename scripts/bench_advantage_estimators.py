@@ -0,0 +1,100 @@
+# Copyright 2024  Ltd. and/or its affiliates
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Microbenchmark of the group-based outcome advantage estimators in verl/trainer/ppo/core_algos.py
+against the per-sample loop implementations they replaced (kept as references in
+tests/trainer/ppo/test_core_algos_on_cpu.py), for batches of `--batch_sizes` responses in groups of
+`--group_size` (rollout.n).
+
+Usage:
+    python -m scripts.bench_advantage_estimators --batch_sizes 8192 16384 32768 65536 --group_size 16
+"""
+
+import argparse
+import time
+from functools import partial
+
+import numpy as np
+import torch
+
+from tests.trainer.ppo.test_core_algos_on_cpu import (
+    reference_grpo,
+    reference_grpo_passk,
+    reference_loop,
+    reference_rloo,
+)
+from verl.trainer.ppo.core_algos import (
+    compute_grpo_outcome_advantage,
+    compute_grpo_passk_outcome_advantage,
+    compute_loop_outcome_advantage,
+    compute_rloo_outcome_advantage,
+)
+
+ESTIMATORS = {
+    "grpo": (compute_grpo_outcome_advantage, reference_grpo, {}),
+    "grpo_passk": (compute_grpo_passk_outcome_advantage, reference_grpo_passk, {"config": {}}),
+    "rloo": (compute_rloo_outcome_advantage, reference_rloo, {}),
+    "loop": (compute_loop_outcome_advantage, reference_loop, {}),
+}
+
+
+def make_batch(batch_size: int, group_size: int, response_length: int, device: str):
+    uids = np.array([f"uid-{i // group_size}" for i in range(batch_size)], dtype=object)
+    token_level_rewards = torch.zeros(batch_size, response_length, device=device)
+    token_level_rewards[:, -1] = torch.rand(batch_size, device=device)
+    response_mask = torch.ones(batch_size, response_length, device=device)
+    return token_level_rewards, response_mask, uids
+
+
+def run(fn, token_level_rewards, response_mask, uids, **kwargs):
+    # estimators may write into the rewards, every run starts from a fresh copy
+    return fn(token_level_rewards.clone(), response_mask, uids, **kwargs)
+
+
+def timed(fn, repeats: int) -> float:
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[8192, 16384, 32768, 65536])
+    parser.add_argument("--group_size", type=int, default=16)
+    parser.add_argument("--response_length", type=int, default=128)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--device", type=str, default="cpu")
+    args = parser.parse_args()
+
+    print(f"{'estimator':12}{'batch':>8}{'loop':>12}{'vectorized':>12}{'speedup':>9}")
+    for batch_size in args.batch_sizes:
+        token_level_rewards, response_mask, uids = make_batch(
+            batch_size, args.group_size, args.response_length, args.device
+        )
+        for name, (estimator, reference, kwargs) in ESTIMATORS.items():
+            loop = timed(partial(run, reference, token_level_rewards, response_mask, uids), 1)
+            vectorized = timed(
+                partial(run, estimator, token_level_rewards, response_mask, uids, **kwargs), args.repeats
+            )
+            print(
+                f"{name:12}{batch_size:>8}{loop * 1000:>10.1f}ms{vectorized * 1000:>10.1f}ms{loop / vectorized:>8.0f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# Copyright 2024  Ltd. and/or its affiliates
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Benchmark of moving a DataProto between the driver and Ray workers: the zero-copy serialization of
+DataProto against the previous torch.save one, for a rollout-shaped batch (input_ids, attention_mask,
+position_ids, responses as int64 and old_log_probs as float32 of batch_size x seq_len).
+
+Every round measures
+    pickle:   pickle.dumps / pickle.loads with protocol 5 out-of-band buffers
+    put/get:  ray.put and ray.get in the driver
+    dispatch: sending the batch to `num_workers` actors in chunks and collecting the chunks back
+
+Usage:
+    python -m scripts.bench_dataproto_transfer --batch_size 512 --seq_len 32768 --num_workers 4
+"""
+
+import argparse
+import pickle
+import time
+
+import numpy as np
+import ray
+import torch
+
+from verl import DataProto
+
+
+class LegacyDataProto(DataProto):
+    """DataProto pickled with torch.save, as before the zero-copy serialization."""
+
+    def __getstate__(self):
+        return self._torch_save_state()
+
+
+@ray.remote
+class EchoWorker:
+    def echo(self, data: DataProto) -> DataProto:
+        return data
+
+
+def make_batch(batch_size: int, seq_len: int, cls=DataProto) -> DataProto:
+    tensors = {
+        "input_ids": torch.randint(0, 150000, (batch_size, seq_len)),
+        "attention_mask": torch.ones(batch_size, seq_len, dtype=torch.int64),
+        "position_ids": torch.arange(seq_len).expand(batch_size, seq_len).contiguous(),
+        "responses": torch.randint(0, 150000, (batch_size, seq_len // 2)),
+        "old_log_probs": torch.randn(batch_size, seq_len // 2),
+    }
+    non_tensors = {"uid": np.array([str(i) for i in range(batch_size)], dtype=object)}
+    return cls.from_dict(tensors=tensors, non_tensors=non_tensors)
+
+
+def timed(fn, repeats: int) -> float:
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def bench(data: DataProto, workers: list, repeats: int) -> dict:
+    def pickle_round_trip():
+        buffers = []
+        payload = pickle.dumps(data, protocol=5, buffer_callback=buffers.append)
+        pickle.loads(payload, buffers=buffers)
+
+    def put_get():
+        ray.get(ray.put(data))
+
+    def dispatch():
+        chunks = data.chunk(len(workers))
+        ray.get([worker.echo.remote(chunk) for worker, chunk in zip(workers, chunks, strict=True)])
+
+    return {
+        "pickle": timed(pickle_round_trip, repeats),
+        "put/get": timed(put_get, repeats),
+        "dispatch": timed(dispatch, repeats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch_size", type=int, default=512)
+    parser.add_argument("--seq_len", type=int, default=32768)
+    parser.add_argument("--num_workers", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    ray.init()
+    workers = [EchoWorker.remote() for _ in range(args.num_workers)]
+
+    results = {}
+    for name, cls in [("torch.save", LegacyDataProto), ("zero-copy", DataProto)]:
+        data = make_batch(args.batch_size, args.seq_len, cls)
+        size = sum(tensor.numel() * tensor.element_size() for tensor in data.batch.values())
+        results[name] = bench(data, workers, args.repeats)
+        del data
+
+    print(f"batch {args.batch_size} x {args.seq_len}, {size / 2**30:.2f} GiB of tensors")
+    print(f"{'':12}" + "".join(f"{stage:>12}" for stage in results["zero-copy"]))
+    for name, stages in results.items():
+        print(f"{name:12}" + "".join(f"{seconds * 1000:>10.1f}ms" for seconds in stages.values()))
+    ray.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -337,6 +337,61 @@ def test_torch_save_data_proto():
     os.remove("test_data.pt")
 
 
+def test_data_proto_zero_copy_pickle():
+    import pickle
+
+    from verl.protocol import _tensordict_to_buffers
+
+    data = DataProto.from_dict(
+        tensors={
+            "input_ids": torch.randint(0, 100, (4, 1024)),
+            "log_probs": torch.randn(4, 1024, dtype=torch.bfloat16),
+            "mask": torch.rand(4, 1024) > 0.5,
+            "scores": torch.randn(4),
+            "empty": torch.zeros(4, 0),
+        },
+        non_tensors={"labels": np.array(["a", "b", "c", "d"], dtype=object)},
+        meta_info={"info": "test_info"},
+    )
+    data.batch["nested"] = TensorDict({"values": torch.arange(8).view(4, 2)}, batch_size=[4])
+
+    def check(loaded):
+        assert loaded.batch.batch_size == data.batch.batch_size
+        for key, tensor in data.batch.items(include_nested=True, leaves_only=True):
+            assert loaded.batch[key].dtype == tensor.dtype
+            assert torch.equal(loaded.batch[key], tensor)
+        assert (loaded.non_tensor_batch["labels"] == data.non_tensor_batch["labels"]).all()
+        assert loaded.meta_info == data.meta_info
+
+    # every protocol works, protocol 5 moves the tensors out-of-band
+    for protocol in range(2, pickle.HIGHEST_PROTOCOL + 1):
+        check(pickle.loads(pickle.dumps(data, protocol=protocol)))
+    buffers = []
+    payload = pickle.dumps(data, protocol=5, buffer_callback=buffers.append)
+    tensor_bytes = sum(tensor.numel() * tensor.element_size() for tensor in data.batch.values(True, True))
+    assert len(payload) < tensor_bytes // 10
+    assert sum(buffer.raw().nbytes for buffer in buffers) >= tensor_bytes
+
+    # read-only buffers (e.g. Ray's object store) are copied, so loaded batches stay writable
+    loaded = pickle.loads(payload, buffers=[bytes(buffer.raw()) for buffer in buffers])
+    check(loaded)
+    loaded.batch["input_ids"] += 1
+    assert torch.equal(loaded.batch["input_ids"], data.batch["input_ids"] + 1)
+
+    # a slice only carries its own rows
+    sliced = pickle.loads(pickle.dumps(data[1:3], protocol=5))
+    assert torch.equal(sliced.batch["input_ids"], data.batch["input_ids"][1:3])
+
+    # batches the buffers cannot describe still go through torch.save
+    grad_data = DataProto.from_dict(tensors={"obs": torch.randn(2, 3, requires_grad=True)})
+    assert _tensordict_to_buffers(grad_data.batch) is None
+    loaded = pickle.loads(pickle.dumps(grad_data))
+    assert torch.equal(loaded.batch["obs"], grad_data.batch["obs"])
+
+    no_batch = pickle.loads(pickle.dumps(DataProto.from_dict(non_tensors={"labels": ["a"]})))
+    assert no_batch.batch is None
+
+
 def test_len():
     obs = torch.tensor([[1, 2], [3, 4], [5, 6]])
     labels = np.array(["a", "b", "c"], dtype=object)
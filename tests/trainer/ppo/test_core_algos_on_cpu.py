@@ -14,12 +14,28 @@
 
 import random
 import unittest
+from collections import defaultdict
 
+import numpy as np
 import pytest
 import torch
 
 import verl.trainer.ppo.core_algos
-from verl.trainer.ppo.core_algos import compute_gae_advantage_return, get_adv_estimator_fn, register_adv_est
+from verl.trainer.ppo.core_algos import (
+    compute_gae_advantage_return,
+    compute_gpg_outcome_advantage,
+    compute_grpo_outcome_advantage,
+    compute_grpo_passk_outcome_advantage,
+    compute_loop_outcome_advantage,
+    compute_opo_outcome_advantage,
+    compute_reinforce_plus_plus_baseline_outcome_advantage,
+    compute_rloo_outcome_advantage,
+    get_adv_estimator_fn,
+    get_group_ids,
+    group_max,
+    group_mean_std,
+    register_adv_est,
+)
 
 
 def mock_test_fn():
@@ -188,5 +204,182 @@ def test_multi_turn_compute_gae_advantage_return():
     print(f" [CORRECT] \n\n{adv1=}, \n\n{ret1=}")
 
 
+# Per-sample loop implementations the vectorized outcome estimators are checked against.
+def _group_scores(scores, index):
+    id2score = defaultdict(list)
+    for i in range(len(scores)):
+        id2score[index[i]].append(scores[i])
+    return id2score
+
+
+def reference_grpo(token_level_rewards, response_mask, index, epsilon=1e-6, norm_adv_by_std_in_grpo=True):
+    scores = token_level_rewards.sum(dim=-1)
+    id2score = _group_scores(scores, index)
+    id2mean, id2std = {}, {}
+    for idx, group in id2score.items():
+        if len(group) == 1:
+            id2mean[idx], id2std[idx] = torch.tensor(0.0), torch.tensor(1.0)
+        else:
+            id2mean[idx], id2std[idx] = torch.mean(torch.stack(group)), torch.std(torch.stack(group))
+    for i in range(len(scores)):
+        if norm_adv_by_std_in_grpo:
+            scores[i] = (scores[i] - id2mean[index[i]]) / (id2std[index[i]] + epsilon)
+        else:
+            scores[i] = scores[i] - id2mean[index[i]]
+    return scores.unsqueeze(-1) * response_mask
+
+
+def reference_loop(token_level_rewards, response_mask, index):
+    scores = token_level_rewards.sum(dim=-1)
+    id2samples = defaultdict(list)
+    for i in range(len(scores)):
+        id2samples[index[i]].append((i, scores[i]))
+    for group in id2samples.values():
+        total_score = sum(score for _, score in group)
+        for i, score in group:
+            loo_baseline = 0 if len(group) == 1 else (total_score - score) / (len(group) - 1)
+            scores[i] = score - loo_baseline
+    return scores.unsqueeze(-1) * response_mask
+
+
+def reference_grpo_passk(token_level_rewards, response_mask, index, epsilon=1e-6, norm_adv_by_std_in_grpo=True):
+    scores = token_level_rewards.sum(dim=-1)
+    advantages = torch.zeros_like(scores)
+    id2indices = defaultdict(list)
+    for i in range(len(scores)):
+        id2indices[index[i]].append(i)
+    for indices in id2indices.values():
+        rewards = scores[indices]
+        topk, topk_idx = torch.topk(rewards, 2)
+        advantage = topk[0] - topk[1]
+        if norm_adv_by_std_in_grpo:
+            advantage = advantage / (torch.std(rewards) + epsilon)
+        advantages[indices[topk_idx[0].item()]] = advantage
+    return advantages.unsqueeze(-1) * response_mask
+
+
+def reference_group_mean_baseline(scores, index):
+    id2score = _group_scores(scores, index)
+    id2mean = {idx: torch.tensor(0.0) if len(g) == 1 else torch.mean(torch.stack(g)) for idx, g in id2score.items()}
+    return id2score, id2mean
+
+
+def reference_reinforce_plus_plus_baseline(token_level_rewards, response_mask, index):
+    scores = token_level_rewards.sum(dim=-1)
+    _, id2mean = reference_group_mean_baseline(scores, index)
+    for i in range(len(scores)):
+        scores[i] = scores[i] - id2mean[index[i]]
+    scores = scores.unsqueeze(-1).tile([1, token_level_rewards.shape[-1]]) * response_mask
+    return verl.utils.torch_functional.masked_whiten(scores, response_mask) * response_mask
+
+
+def reference_rloo(token_level_rewards, response_mask, index):
+    scores = token_level_rewards.sum(dim=-1)
+    id2score, id2mean = reference_group_mean_baseline(scores, index)
+    for i in range(len(scores)):
+        n = len(id2score[index[i]])
+        if n > 1:
+            scores[i] = scores[i] * n / (n - 1) - id2mean[index[i]] * n / (n - 1)
+    return scores.unsqueeze(-1) * response_mask
+
+
+def reference_opo(token_level_rewards, response_mask, index):
+    response_length = response_mask.sum(dim=-1)
+    scores = token_level_rewards.sum(dim=-1)
+    id2indices = defaultdict(list)
+    for i in range(len(scores)):
+        id2indices[index[i]].append(i)
+    baselines = torch.zeros_like(scores)
+    for indices in id2indices.values():
+        if len(indices) > 1:
+            lengths = response_length[indices]
+            baselines[indices] = (lengths * scores[indices]).sum() / lengths.sum()
+    return (scores - baselines).unsqueeze(-1) * response_mask
+
+
+def reference_gpg(token_level_rewards, response_mask, index, f_norm=1.0):
+    scores = token_level_rewards.sum(dim=-1)
+    alpha = len(scores) / torch.count_nonzero(scores).clamp(min=1)
+    _, id2mean = reference_group_mean_baseline(scores, index)
+    for i in range(len(scores)):
+        scores[i] = alpha * (scores[i] - id2mean[index[i]]) / f_norm
+    return scores.unsqueeze(-1) * response_mask
+
+
+def _outcome_batch(num_groups, max_group_size, min_group_size=1, response_length=8, seed=0):
+    """Scores on the last valid token, groups of random size in shuffled order with uid strings."""
+    generator = torch.Generator().manual_seed(seed)
+    sizes = torch.randint(min_group_size, max_group_size + 1, (num_groups,), generator=generator)
+    index = np.array([f"uid-{group}" for group, size in enumerate(sizes.tolist()) for _ in range(size)], dtype=object)
+    index = index[torch.randperm(len(index), generator=generator).numpy()]
+    bsz = len(index)
+    lengths = torch.randint(1, response_length + 1, (bsz,), generator=generator)
+    response_mask = (torch.arange(response_length)[None, :] < lengths[:, None]).float()
+    token_level_rewards = torch.zeros(bsz, response_length)
+    # discrete rewards, so groups have ties as with rule-based rewards
+    token_level_rewards[torch.arange(bsz), lengths - 1] = torch.randint(0, 4, (bsz,), generator=generator).float()
+    return token_level_rewards, response_mask, index
+
+
+def test_group_statistics():
+    index = np.array(["b", "a", "b", "c", "a", "b"], dtype=object)
+    values = torch.tensor([1.0, 2.0, 3.0, 4.0, 6.0, 5.0])
+    group_ids, group_sizes = get_group_ids(index)
+    assert group_ids.tolist() == [1, 0, 1, 2, 0, 1]
+    assert group_sizes.tolist() == [2, 3, 1]
+    mean, std = group_mean_std(values, group_ids, group_sizes)
+    torch.testing.assert_close(mean, torch.tensor([4.0, 3.0, 4.0]))
+    torch.testing.assert_close(std[:2], torch.stack([values[[1, 4]].std(), values[[0, 2, 5]].std()]))
+    assert torch.isnan(std[2])
+    torch.testing.assert_close(group_max(values, group_ids, 3), torch.tensor([6.0, 5.0, 4.0]))
+    # tensor indices, e.g. the int uids of some recipes, give the same groups
+    tensor_ids, tensor_sizes = get_group_ids(torch.tensor([7, 3, 7, 9, 3, 7]))
+    assert torch.equal(tensor_ids, group_ids) and torch.equal(tensor_sizes, group_sizes)
+
+
+@pytest.mark.parametrize(
+    "estimator, reference, kwargs",
+    [
+        (compute_grpo_outcome_advantage, reference_grpo, {}),
+        (compute_grpo_outcome_advantage, reference_grpo, {"norm_adv_by_std_in_grpo": False}),
+        (compute_loop_outcome_advantage, reference_loop, {}),
+        (compute_reinforce_plus_plus_baseline_outcome_advantage, reference_reinforce_plus_plus_baseline, {}),
+        (compute_rloo_outcome_advantage, reference_rloo, {}),
+        (compute_opo_outcome_advantage, reference_opo, {}),
+        (compute_gpg_outcome_advantage, reference_gpg, {}),
+    ],
+)
+def test_vectorized_outcome_advantage_matches_loop(estimator, reference, kwargs):
+    token_level_rewards, response_mask, index = _outcome_batch(num_groups=64, max_group_size=8)
+    advantages, returns = estimator(token_level_rewards.clone(), response_mask, index, **kwargs)
+    expected = reference(token_level_rewards.clone(), response_mask, index, **kwargs)
+    torch.testing.assert_close(advantages, expected)
+    torch.testing.assert_close(returns, expected)
+
+
+@pytest.mark.parametrize("norm_adv_by_std_in_grpo", [True, False])
+def test_vectorized_grpo_passk_matches_loop(norm_adv_by_std_in_grpo):
+    token_level_rewards, response_mask, index = _outcome_batch(num_groups=64, max_group_size=8, min_group_size=2)
+    # continuous rewards, so the best response of every group is unique
+    token_level_rewards = token_level_rewards + torch.rand(token_level_rewards.shape[0], 1) * response_mask
+    config = {"norm_adv_by_std_in_grpo": norm_adv_by_std_in_grpo}
+    advantages, _ = compute_grpo_passk_outcome_advantage(token_level_rewards, response_mask, index, config=config)
+    expected = reference_grpo_passk(token_level_rewards, response_mask, index, **config)
+    torch.testing.assert_close(advantages, expected)
+
+    # a tie for the best response gives no advantage to any response of the group
+    tied = torch.zeros(4, 2)
+    tied[:, 0] = torch.tensor([1.0, 1.0, 0.0, 0.5])
+    advantages, _ = compute_grpo_passk_outcome_advantage(
+        tied, torch.ones(4, 2), np.array(["a", "a", "b", "b"], dtype=object), config=config
+    )
+    assert advantages[:2].abs().sum() == 0 and advantages[3, 0] > 0
+
+    with pytest.raises(ValueError, match="at least 2 samples"):
+        compute_grpo_passk_outcome_advantage(
+            torch.ones(3, 2), torch.ones(3, 2), np.array(["a", "a", "b"], dtype=object), config=config
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
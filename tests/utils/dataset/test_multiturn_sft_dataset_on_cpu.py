@@ -18,6 +18,7 @@ Test the MultiTurnSFTDataset implementation
 import os
 
 import pandas as pd
+import pytest
 import torch
 from transformers import AutoTokenizer
 
@@ -202,3 +203,52 @@ def test_multiturn_sft_dataset():
 
     print("All tests passed!")
     print("Starting test...")
+
+
+def test_multiturn_sft_dataset_token_cache(tmp_path, monkeypatch):
+    messages = [
+        [
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": f"What is {i}+{i}?"},
+            {"role": "assistant", "content": f"Let me compute {i}+{i}."},
+            {"role": "tool", "content": f"{2 * i}"},
+            {"role": "tool", "content": "done"},
+            {"role": "assistant", "content": f"{i}+{i} equals {2 * i}."},
+        ]
+        for i in range(8)
+    ]
+    test_file = str(tmp_path / "multiturn.parquet")
+    pd.DataFrame({"messages": messages}).to_parquet(test_file)
+    tokenizer = AutoTokenizer.from_pretrained("Qwen/Qwen2.5-Coder-7B-Instruct")
+
+    for pad_config in [
+        {"pad_mode": "right", "max_length": 256},
+        {"pad_mode": "left_right", "max_prompt_length": 64, "max_response_length": 128},
+    ]:
+        config = {"truncation": "error", "multiturn": {"messages_key": "messages"}, **pad_config}
+        cache_config = {
+            **config,
+            "multiturn": {"messages_key": "messages", "cache_dir": str(tmp_path / "cache"), "cache_workers": 2},
+        }
+        dataset = MultiTurnSFTDataset(parquet_files=test_file, tokenizer=tokenizer, config=config)
+        cached_dataset = MultiTurnSFTDataset(parquet_files=test_file, tokenizer=tokenizer, config=cache_config)
+        assert cached_dataset.token_store is not None
+
+        for i in range(len(dataset)):
+            item, cached_item = dataset[i], cached_dataset[i]
+            assert item.keys() == cached_item.keys()
+            for key in item:
+                assert cached_item[key].dtype == item[key].dtype, f"dtype of {key} differs"
+                assert torch.equal(cached_item[key], item[key]), f"{key} of item {i} differs with the token cache"
+
+    # the cache is keyed by tokenizer, template kwargs and files, and reused when they match
+    def fail_build(self, path):
+        raise AssertionError("token cache rebuilt")
+
+    monkeypatch.setattr(MultiTurnSFTDataset, "_build_token_store", fail_build)
+    reused = MultiTurnSFTDataset(parquet_files=test_file, tokenizer=tokenizer, config=cache_config)
+    assert torch.equal(reused[0]["input_ids"], cached_dataset[0]["input_ids"])
+
+    cache_config["apply_chat_template_kwargs"] = {"add_vision_id": True}
+    with pytest.raises(AssertionError, match="token cache rebuilt"):
+        MultiTurnSFTDataset(parquet_files=test_file, tokenizer=tokenizer, config=cache_config)
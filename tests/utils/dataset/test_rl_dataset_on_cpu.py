@@ -111,3 +111,44 @@ def test_image_rl_data():
     output = tokenizer.batch_decode([data])[0]
     print(f"type: type{output}")
     print(f"\n\noutput: {output}")
+
+
+def test_rl_dataset_prompt_length_cache(tmp_path, monkeypatch):
+    import numpy as np
+    import pandas as pd
+
+    from verl.utils import hf_tokenizer
+    from verl.utils.dataset.rl_dataset import RLHFDataset
+
+    tokenizer = hf_tokenizer("deepseek-ai/deepseek-coder-1.3b-instruct")
+    local_path = str(tmp_path / "prompts.parquet")
+    prompts = [[{"role": "user", "content": "word " * (i * 10)}] for i in range(20)]
+    pd.DataFrame({"prompt": prompts, "data_source": ["test"] * len(prompts)}).to_parquet(local_path)
+    config = OmegaConf.create(
+        {
+            "prompt_key": "prompt",
+            "max_prompt_length": 128,
+            "filter_overlong_prompts": True,
+            "filter_overlong_prompts_workers": 2,
+            "cache_dir": str(tmp_path / "cache"),
+        }
+    )
+    dataset = RLHFDataset(data_files=local_path, tokenizer=tokenizer, config=config)
+
+    expected = np.array([len(tokenizer.apply_chat_template(prompt, add_generation_prompt=True)) for prompt in prompts])
+    assert len(dataset) == (expected <= 128).sum()
+    np.testing.assert_array_equal(dataset.prompt_lengths, expected[expected <= 128])
+    filtered = dataset.maybe_filter_out_long_prompts(dataset.dataframe)
+    assert len(filtered) == len(dataset)
+
+    # the lengths are read back from the cache instead of tokenizing the prompts again
+    def fail_doc2len(self, doc):
+        raise AssertionError("prompt tokenized again")
+
+    monkeypatch.setattr(RLHFDataset, "_doc2len", fail_doc2len)
+    cached_dataset = RLHFDataset(data_files=local_path, tokenizer=tokenizer, config=config)
+    np.testing.assert_array_equal(cached_dataset.prompt_lengths, dataset.prompt_lengths)
+    assert torch.equal(cached_dataset[0]["input_ids"], dataset[0]["input_ids"])
+    assert cached_dataset[0]["raw_prompt_ids"] == tokenizer.encode(
+        tokenizer.apply_chat_template(prompts[0], add_generation_prompt=True, tokenize=False), add_special_tokens=False
+    )
@@ -0,0 +1,161 @@
+# Copyright 2024  Ltd. and/or its affiliates
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+The API client of verl_utils/data/utils/api.py against the local stub OpenAI server
+(verl_utils/data/utils/stub_openai_server.py) with injected failures: retries on 429/5xx with
+Retry-After, the 'error' finish reason, client caching, rate limiting and the usage summary.
+"""
+
+import asyncio
+import importlib
+import json
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from verl_utils.data.utils.rate_limit import RateLimiter
+from verl_utils.data.utils.stub_openai_server import StubOpenAIServer
+
+MESSAGES = [{"role": "user", "content": "what is one plus one"}]
+
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory):
+    # api.py reads config.json from the working directory when imported
+    if "verl_utils.data.utils.api" in sys.modules:
+        return sys.modules["verl_utils.data.utils.api"]
+    config_dir = tmp_path_factory.mktemp("config")
+    (config_dir / "config.json").write_text("{}")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(config_dir)
+        return importlib.import_module("verl_utils.data.utils.api")
+
+
+@pytest.fixture
+def stub(api, monkeypatch):
+    """A stub server, the `stub` model pointing at it, and fresh clients, limiters and usage stats."""
+    server = StubOpenAIServer().start()
+    config = {
+        "base_url": server.url, "api_version": "2024-10-21", "api_key": "stub",
+        "model": "stub", "temperature": 0, "max_tokens": 64,
+    }  # fmt: skip
+    monkeypatch.setattr(api, "meta_config", {"stub": config})
+    monkeypatch.setattr(api, "_clients", {})
+    monkeypatch.setattr(api, "_async_clients", {})
+    monkeypatch.setattr(api, "_limiters", {})
+    monkeypatch.setattr(api, "api_usage", api.UsageStats())
+    yield server
+    server.stop()
+
+
+def test_retries_429_and_5xx_with_retry_after(api, stub):
+    stub.fail = [429, 500, 503]
+    start = time.monotonic()
+    messages, tokens, finish_reason = api.get_chat_completion("stub", MESSAGES)
+    # Retry-After: 0 of the stub instead of up to 1 + 2 + 4 seconds of jittered backoff
+    assert time.monotonic() - start < 1.0
+    assert finish_reason == "stop"
+    assert len(stub.requests) == 4
+    assert messages == MESSAGES + [{"role": "assistant", "content": "echo: what is one plus one", "tool_calls": None}]
+    assert tokens == 5 + 6
+    summary = api.api_usage.summary()["stub"]
+    assert (summary["requests"], summary["retries"], summary["errors"]) == (1, 3, 0)
+    assert (summary["prompt_tokens"], summary["completion_tokens"]) == (5, 6)
+    assert sum(summary["latency_histogram"]) == 1
+
+
+def test_gives_up_with_error_finish_reason(api, stub, monkeypatch):
+    monkeypatch.setattr(api, "API_MAX_RETRIES", 2)
+    stub.fail = [500, 502, 503, 504]
+    assert api.get_chat_completion("stub", MESSAGES) == (MESSAGES, 0, "error")
+    assert len(stub.requests) == 3
+    summary = api.api_usage.summary()["stub"]
+    assert (summary["requests"], summary["retries"], summary["errors"]) == (0, 2, 1)
+
+
+def test_client_errors_are_not_retried(api, stub):
+    stub.fail = [400]
+    assert api.get_chat_completion("stub", MESSAGES) == (MESSAGES, 0, "error")
+    assert len(stub.requests) == 1
+    assert api.api_usage.summary()["stub"]["retries"] == 0
+
+
+def test_async_retries_and_tool_calls(api, stub):
+    tool_call = {"id": "call_0", "type": "function", "function": {"name": "search", "arguments": "{}"}}
+    stub.reply = lambda body: (None, [tool_call], "tool_calls")
+    stub.fail = [429]
+    messages, _, finish_reason = asyncio.run(api.get_chat_completion_async("stub", MESSAGES))
+    assert finish_reason == "tool_calls"
+    assert messages[-1] == {"role": "assistant", "content": None, "tool_calls": [tool_call]}
+    assert len(stub.requests) == 2
+    assert api.api_usage.summary()["stub"]["retries"] == 1
+
+
+def test_clients_are_cached(api, stub):
+    assert api.get_client("stub") is api.get_client("stub")
+
+    async def get_twice():
+        return api.get_async_client("stub"), api.get_async_client("stub")
+
+    first, second = asyncio.run(get_twice())
+    assert first is second
+    # the connections of an async client belong to its event loop
+    third, _ = asyncio.run(get_twice())
+    assert third is not first
+
+
+def test_backoff(api):
+    def error(retry_after):
+        headers = {} if retry_after is None else {"retry-after": retry_after}
+        return SimpleNamespace(response=SimpleNamespace(headers=headers))
+
+    assert api.backoff(0, error("2")) == 2.0
+    assert api.backoff(0, error("3600")) == api.API_BACKOFF_MAX
+    for attempt in range(4):
+        assert 0 <= api.backoff(attempt, error(None)) <= api.API_BACKOFF_BASE * 2**attempt
+        assert 0 <= api.backoff(attempt, error("soon")) <= api.API_BACKOFF_BASE * 2**attempt
+
+
+def test_rate_limiter_from_config(api, stub):
+    assert api.get_rate_limiter("stub") is None
+    api.meta_config["stub"].update(requests_per_second=20, burst=2)
+    api._limiters.clear()
+    limiter = api.get_rate_limiter("stub")
+    assert (limiter.rate, limiter.burst) == (20, 2)
+    start = time.monotonic()
+    for _ in range(4):
+        api.get_chat_completion("stub", MESSAGES)
+    # a burst of 2, then 2 requests 50 ms apart
+    assert time.monotonic() - start >= 0.09
+
+
+def test_rate_limiter_reserves_in_order():
+    limiter = RateLimiter(rate=10, burst=3)
+    waits = [limiter.reserve() for _ in range(5)]
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3] == pytest.approx(0.1, abs=0.01) and waits[4] == pytest.approx(0.2, abs=0.01)
+
+
+def test_usage_report(api, capsys):
+    usage = api.UsageStats()
+    usage.record("m", SimpleNamespace(prompt_tokens=300, completion_tokens=10), latency=3.0)
+    usage.record_retry("m")
+    usage.report()
+    report = json.loads(capsys.readouterr().out.removeprefix("API USAGE: "))
+    stats = report["models"]["m"]
+    assert (stats["requests"], stats["retries"], stats["latency"]) == (1, 1, 3.0)
+    assert stats["latency_histogram"][api.LATENCY_BUCKETS.index(4)] == 1
+    assert stats["prompt_tokens_histogram"][1] == 1  # 256 < 300 <= 512
@@ -0,0 +1,116 @@
+# Copyright 2024  Ltd. and/or its affiliates
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+The in-process diff of verl_utils/data/envs/WS.py against `git diff HEAD` on random edits: every diff
+it produces must be byte-identical to git's, and it must give up (None) when git could align the
+lines another way.
+"""
+
+import os
+import random
+import shutil
+import subprocess
+
+import pytest
+
+from verl_utils.data.envs.WS import format_git_diff
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+# git's output must not depend on the user's or the system's config (e.g. diff.algorithm)
+GIT_ENV = {**os.environ, "GIT_CONFIG_GLOBAL": os.devnull, "GIT_CONFIG_NOSYSTEM": "1"}
+
+
+def git(repo, *args):
+    return subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=repo,
+        env=GIT_ENV,
+        check=True,
+        capture_output=True,
+    ).stdout
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git(tmp_path, "init", "-q")
+    return tmp_path
+
+
+def git_diff(repo, old: bytes, new: bytes) -> str:
+    with open(repo / "mod.py", "wb") as f:
+        f.write(old)
+    git(repo, "add", "mod.py")
+    git(repo, "commit", "-q", "-m", "base")
+    with open(repo / "mod.py", "wb") as f:
+        f.write(new)
+    return git(repo, "diff", "HEAD").decode()
+
+
+def random_line(rng: random.Random) -> str:
+    kind = rng.random()
+    if kind < 0.15:
+        return ""
+    if kind < 0.25:
+        return rng.choice(["    return None", "    pass", "        continue", "else:"])
+    if kind < 0.35:
+        return f"def func_{rng.randrange(10**6)}(x):"
+    return f"    value_{rng.randrange(10**6)} = compute({rng.randrange(100)})"
+
+
+def random_edit(rng: random.Random, lines: list[str]) -> list[str]:
+    lines = list(lines)
+    for _ in range(rng.randint(1, 4)):
+        start = rng.randrange(len(lines) + 1)
+        stop = min(len(lines), start + rng.randint(0, 3))
+        lines[start:stop] = [random_line(rng) for _ in range(rng.randint(0, 4))]
+    return lines
+
+
+def join(lines: list[str], trailing_newline: bool) -> bytes:
+    text = "\n".join(lines)
+    return (text + "\n" if trailing_newline and lines else text).encode()
+
+
+def test_format_git_diff_matches_git(repo):
+    rng = random.Random(0)
+    produced = 0
+    trials = 300
+    for trial in range(trials):
+        old_lines = [random_line(rng) for _ in range(rng.randint(0, 60))]
+        old = join(old_lines, rng.random() < 0.9)
+        new = join(random_edit(rng, old_lines), rng.random() < 0.9)
+        if old == new:
+            continue
+        diff = format_git_diff("mod.py", old, new)
+        if diff is None:
+            continue
+        produced += 1
+        expected = git_diff(repo, old, new)
+        assert diff == expected, f"trial {trial}:\n{diff}\n!=\n{expected}"
+    # the rest repeat blank or boilerplate lines around the edits and go through git diff
+    assert produced > trials // 3
+
+
+def test_format_git_diff_gives_up_on_sliding_blocks():
+    old = b"def a():\n    pass\n\ndef c():\n    pass\n"
+    # the inserted block can be aligned before or after `    pass\n\n`
+    new = b"def a():\n    pass\n\ndef b():\n    pass\n\ndef c():\n    pass\n"
+    assert format_git_diff("mod.py", old, new) is None
+
+
+def test_format_git_diff_gives_up_on_moved_lines():
+    old = b"first = 1\nsecond = 2\nthird = 3\n"
+    new = b"second = 2\nfirst = 1\nthird = 3\n"
+    assert format_git_diff("mod.py", old, new) is None
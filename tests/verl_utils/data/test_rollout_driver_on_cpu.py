@@ -0,0 +1,184 @@
+# Copyright 2024  Ltd. and/or its affiliates
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+RolloutDriver of verl_utils/data/utils/rollout_driver.py: several drivers sharing one output,
+failures, lease expiry, dead owners, torn shards and resuming from an earlier output.
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from verl_utils.data.utils.rollout_driver import RolloutDriver
+
+NUM_ROWS = 6
+
+
+def make_driver(output_path, owner, **kwargs) -> RolloutDriver:
+    driver = RolloutDriver(str(output_path), **kwargs)
+    driver.owner = owner
+    driver.shard_path = os.path.join(driver.shard_dir, f"{owner}.jsonl")
+    return driver
+
+
+def dead_owner() -> str:
+    """An owner on this host whose process has exited"""
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return f"{socket.gethostname()}-{proc.pid}"
+
+
+class FakeProcess:
+    """`process` of the rollout scripts: records its calls, raises for `fail` and marks `invalid` rows invalid"""
+
+    def __init__(self, fail=(), invalid=(), block=None):
+        self.fail, self.invalid, self.block = set(fail), set(invalid), block
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, key, row):
+        with self.lock:
+            self.calls.append(key)
+        if self.block is not None and key in self.block:
+            started, release = self.block[key]
+            started.set()
+            assert release.wait(10)
+        if key in self.fail:
+            raise RuntimeError("forced failure")
+        return {"idx": key, "answer": row["question"].upper(), "valid": key not in self.invalid}
+
+
+def is_valid(record) -> bool:
+    return bool(record["valid"])
+
+
+@pytest.fixture
+def data():
+    return pd.DataFrame({"question": [f"q{i}" for i in range(NUM_ROWS)]})
+
+
+def read_output(output_path) -> dict:
+    return {int(record["idx"]): record for record in pd.read_parquet(output_path).to_dict("records")}
+
+
+def test_two_drivers_then_resume(tmp_path, data):
+    output_path = tmp_path / "out.parquet"
+    started, release = threading.Event(), threading.Event()
+    # driver a holds row 0 until driver b has gone through the rest of the queue
+    process_a = FakeProcess(fail=[3], block={0: (started, release)})
+    process_b = FakeProcess(fail=[3])
+    driver_a = make_driver(output_path, "host_a-1", concurrency=1)
+    driver_b = make_driver(output_path, "host_b-1", concurrency=2)
+
+    finished = {}
+    thread = threading.Thread(target=lambda: finished.update(a=driver_a.run(data, process_a, is_valid)))
+    thread.start()
+    assert started.wait(10)
+    assert driver_b.run(data, process_b, is_valid) is False
+    assert not output_path.exists()
+    release.set()
+    thread.join(10)
+    # the last process to finish writes the output, including the rows of the other one
+    assert finished["a"] is True
+    assert sorted(process_a.calls + process_b.calls) == list(range(NUM_ROWS))
+    assert process_a.calls[0] == 0 and 0 not in process_b.calls
+    output = read_output(output_path)
+    assert sorted(output) == [0, 1, 2, 4, 5]
+    assert output[4]["answer"] == "Q4"
+    assert driver_a.count("failed") == 1
+
+    # running again only runs the failed row
+    process = FakeProcess()
+    driver_c = make_driver(output_path, "host_c-1")
+    assert driver_c.run(data, process, is_valid) is True
+    assert process.calls == [3]
+    assert sorted(read_output(output_path)) == list(range(NUM_ROWS))
+
+
+def test_invalid_rows_are_run_again(tmp_path, data):
+    output_path = tmp_path / "out.parquet"
+    assert make_driver(output_path, "host_a-1").run(data, FakeProcess(invalid=[1, 4]), is_valid) is True
+    assert read_output(output_path)[1]["valid"] == False  # noqa: E712
+
+    # a fresh queue (e.g. the queue file was removed) resumes from the output's valid rows
+    os.remove(f"{output_path}.queue.db")
+    process = FakeProcess()
+    assert make_driver(output_path, "host_b-1").run(data, process, is_valid) is True
+    assert sorted(process.calls) == [1, 4]
+    output = read_output(output_path)
+    assert all(output[key]["valid"] for key in range(NUM_ROWS))
+
+
+def claim_rows(driver, data, owner, lease, keys):
+    """Mark `keys` as claimed by `owner` until `lease`, as a process that has stopped would leave them"""
+    driver._init_queue([int(key) for key in data.index], is_valid)
+    conn = driver._connect()
+    try:
+        conn.executemany(
+            "UPDATE queue SET state = 'running', owner = ?, lease = ? WHERE key = ?",
+            [(owner, lease, key) for key in keys],
+        )
+    finally:
+        conn.close()
+
+
+def test_expired_leases_are_claimed_again(tmp_path, data):
+    output_path = tmp_path / "out.parquet"
+    driver = make_driver(output_path, "host_a-1")
+    # another host's process can't be checked for liveness, so its rows wait for the lease
+    claim_rows(driver, data, "host_b-1", time.time() + 3600, [0])
+    claim_rows(driver, data, "host_c-1", time.time() - 1, [1])
+    process = FakeProcess()
+    assert driver.run(data, process, is_valid) is False
+    assert sorted(process.calls) == [1, 2, 3, 4, 5]
+    assert not output_path.exists()
+
+    driver.lease_seconds = 0.1
+    claim_rows(driver, data, "host_b-1", time.time() - 1, [0])
+    assert driver.run(data, process, is_valid) is True
+    assert sorted(process.calls) == list(range(NUM_ROWS))
+
+
+def test_dead_owners_are_reclaimed(tmp_path, data):
+    output_path = tmp_path / "out.parquet"
+    driver = make_driver(output_path, "host_a-1")
+    claim_rows(driver, data, dead_owner(), time.time() + 3600, [2, 3])
+    process = FakeProcess()
+    assert driver.run(data, process, is_valid) is True
+    assert sorted(process.calls) == list(range(NUM_ROWS))
+
+
+def test_resume_after_torn_shard(tmp_path, data):
+    output_path = tmp_path / "out.parquet"
+    driver = make_driver(output_path, "host_a-1")
+    os.makedirs(driver.shard_dir)
+    record = {"idx": 0, "answer": "Q0", "valid": True}
+    with open(driver.shard_path, "w") as f:
+        f.write(json.dumps({"key": 0, "time": time.time(), "record": record}) + "\n")
+        f.write('{"key": 1, "time": 1.0, "rec')  # killed while writing row 1
+
+    process = FakeProcess()
+    assert driver.run(data, process, is_valid) is True
+    assert sorted(process.calls) == [1, 2, 3, 4, 5]
+    # the rows appended after the torn line are read back
+    assert read_output(output_path) == {
+        key: {"idx": key, "answer": f"Q{key}", "valid": True} for key in range(NUM_ROWS)
+    }
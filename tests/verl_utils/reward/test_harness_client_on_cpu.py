@@ -0,0 +1,154 @@
+# Copyright 2024  Ltd. and/or its affiliates
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Tests of HarnessClient against the local harness stub (verl_utils/reward/harness_stub.py):
+concurrent deferred runs, runs that end in an error, and the growing polling interval.
+"""
+
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+from aiohttp import web
+
+from verl_utils.reward import harness_stub, model_client
+
+
+class StubServer:
+    """harness_stub app served on its own event loop thread, recording when each run is polled."""
+
+    def __init__(self, duration: float, resolve_rate: float = 0.5, error_rate: float = 0.0):
+        self.polls = []
+        app = harness_stub.create_app(duration, resolve_rate, error_rate)
+
+        @web.middleware
+        async def record_polls(request, handler):
+            if request.path.startswith("/progress/"):
+                self.polls.append((request.match_info["run_id"], time.monotonic()))
+            return await handler(request)
+
+        app.middlewares.append(record_polls)
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}/"
+        self.runner = web.AppRunner(app)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result(timeout=10)
+
+    async def _start(self):
+        await self.runner.setup()
+        await web.TCPSite(self.runner, "127.0.0.1", self.port).start()
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result(timeout=10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=10)
+
+
+@pytest.fixture
+def fast_polling(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)  # cached submissions are written to the working directory
+    monkeypatch.setattr(model_client, "HARNESS_POLL_MIN_INTERVAL", 0.05)
+    monkeypatch.setattr(model_client, "HARNESS_POLL_MAX_INTERVAL", 0.4)
+    monkeypatch.setattr(model_client, "HARNESS_POLL_BACKOFF", 2.0)
+    monkeypatch.setattr(model_client, "HARNESS_TIMEOUT", 30.0)
+
+
+def make_harness_client(server: StubServer) -> model_client.HarnessClient:
+    return model_client.HarnessClient(server.url, model_client.RewardClient(server.url + "score"))
+
+
+def make_submission(prefix: str, n: int):
+    solution_strs = [f"[PATCH]\n--- a/{prefix}_{i}.py\n+++ b/{prefix}_{i}.py\n[/PATCH]" for i in range(n)]
+    solution_strs[0] = "no patch"
+    extra_infos = [{"instance_id": f"{prefix}__{i}"} for i in range(n)]
+    return solution_strs, extra_infos
+
+
+def expected_scores(payload, resolve_rate: float = 0.5):
+    """Scores of a make_submission() payload: -1.0 for the empty patch, then whether the stub resolves each patch."""
+    return [-1.0] + [float(harness_stub.is_resolved(p["instance_id"], p["model_patch"], resolve_rate)) for p in payload]
+
+
+def test_concurrent_deferred_runs(fast_polling):
+    server = StubServer(duration=0.5)
+    client = make_harness_client(server)
+    try:
+        expected = {}
+        for prefix in ["astropy", "django", "sympy"]:
+            solution_strs, extra_infos = make_submission(prefix, 8)
+            run_key = model_client.new_run_key()
+            payload, to_scores = model_client.prepare_bench_submission(solution_strs, extra_infos, run_key)
+            assert to_scores([]) == [-1.0] + [0.0] * 7
+            client.defer(payload, run_key, to_scores)
+            expected[run_key] = expected_scores(payload)
+
+        # the runs are in flight together, nothing is finished yet
+        assert len(client.pending) == 3
+        assert client.collect() == []
+        finished = dict(client.collect(wait=True))
+        assert finished == expected
+        assert client.pending == []
+        assert len({run_id for run_id, _ in server.polls}) == 3
+    finally:
+        client.client.close()
+        server.close()
+
+
+def test_error_status(fast_polling):
+    server = StubServer(duration=0.1, error_rate=1.0)
+    client = make_harness_client(server)
+    try:
+        solution_strs, extra_infos = make_submission("flask", 4)
+        run_key = model_client.new_run_key()
+        payload, to_scores = model_client.prepare_bench_submission(solution_strs, extra_infos, run_key)
+        results = []
+        client.defer(payload, run_key, to_scores, on_result=lambda key, scores: results.append((key, scores)))
+        assert client.collect(wait=True) == [(run_key, [0.0] * 4)]
+        assert results == [(run_key, [0.0] * 4)]
+    finally:
+        client.client.close()
+        server.close()
+
+
+def test_adaptive_polling(fast_polling):
+    server = StubServer(duration=1.0)
+    client = make_harness_client(server)
+    try:
+        solution_strs, extra_infos = make_submission("requests", 4)
+        run_key = model_client.new_run_key()
+        payload, to_scores = model_client.prepare_bench_submission(solution_strs, extra_infos, run_key)
+        assert client.evaluate(payload, run_key).result(timeout=30) is not None
+
+        times = [t for _, t in server.polls]
+        intervals = [later - earlier for earlier, later in zip(times[:-1], times[1:], strict=True)]
+        # 0.05, 0.1, 0.2, 0.4, 0.4, ... instead of 20 polls at the first interval
+        assert 4 <= len(times) <= 8
+        assert intervals[-1] > 2 * intervals[0]
+        assert all(interval < 0.4 + 0.2 for interval in intervals)
+    finally:
+        client.client.close()
+        server.close()
+
+
+def test_unknown_resolved_ids_are_ignored(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    solution_strs, extra_infos = make_submission("pylint", 3)
+    _, to_scores = model_client.prepare_bench_submission(solution_strs, extra_infos, model_client.new_run_key())
+    assert to_scores(["pylint__2", "unknown__1"]) == [-1.0, 0.0, 1.0]
@@ -0,0 +1,58 @@
+# Copyright 2024  Ltd. and/or its affiliates
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Prompt tokenization of the reward model server (verl_utils/reward/model_server.py).
+"""
+
+from collections import OrderedDict
+
+import pytest
+from transformers import AutoTokenizer
+
+from verl_utils.reward import model_server
+
+PATCH = """diff --git a/src/module.py b/src/module.py
+index 1234567..89abcde 100644
+--- a/src/module.py
++++ b/src/module.py
+@@ -1,3 +1,3 @@
+ def f(x):
+-    return {value}
++    return {value} + 1
+"""
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = object.__new__(model_server.vLLMEngine.func_or_class)
+    engine.tokenizer = AutoTokenizer.from_pretrained("Qwen/Qwen2.5-0.5B-Instruct")
+    engine.prefix_cache = OrderedDict()
+    engine.patch_cache = OrderedDict()
+    engine.patch_cache_stats = {"hits": 0, "misses": 0}
+    return engine
+
+
+# issues ending in whitespace or code, where merges across the end of the issue block are likely
+@pytest.mark.parametrize("issue", ["f(1) is wrong.", "f(1) is wrong:\n\n", "Traceback:\n    f(x)   ", "使用 f 的时候"])
+def test_encode_prompt_matches_full_tokenization(engine, issue):
+    patch_lists = [[PATCH.format(value=f"x * {i + j}") for j in range(4)] for i in range(2)]
+    keys = []
+    for patch_list in patch_lists:
+        prefix_key, prompt_ids = engine.encode_prompt(issue, patch_list)
+        prompt = engine.generate_prompt(issue, patch_list)
+        assert prompt_ids == engine.tokenizer(prompt, add_special_tokens=False).input_ids
+        keys.append(prefix_key)
+    # batch items of one instance share the prefix key, and thus the engine and the prefill leader
+    assert keys[0] is not None and keys[0] == keys[1]
+    assert keys[0] != engine.encode_prompt(issue + " Also f(2).", patch_lists[0])[0]
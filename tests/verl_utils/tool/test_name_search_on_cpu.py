@@ -0,0 +1,65 @@
+# Copyright 2024  Ltd. and/or its affiliates
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+The shared exact -> qualified -> fuzzy lookup of the search tools (verl_utils/tool/name_search.py)
+over a small codegraph.
+"""
+
+import sqlite3
+
+import pytest
+
+from verl_utils.data.envs.DB import ClassEntry, DataBase, FunctionEntry
+from verl_utils.tool.name_search import lookup_entity
+
+
+@pytest.fixture
+def db_connection(tmp_path):
+    db = DataBase(str(tmp_path), "requests")
+    db.init_db()
+    if not db.name_index:
+        pytest.skip("this SQLite has no FTS5 trigram tokenizer")
+    session = ClassEntry("Session", "requests/sessions.py", "class Session: ...", [], ["get"], 1, 9)
+    with db.bulk_load():
+        db.insert_entry(session)
+        db.insert_entry(FunctionEntry("get", "requests/sessions.py", "def get(self): ...", 2, 3, parent_class=session))
+        db.insert_entry(FunctionEntry("get", "requests/api.py", "def get(url): ...", 1, 2))
+        db.insert_entry(FunctionEntry("request", "requests/api.py", "def request(): ...", 3, 4))
+    db.disconnect()
+    db_connection = sqlite3.connect(db.path)
+    yield db_connection
+    db_connection.close()
+
+
+def test_exact_and_qualified_lookup(db_connection):
+    entries, not_found = lookup_entity(db_connection, "function", "get")
+    assert not_found is None and [entry[0] for entry in entries] == ["requests/api.py"]
+    entries, not_found = lookup_entity(db_connection, "class_method", "sessions.Session.get")
+    assert not_found is None and entries == [("requests/sessions.py", 2, 3, "def get(self): ...", "Session")]
+
+
+def test_fuzzy_qualified_lookup(db_connection):
+    entries, not_found = lookup_entity(db_connection, "class_method", "Sesion.get")
+    assert entries == []
+    assert not_found.startswith("No class method named `Sesion.get` found. Similar entities in the codebase:")
+    assert "- class_method `get` (requests.sessions.Session.get)" in not_found
+    _, not_found = lookup_entity(db_connection, "function", "api.requst")
+    assert not_found.splitlines()[1] == "- function `request` (requests.api.request)"
+
+
+def test_not_found_hints(db_connection):
+    _, not_found = lookup_entity(db_connection, "class", "Foo.Bar")
+    assert not_found == "No class named `Foo.Bar` found. Please use **simple name** rather than full qualified name."
+    _, not_found = lookup_entity(db_connection, "class", "Xyz")
+    assert not_found == "No class named `Xyz` found. Maybe you are looking for a function or a class method?"
@@ -0,0 +1,94 @@
+# Copyright 2024  Ltd. and/or its affiliates
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pickle
+
+import numpy as np
+import pytest
+import torch
+
+from verl import DataProto
+from verl.workers.reward_manager import BatchRewardManager, NaiveRewardManager
+
+PAD = 0
+
+
+class CharTokenizer:
+    """Token i is the character chr(ord('a') + i - 1), 0 is the padding."""
+
+    def decode(self, token_ids, skip_special_tokens=True):
+        return "".join(chr(ord("a") + int(token) - 1) for token in token_ids if int(token) != PAD)
+
+    def batch_decode(self, sequences, skip_special_tokens=True):
+        return [self.decode(token_ids, skip_special_tokens) for token_ids in sequences]
+
+
+def length_score(data_source, solution_str, ground_truth, extra_info=None):
+    return {"score": float(len(solution_str) == ground_truth), "num_turns": extra_info["num_turns"]}
+
+
+def batch_length_score(data_sources, solution_strs, ground_truths, extra_infos, bonus=0.0):
+    return [float(len(solution) == truth) + bonus for solution, truth in zip(solution_strs, ground_truths, strict=True)]
+
+
+def make_data(response_lengths, ground_truths, prompt_length=3, response_length=6):
+    bsz = len(response_lengths)
+    prompts = torch.randint(1, 27, (bsz, prompt_length))
+    prompts[:, 0] = PAD  # left padding
+    responses = torch.randint(1, 27, (bsz, response_length))
+    response_mask = (torch.arange(response_length)[None, :] < torch.tensor(response_lengths)[:, None]).long()
+    responses[response_mask == 0] = PAD
+    attention_mask = torch.cat([(prompts != PAD).long(), response_mask], dim=-1)
+    return DataProto.from_dict(
+        tensors={"prompts": prompts, "responses": responses, "attention_mask": attention_mask},
+        non_tensors={
+            "data_source": np.array(["a", "b"] * (bsz // 2), dtype=object),
+            "reward_model": np.array([{"ground_truth": truth} for truth in ground_truths], dtype=object),
+            "extra_info": np.array([{"index": i} for i in range(bsz)], dtype=object),
+            "__num_turns__": np.array([2] * bsz, dtype=object),
+        },
+    )
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_naive_reward_manager(num_workers):
+    data = make_data(response_lengths=[1, 6, 3, 4], ground_truths=[1, 5, 3, 0])
+    manager = NaiveRewardManager(CharTokenizer(), num_examine=1, compute_score=length_score, num_workers=num_workers)
+
+    result = manager(data, return_dict=True)
+    expected = torch.zeros(4, 6)
+    expected[0, 0] = 1.0
+    expected[2, 2] = 1.0
+    assert torch.equal(result["reward_tensor"], expected)
+    assert result["reward_extra_info"]["score"] == [1.0, 0.0, 1.0, 0.0]
+    assert result["reward_extra_info"]["num_turns"] == [2, 2, 2, 2]
+
+    # the pool is left out when the manager is sent to another process, the copy starts its own
+    copy = pickle.loads(pickle.dumps(manager))
+    assert torch.equal(copy(data), expected)
+
+
+@pytest.mark.parametrize("num_workers", [0, 3])
+def test_batch_reward_manager(num_workers):
+    data = make_data(response_lengths=[2, 6, 3, 5, 1, 4], ground_truths=[2, 6, 0, 5, 0, 4])
+    manager = BatchRewardManager(
+        CharTokenizer(), num_examine=1, compute_score=batch_length_score, num_workers=num_workers, bonus=0.5
+    )
+
+    reward_tensor = manager(data)
+    expected = torch.zeros(6, 6)
+    for i, (length, reward) in enumerate(zip([2, 6, 3, 5, 1, 4], [1.5, 1.5, 0.5, 1.5, 0.5, 1.5], strict=True)):
+        expected[i, length - 1] = reward
+    assert torch.equal(reward_tensor, expected)
+    assert torch.equal(data.batch["acc"], torch.tensor([1.5, 1.5, 0.5, 1.5, 0.5, 1.5]))
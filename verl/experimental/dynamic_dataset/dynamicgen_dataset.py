@@ -100,6 +100,7 @@ class DynamicGenDataset(RLHFDataset):
     def append_dataframe(self, new_dataframe: datasets.Dataset):
         new_dataframe = self.maybe_filter_out_long_prompts(new_dataframe)
         self.dataframe = datasets.concatenate_datasets([self.dataframe, new_dataframe])
+        self.prompt_lengths = None  # cached for the files read at start only
 
         logger.info(f"new dataset len: {len(self.dataframe)}")
 
@@ -262,6 +262,67 @@ def collate_fn(x: list["DataProtoItem"]):
     return DataProto(batch=batch, non_tensor_batch=non_tensor_batch)
 
 
+def _tensordict_to_buffers(batch: TensorDict) -> Optional[tuple[tuple, list[np.ndarray]]]:
+    """Split a TensorDict into a compact header and one flat uint8 array per tensor.
+
+    The arrays view the tensors' memory, so pickle protocol 5 and Ray's object store take them as
+    out-of-band buffers without copying them into the pickle stream. Older protocols still work,
+    the buffers are then pickled in-band. Returns None for batches this layout cannot describe
+    (non-tensor leaves, nested or sparse tensors, tensors requiring grad).
+
+    Args:
+        batch (TensorDict): the batch to serialize
+
+    Returns:
+        (header, buffers) or None
+    """
+    keys, dtypes, shapes, devices, buffers = [], [], [], [], []
+    for key, tensor in batch.items(include_nested=True, leaves_only=True):
+        if (
+            type(tensor) is not torch.Tensor
+            or tensor.layout != torch.strided
+            or tensor.is_nested
+            or tensor.requires_grad
+        ):
+            return None
+        keys.append(key)
+        dtypes.append(str(tensor.dtype).removeprefix("torch."))
+        shapes.append(tuple(tensor.shape))
+        devices.append(str(tensor.device))
+        buffers.append(tensor.detach().cpu().contiguous().reshape(-1).view(torch.uint8).numpy())
+    device = None if batch.device is None else str(batch.device)
+    header = (tuple(batch.batch_size), device, tuple(keys), tuple(dtypes), tuple(shapes), tuple(devices))
+    return header, buffers
+
+
+def _tensordict_from_buffers(header: tuple, buffers: list[np.ndarray]) -> TensorDict:
+    """Inverse of `_tensordict_to_buffers`.
+
+    Writable buffers (e.g. from pickle.loads) are shared with the tensors. Read-only ones (e.g.
+    views of Ray's object store) are copied once, since workers update batches in place. Tensors
+    that lived on an accelerator go back to it when one is available, as torch.load would.
+    """
+    batch_size, device, keys, dtypes, shapes, devices = header
+    accelerator = get_torch_device().is_available()
+    tensors = {}
+    for key, dtype, shape, tensor_device, buffer in zip(keys, dtypes, shapes, devices, buffers, strict=True):
+        if buffer.size == 0:
+            tensor = torch.empty(shape, dtype=getattr(torch, dtype))
+        else:
+            if not buffer.flags.writeable:
+                buffer = buffer.copy()
+            tensor = torch.from_numpy(buffer).view(getattr(torch, dtype)).view(shape)
+        if tensor_device != "cpu" and accelerator:
+            tensor = tensor.to(tensor_device)
+        tensors[key] = tensor
+    if device is not None and device != "cpu" and not accelerator:
+        device = "cpu"
+    batch = TensorDict({}, batch_size=batch_size, device=device)
+    for key, tensor in tensors.items():
+        batch[key] = tensor
+    return batch
+
+
 @dataclass
 class DataProtoItem:
     # TODO(zhangchi.usc1992) add consistency check
@@ -331,6 +392,15 @@ class DataProto:
             raise TypeError(f"Indexing with {type(item)} is not supported")
 
     def __getstate__(self):
+        # tensors travel as raw byte arrays that pickle protocol 5 (and Ray) hand over out-of-band,
+        # batches holding anything else fall back to torch.save
+        state = _tensordict_to_buffers(self.batch) if self.batch is not None else None
+        if state is not None:
+            header, buffers = state
+            return header, buffers, self.non_tensor_batch, self.meta_info
+        return self._torch_save_state()
+
+    def _torch_save_state(self):
         import io
 
         buffer = io.BytesIO()
@@ -343,6 +413,12 @@ class DataProto:
         return buffer_bytes, self.non_tensor_batch, self.meta_info
 
     def __setstate__(self, data):
+        if len(data) == 4:
+            header, buffers, non_tensor_batch, meta_info = data
+            self.batch = _tensordict_from_buffers(header, buffers)
+            self.non_tensor_batch = non_tensor_batch
+            self.meta_info = meta_info
+            return
         import io
 
         batch_deserialized_bytes, non_tensor_batch, meta_info = data
@@ -358,7 +434,7 @@ class DataProto:
 
     def save_to_disk(self, filepath):
         with open(filepath, "wb") as f:
-            pickle.dump(self, f)
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
 
     @staticmethod
     def load_from_disk(filepath) -> "DataProto":
@@ -20,7 +20,6 @@ implement PPO-like algorithms.
 
 __all__ = ["register_adv_est", "get_adv_estimator_fn", "AdvantageEstimator"]
 
-from collections import defaultdict
 from enum import Enum
 from typing import Any, Callable, Optional
 
@@ -207,6 +206,54 @@ def get_kl_controller(kl_ctrl):
         raise NotImplementedError
 
 
+def get_group_ids(index: np.ndarray | torch.Tensor, device=None) -> tuple[torch.Tensor, torch.Tensor]:
+    """Map the group index of every sample (e.g. the uid of its prompt) to dense group ids.
+
+    Args:
+        index: `(np.ndarray)` or `(torch.Tensor)`
+            shape: (bs,), sortable group labels
+        device: device of the returned tensors
+
+    Returns:
+        group_ids: `(torch.Tensor)`
+            shape: (bs,), the group of every sample, in [0, num_groups)
+        group_sizes: `(torch.Tensor)`
+            shape: (num_groups,), the number of samples in every group
+    """
+    if isinstance(index, torch.Tensor):
+        index = index.cpu().numpy()
+    _, group_ids, group_sizes = np.unique(np.asarray(index), return_inverse=True, return_counts=True)
+    group_ids = torch.as_tensor(group_ids.reshape(-1), dtype=torch.long, device=device)
+    return group_ids, torch.as_tensor(group_sizes, dtype=torch.long, device=device)
+
+
+def group_sum(values: torch.Tensor, group_ids: torch.Tensor, num_groups: int) -> torch.Tensor:
+    """Sum of `values` (bs,) over every group, shape (num_groups,)."""
+    return values.new_zeros(num_groups).scatter_add_(0, group_ids, values)
+
+
+def group_max(values: torch.Tensor, group_ids: torch.Tensor, num_groups: int) -> torch.Tensor:
+    """Maximum of `values` (bs,) over every group, shape (num_groups,). Every group must be non-empty."""
+    return values.new_zeros(num_groups).scatter_reduce_(0, group_ids, values, "amax", include_self=False)
+
+
+def group_mean(values: torch.Tensor, group_ids: torch.Tensor, group_sizes: torch.Tensor) -> torch.Tensor:
+    """Mean of `values` (bs,) over every group, shape (num_groups,)."""
+    return group_sum(values, group_ids, len(group_sizes)) / group_sizes
+
+
+def group_mean_std(
+    values: torch.Tensor, group_ids: torch.Tensor, group_sizes: torch.Tensor
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """Mean and unbiased std of `values` (bs,) over every group, as torch.mean and torch.std would give.
+
+    The std of a group with a single sample is nan, callers pick what such groups get.
+    """
+    mean = group_mean(values, group_ids, group_sizes)
+    square_sum = group_sum((values - mean[group_ids]).square(), group_ids, len(group_sizes))
+    return mean, (square_sum / (group_sizes - 1)).sqrt()
+
+
 @register_adv_est(AdvantageEstimator.GAE)  # or simply: @register_adv_est("gae")
 def compute_gae_advantage_return(
     token_level_rewards: torch.Tensor,
@@ -298,29 +345,17 @@ def compute_grpo_outcome_advantage(
     """
     scores = token_level_rewards.sum(dim=-1)
 
-    id2score = defaultdict(list)
-    id2mean = {}
-    id2std = {}
-
     with torch.no_grad():
-        bsz = scores.shape[0]
-        for i in range(bsz):
-            id2score[index[i]].append(scores[i])
-        for idx in id2score:
-            if len(id2score[idx]) == 1:
-                id2mean[idx] = torch.tensor(0.0)
-                id2std[idx] = torch.tensor(1.0)
-            elif len(id2score[idx]) > 1:
-                scores_tensor = torch.stack(id2score[idx])
-                id2mean[idx] = torch.mean(scores_tensor)
-                id2std[idx] = torch.std(scores_tensor)
-            else:
-                raise ValueError(f"no score in prompt index: {idx}")
-        for i in range(bsz):
-            if norm_adv_by_std_in_grpo:
-                scores[i] = (scores[i] - id2mean[index[i]]) / (id2std[index[i]] + epsilon)
-            else:
-                scores[i] = scores[i] - id2mean[index[i]]
+        group_ids, group_sizes = get_group_ids(index, device=scores.device)
+        mean, std = group_mean_std(scores, group_ids, group_sizes)
+        # the response of a single-response prompt keeps its score
+        single = group_sizes == 1
+        mean = mean.masked_fill(single, 0.0)
+        std = std.masked_fill(single, 1.0)
+        if norm_adv_by_std_in_grpo:
+            scores = (scores - mean[group_ids]) / (std[group_ids] + epsilon)
+        else:
+            scores = scores - mean[group_ids]
         scores = scores.unsqueeze(-1) * response_mask
 
     return scores, scores
@@ -348,23 +383,15 @@ def compute_loop_outcome_advantage(
     response_length = token_level_rewards.shape[-1]
     scores = token_level_rewards.sum(dim=-1)
 
-    id2samples = defaultdict(list)
-
     with torch.no_grad():
-        bsz = scores.shape[0]
-        for i in range(bsz):
-            id2samples[index[i]].append((i, scores[i]))
-        for group in id2samples.values():
-            group_size = len(group)
-            total_score = sum(score for _, score in group)
-            for i, score in group: # i is original index
-                loo_baseline = 0
-                if group_size == 1:
-                    print("Cannot compute LOO advantage using 1 sample. 0 baseline is used")
-                else:
-                    loo_baseline = (total_score - score) / (group_size - 1)
-                scores[i] = score - loo_baseline
-        
+        group_ids, group_sizes = get_group_ids(index, device=scores.device)
+        if (group_sizes == 1).any():
+            print("Cannot compute LOO advantage using 1 sample. 0 baseline is used")
+        sizes = group_sizes[group_ids]
+        total_score = group_sum(scores, group_ids, len(group_sizes))[group_ids]
+        loo_baseline = torch.where(sizes > 1, (total_score - scores) / (sizes - 1).clamp(min=1), 0.0)
+        scores = scores - loo_baseline
+
         scores = scores.unsqueeze(-1) * response_mask
     return scores, scores
 
@@ -402,30 +429,29 @@ def compute_grpo_passk_outcome_advantage(
     scores = token_level_rewards.sum(dim=-1)  # (bs,)
     advantages = torch.zeros_like(scores)
 
-    id2scores = defaultdict(list)
-    id2indices = defaultdict(list)
-
     with torch.no_grad():
-        bsz = scores.shape[0]
-        for i in range(bsz):
-            idx = index[i]
-            id2scores[idx].append(scores[i])
-            id2indices[idx].append(i)
-
-        for idx in id2scores:
-            rewards = torch.stack(id2scores[idx])  # (k,)
-            if rewards.numel() < 2:
-                raise ValueError(
-                    f"Pass@k requires at least 2 samples per group. Got {rewards.numel()} for group {idx}."
-                )
-            topk, topk_idx = torch.topk(rewards, 2)
-            r_max, r_second_max = topk[0], topk[1]
-            i_max = id2indices[idx][topk_idx[0].item()]
-            advantage = r_max - r_second_max
-            if norm_adv_by_std_in_grpo:
-                std = torch.std(rewards)
-                advantage = advantage / (std + epsilon)
-            advantages[i_max] = advantage
+        group_ids, group_sizes = get_group_ids(index, device=scores.device)
+        num_groups = len(group_sizes)
+        too_small = (group_sizes[group_ids] < 2).nonzero()
+        if len(too_small) > 0:
+            i = too_small[0].item()
+            raise ValueError(
+                f"Pass@k requires at least 2 samples per group. Got {group_sizes[group_ids[i]].item()} "
+                f"for group {index[i]}."
+            )
+        r_max = group_max(scores, group_ids, num_groups)
+        # the best response of every group is its first sample reaching the maximum
+        positions = torch.arange(len(scores), device=scores.device)
+        is_max = scores == r_max[group_ids]
+        i_max = positions.new_full((num_groups,), len(scores))
+        i_max.scatter_reduce_(0, group_ids[is_max], positions[is_max], "amin")
+        others = scores.index_fill(0, i_max, float("-inf"))
+        r_second_max = group_max(others, group_ids, num_groups)
+        advantage = r_max - r_second_max
+        if norm_adv_by_std_in_grpo:
+            _, std = group_mean_std(scores, group_ids, group_sizes)
+            advantage = advantage / (std + epsilon)
+        advantages[i_max] = advantage
 
     advantages = advantages.unsqueeze(-1) * response_mask
     return advantages, advantages
@@ -462,22 +488,10 @@ def compute_reinforce_plus_plus_baseline_outcome_advantage(
     response_length = token_level_rewards.shape[-1]
     scores = token_level_rewards.sum(dim=-1)
 
-    id2score = defaultdict(list)
-    id2mean = {}
-
     with torch.no_grad():
-        bsz = scores.shape[0]
-        for i in range(bsz):
-            id2score[index[i]].append(scores[i])
-        for idx in id2score:
-            if len(id2score[idx]) == 1:
-                id2mean[idx] = torch.tensor(0.0)
-            elif len(id2score[idx]) > 1:
-                id2mean[idx] = torch.mean(torch.stack(id2score[idx]))
-            else:
-                raise ValueError(f"no score in prompt index: {idx}")
-        for i in range(bsz):
-            scores[i] = scores[i] - id2mean[index[i]]
+        group_ids, group_sizes = get_group_ids(index, device=scores.device)
+        mean = group_mean(scores, group_ids, group_sizes).masked_fill(group_sizes == 1, 0.0)
+        scores = scores - mean[group_ids]
 
         scores = scores.unsqueeze(-1).tile([1, response_length]) * response_mask
         scores = verl_F.masked_whiten(scores, response_mask) * response_mask
@@ -512,26 +526,14 @@ def compute_rloo_outcome_advantage(
     """
     scores = token_level_rewards.sum(dim=-1)
 
-    id2score = defaultdict(list)
-    id2mean = {}
-
     with torch.no_grad():
-        bsz = scores.shape[0]
-        for i in range(bsz):
-            id2score[index[i]].append(scores[i])
-        for idx in id2score:
-            if len(id2score[idx]) == 1:
-                id2mean[idx] = torch.tensor(0.0)
-            elif len(id2score[idx]) > 1:
-                id2mean[idx] = torch.mean(torch.stack(id2score[idx]))
-            else:
-                raise ValueError(f"no score in prompt index: {idx}")
-        for i in range(bsz):
-            response_num = len(id2score[index[i]])
-            if response_num > 1:
-                scores[i] = scores[i] * response_num / (response_num - 1) - id2mean[index[i]] * response_num / (
-                    response_num - 1
-                )
+        group_ids, group_sizes = get_group_ids(index, device=scores.device)
+        mean = group_mean(scores, group_ids, group_sizes)[group_ids]
+        response_num = group_sizes[group_ids]
+        others = (response_num - 1).clamp(min=1)
+        # a single-response prompt has no baseline, its response keeps its score
+        loo_scores = scores * response_num / others - mean * response_num / others
+        scores = torch.where(response_num > 1, loo_scores, scores)
         scores = scores.unsqueeze(-1) * response_mask
 
     return scores, scores
@@ -565,27 +567,15 @@ def compute_opo_outcome_advantage(
     response_length = response_mask.sum(dim=-1)
     scores = token_level_rewards.sum(dim=-1)
 
-    id2score = defaultdict(list)
-    id2len = defaultdict(list)
-    id2bsl = {}
-
     with torch.no_grad():
-        bsz = scores.shape[0]
-        for i in range(bsz):
-            id2score[index[i]].append(scores[i])
-            id2len[index[i]].append(response_length[i])
-
-        for idx in id2score:
-            if len(id2score[idx]) == 1:
-                id2bsl[idx] = torch.tensor(0.0)
-            elif len(id2score[idx]) > 1:
-                score_tensor = torch.stack(id2score[idx])
-                len_tensor = torch.stack(id2len[idx])
-                id2bsl[idx] = (len_tensor * score_tensor).sum() / len_tensor.sum()
-            else:
-                raise ValueError(f"no score in prompt index: {idx}")
-        for i in range(bsz):
-            scores[i] = scores[i] - id2bsl[index[i]]
+        group_ids, group_sizes = get_group_ids(index, device=scores.device)
+        num_groups = len(group_sizes)
+        response_length = response_length.to(scores.dtype)
+        baseline = group_sum(response_length * scores, group_ids, num_groups) / group_sum(
+            response_length, group_ids, num_groups
+        )
+        baseline = baseline.masked_fill(group_sizes == 1, 0.0)
+        scores = scores - baseline[group_ids]
         scores = scores.unsqueeze(-1) * response_mask
 
     return scores, scores
@@ -700,30 +690,14 @@ def compute_gpg_outcome_advantage(
     """
     scores = token_level_rewards.sum(dim=-1)
 
-    id2score = defaultdict(list)
-    id2mean = {}
-    id2std = {}
-
     with torch.no_grad():
         bsz = scores.shape[0]
         m = torch.count_nonzero(scores)
         alpha = bsz / m.clamp(min=1)
 
-        for i in range(bsz):
-            id2score[index[i]].append(scores[i])
-
-        for idx in id2score:
-            if len(id2score[idx]) == 1:
-                id2mean[idx] = torch.tensor(0.0)
-                id2std[idx] = torch.tensor(1.0)
-            elif len(id2score[idx]) > 1:
-                scores_tensor = torch.stack(id2score[idx])
-                id2mean[idx] = torch.mean(scores_tensor)
-                id2std[idx] = torch.std(scores_tensor)
-            else:
-                raise ValueError(f"no score in prompt index: {idx}")
-        for i in range(bsz):
-            scores[i] = alpha * (scores[i] - id2mean[index[i]]) / (f_norm)
+        group_ids, group_sizes = get_group_ids(index, device=scores.device)
+        mean = group_mean(scores, group_ids, group_sizes).masked_fill(group_sizes == 1, 0.0)
+        scores = alpha * (scores - mean[group_ids]) / (f_norm)
         scores = scores.unsqueeze(-1) * response_mask
 
     return scores, scores
@@ -17,6 +17,8 @@ Multi-turn SFT dataset that supports training on conversation data with multiple
 """
 
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
 from typing import Any, Optional
 
 import numpy as np
@@ -27,6 +29,13 @@ from torch.utils.data import Dataset
 from transformers import PreTrainedTokenizer
 
 from verl.utils import hf_tokenizer
+from verl.utils.dataset.token_cache import (
+    TokenStoreWriter,
+    files_fingerprint,
+    fingerprint,
+    load_or_build_store,
+    tokenizer_fingerprint,
+)
 from verl.utils.fs import copy_local_path_from_hdfs
 from verl.utils.model import compute_position_id_with_mask
 from verl.utils.torch_functional import pad_sequence_to_length, postprocess_data
@@ -45,6 +54,22 @@ def convert_nested_value_to_list_recursive(data_item):
         return data_item
 
 
+_cache_dataset = None
+
+
+def _init_cache_worker(dataset):
+    global _cache_dataset
+    _cache_dataset = dataset
+
+
+def _tokenize_rows(indices: list[int]) -> list[tuple[np.ndarray, np.ndarray, int]]:
+    rows = []
+    for index in indices:
+        input_ids, loss_mask, _, prompt_length = _cache_dataset._tokenize(index, with_prompt_length=True)
+        rows.append((input_ids.numpy(), loss_mask.numpy(), prompt_length))
+    return rows
+
+
 class MultiTurnSFTDataset(Dataset):
     """
     Dataset for multi-turn conversations where each assistant response should be trained
@@ -69,6 +94,10 @@ class MultiTurnSFTDataset(Dataset):
         self.tools_key = multiturn_config.get("tools_key", "tools")
         self.enable_thinking_key = multiturn_config.get("enable_thinking_key", "enable_thinking")
         self.apply_chat_template_kwargs = config.get("apply_chat_template_kwargs", {})
+        # Pre-tokenized cache: conversations are tokenized once into a memory-mapped store under cache_dir
+        self.cache_dir = multiturn_config.get("cache_dir", None)
+        self.cache_workers = multiturn_config.get("cache_workers", max(1, min(8, os.cpu_count() // 4)))
+        self.cache_chunk_size = multiturn_config.get("cache_chunk_size", 64)
         assert self.truncation in ["error", "left", "right"]
 
         if not isinstance(parquet_files, list | ListConfig):
@@ -81,6 +110,7 @@ class MultiTurnSFTDataset(Dataset):
 
         self._download()
         self._read_files_and_process()
+        self.token_store = self._load_token_store() if self.cache_dir else None
 
     def _download(self):
         for i, parquet_file in enumerate(self.parquet_files):
@@ -118,6 +148,46 @@ class MultiTurnSFTDataset(Dataset):
     def __len__(self):
         return len(self.messages)
 
+    def _token_store_path(self) -> str:
+        key = fingerprint(
+            tokenizer_fingerprint(self.tokenizer),
+            self.apply_chat_template_kwargs,
+            [self.messages_key, self.tools_key, self.enable_thinking_key],
+            files_fingerprint(self.parquet_files),
+        )
+        return os.path.join(os.path.expanduser(self.cache_dir), "multiturn_sft", key)
+
+    def _build_token_store(self, path: str):
+        writer = TokenStoreWriter(
+            path, ragged={"input_ids": "int32", "loss_mask": "uint8"}, scalars={"prompt_length": "int64"}
+        )
+        chunks = [
+            list(range(start, min(start + self.cache_chunk_size, len(self))))
+            for start in range(0, len(self), self.cache_chunk_size)
+        ]
+        if self.cache_workers > 1 and len(chunks) > 1:
+            executor = ProcessPoolExecutor(self.cache_workers, initializer=_init_cache_worker, initargs=(self,))
+            results = executor.map(_tokenize_rows, chunks)
+        else:
+            executor = None
+            _init_cache_worker(self)
+            results = map(_tokenize_rows, chunks)
+        try:
+            for rows in results:
+                for input_ids, loss_mask, prompt_length in rows:
+                    writer.append(input_ids=input_ids, loss_mask=loss_mask, prompt_length=prompt_length)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        writer.close()
+
+    def _load_token_store(self):
+        path = self._token_store_path()
+        store = load_or_build_store(path, self._build_token_store)
+        assert len(store) == len(self), f"token cache {path} has {len(store)} rows, dataset has {len(self)}"
+        logging.info(f"Using pre-tokenized multi-turn SFT cache {path} ({int(store.lengths().sum())} tokens)")
+        return store
+
     def _process_message_tokens(
         self,
         messages: list[dict[str, Any]],
@@ -238,7 +308,11 @@ class MultiTurnSFTDataset(Dataset):
             torch.tensor(concat_attention_mask, dtype=torch.long),
         )
 
-    def __getitem__(self, item):
+    def _tokenize(self, item, with_prompt_length: bool = False):
+        """
+        Tokens of conversation `item`: (input_ids, loss_mask, attention_mask, prompt_length), where
+        prompt_length, the number of tokens up to the first assistant reply, is only computed on request.
+        """
         tokenizer = self.tokenizer
         messages = self.messages[item]
         tools = self.tools[item] if self.tools is not None else None
@@ -322,6 +396,31 @@ class MultiTurnSFTDataset(Dataset):
         else:
             raise ValueError(f"Unknown role: {messages[0]['role']}")
 
+        prompt_length = None
+        if with_prompt_length:
+            prompt_str = self.tokenizer.apply_chat_template(
+                messages[:prompt_message_length],
+                tools=tools,
+                tokenize=False,
+                add_generation_prompt=True,
+                enable_thinking=enable_thinking,
+                **self.apply_chat_template_kwargs,
+            )
+            prompt_length = len(self.tokenizer.encode(prompt_str, add_special_tokens=False))
+
+        return input_ids, loss_mask, attention_mask, prompt_length
+
+    def __getitem__(self, item):
+        if self.token_store is not None:
+            input_ids = torch.from_numpy(self.token_store.get("input_ids", item)).long()
+            loss_mask = torch.from_numpy(self.token_store.get("loss_mask", item)).long()
+            attention_mask = torch.ones_like(input_ids)
+            prompt_length = int(self.token_store.scalars["prompt_length"][item])
+        else:
+            input_ids, loss_mask, attention_mask, prompt_length = self._tokenize(
+                item, with_prompt_length=self.pad_mode == "left_right"
+            )
+
         sequence_length = input_ids.shape[0]
         # Handle sequence length
         if self.pad_mode == "right":
@@ -362,16 +461,6 @@ class MultiTurnSFTDataset(Dataset):
             }
         elif self.pad_mode == "left_right":
             assert self.truncation == "error", "Only support error truncation for left_right pad mode"
-            prompt_str = self.tokenizer.apply_chat_template(
-                messages[:prompt_message_length],
-                tools=tools,
-                tokenize=False,
-                add_generation_prompt=True,
-                enable_thinking=enable_thinking,
-                **self.apply_chat_template_kwargs,
-            )
-            prompt_ids = self.tokenizer.encode(prompt_str, add_special_tokens=False)
-            prompt_length = len(prompt_ids)
             prompt_ids = input_ids[:prompt_length].unsqueeze(0)
             prompt_attention_mask = attention_mask[:prompt_length].unsqueeze(0)
             prompt_loss_mask = loss_mask[:prompt_length].unsqueeze(0)
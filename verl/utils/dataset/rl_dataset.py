@@ -29,6 +29,13 @@ from torch.utils.data import Dataset
 from transformers import PreTrainedTokenizer, ProcessorMixin
 
 import verl.utils.torch_functional as verl_F
+from verl.utils.dataset.token_cache import (
+    TokenStoreWriter,
+    files_fingerprint,
+    fingerprint,
+    load_or_build_store,
+    tokenizer_fingerprint,
+)
 from verl.utils.model import compute_position_id_with_mask
 
 logger = logging.getLogger(__name__)
@@ -72,7 +79,9 @@ class RLHFDataset(Dataset):
     - Caches files locally.
     - Reads into a HuggingFace Dataset and tokenizes prompts.
     - Optionally handles images/videos via a ProcessorMixin.
-    - Filters prompts over a max length.
+    - Filters prompts over a max length, with the prompt lengths of each file computed once and
+      cached under cache_dir. They are kept in `prompt_lengths`, aligned with the dataset, e.g. for
+      length-aware samplers.
     - Supports resuming from checkpoints.
 
     Args:
@@ -117,6 +126,8 @@ class RLHFDataset(Dataset):
         self.filter_prompts = config.get("filter_prompts", True)
         self.serialize_dataset = False
         self.return_multi_modal_inputs = config.get("return_multi_modal_inputs", True)
+        # Token lengths of the prompts, set when overlong prompts are filtered
+        self.prompt_lengths: Optional[np.ndarray] = None
 
         self._download()
         self._read_files_and_tokenize()
@@ -138,52 +149,90 @@ class RLHFDataset(Dataset):
 
         print(f"dataset len: {len(self.dataframe)}")
 
-        self.dataframe = self.maybe_filter_out_long_prompts(self.dataframe)
-
-    def maybe_filter_out_long_prompts(self, dataframe: datasets.Dataset = None):
-        # filter out too long prompts
+        prompt_lengths = None
         if self.filter_overlong_prompts:
-            tokenizer = self.tokenizer
-            processor = self.processor
-            prompt_key = self.prompt_key
-            image_key = self.image_key
-            video_key = self.video_key
-
-            if processor is not None:
-                from verl.utils.dataset.vision_utils import process_image, process_video
-
-                def doc2len(doc) -> int:
-                    messages = self._build_messages(doc)
-                    raw_prompt = self.processor.apply_chat_template(
-                        messages, add_generation_prompt=True, tokenize=False, **self.apply_chat_template_kwargs
-                    )
-                    images = (
-                        [process_image(image) for image in doc[image_key]]
-                        if image_key in doc and doc[image_key]
-                        else None
-                    )
-                    videos = (
-                        [process_video(video) for video in doc[video_key]]
-                        if video_key in doc and doc[video_key]
-                        else None
-                    )
-
-                    return len(processor(text=[raw_prompt], images=images, videos=videos)["input_ids"][0])
+            prompt_lengths = np.concatenate(
+                [
+                    self._load_prompt_lengths(dataframe, file)
+                    for dataframe, file in zip(dataframes, self.data_files, strict=True)
+                ]
+            )
+        self.dataframe = self.maybe_filter_out_long_prompts(self.dataframe, prompt_lengths)
+        if prompt_lengths is not None:
+            self.prompt_lengths = prompt_lengths[prompt_lengths <= self.max_prompt_length]
 
-            else:
+    def _doc2len(self, doc) -> int:
+        if self.processor is not None:
+            from verl.utils.dataset.vision_utils import process_image, process_video
 
-                def doc2len(doc) -> int:
-                    return len(
-                        tokenizer.apply_chat_template(
-                            doc[prompt_key], add_generation_prompt=True, **self.apply_chat_template_kwargs
-                        )
-                    )
+            messages = self._build_messages(doc)
+            raw_prompt = self.processor.apply_chat_template(
+                messages, add_generation_prompt=True, tokenize=False, **self.apply_chat_template_kwargs
+            )
+            images = (
+                [process_image(image) for image in doc[self.image_key]]
+                if self.image_key in doc and doc[self.image_key]
+                else None
+            )
+            videos = (
+                [process_video(video) for video in doc[self.video_key]]
+                if self.video_key in doc and doc[self.video_key]
+                else None
+            )
 
-            dataframe = dataframe.filter(
-                lambda doc: doc2len(doc) <= self.max_prompt_length,
-                num_proc=self.num_workers,
-                desc=f"Filtering prompts longer than {self.max_prompt_length} tokens",
+            return len(self.processor(text=[raw_prompt], images=images, videos=videos)["input_ids"][0])
+
+        return len(
+            self.tokenizer.apply_chat_template(
+                doc[self.prompt_key], add_generation_prompt=True, **self.apply_chat_template_kwargs
             )
+        )
+
+    def _load_prompt_lengths(self, dataframe: datasets.Dataset, parquet_file: str) -> np.ndarray:
+        """Prompt lengths of a parquet file, cached by tokenizer, processor, template kwargs and file."""
+        processor = None
+        if self.processor is not None:
+            image_processor = getattr(self.processor, "image_processor", None)
+            processor = [
+                type(self.processor).__name__,
+                getattr(self.processor, "chat_template", None),
+                image_processor.to_dict() if image_processor is not None else None,
+            ]
+        key = fingerprint(
+            tokenizer_fingerprint(self.tokenizer),
+            processor,
+            self.apply_chat_template_kwargs,
+            [self.prompt_key, self.image_key, self.video_key],
+            files_fingerprint([parquet_file]),
+        )
+
+        def build(path):
+            lengths = dataframe.map(
+                lambda doc: {"prompt_length": self._doc2len(doc)},
+                remove_columns=dataframe.column_names,
+                num_proc=self.num_workers,
+                desc=f"Computing prompt lengths of {os.path.basename(parquet_file)}",
+            )["prompt_length"]
+            writer = TokenStoreWriter(path, ragged={}, scalars={"prompt_length": "int64"})
+            for length in lengths:
+                writer.append(prompt_length=length)
+            writer.close()
+
+        store = load_or_build_store(os.path.join(self.cache_dir, "prompt_lengths", key), build)
+        assert len(store) == len(dataframe), f"cached prompt lengths of {parquet_file} do not match its rows"
+        return np.array(store.scalars["prompt_length"])
+
+    def maybe_filter_out_long_prompts(self, dataframe: datasets.Dataset = None, prompt_lengths: np.ndarray = None):
+        # filter out too long prompts
+        if self.filter_overlong_prompts:
+            if prompt_lengths is not None:
+                dataframe = dataframe.select(np.flatnonzero(prompt_lengths <= self.max_prompt_length))
+            else:
+                dataframe = dataframe.filter(
+                    lambda doc: self._doc2len(doc) <= self.max_prompt_length,
+                    num_proc=self.num_workers,
+                    desc=f"Filtering prompts longer than {self.max_prompt_length} tokens",
+                )
 
             print(f"filter dataset len: {len(dataframe)}")
         return dataframe
@@ -286,6 +335,8 @@ class RLHFDataset(Dataset):
             model_inputs = self.tokenizer(raw_prompt, return_tensors="pt", add_special_tokens=False)
             input_ids = model_inputs.pop("input_ids")
             attention_mask = model_inputs.pop("attention_mask")
+            # the same ids as tokenizer.encode(raw_prompt), so the prompt is not tokenized twice
+            raw_prompt_ids = input_ids[0].tolist()
 
         input_ids, attention_mask = verl_F.postprocess_data(
             input_ids=input_ids,
@@ -317,7 +368,8 @@ class RLHFDataset(Dataset):
         row_dict["attention_mask"] = attention_mask[0]
         row_dict["position_ids"] = position_ids[0]
 
-        raw_prompt_ids = self.tokenizer.encode(raw_prompt, add_special_tokens=False)
+        if self.processor is not None:
+            raw_prompt_ids = self.tokenizer.encode(raw_prompt, add_special_tokens=False)
         if len(raw_prompt_ids) > self.max_prompt_length:
             if self.truncation == "left":
                 raw_prompt_ids = raw_prompt_ids[-self.max_prompt_length :]
@@ -0,0 +1,162 @@
+# Copyright 2024  Ltd. and/or its affiliates
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+On-disk token caches for the datasets.
+
+A cache lives in a directory named after a fingerprint of everything its tokens depend on (the
+tokenizer's vocabulary and chat template, the chat template kwargs and the data files), so a changed
+tokenizer, template or file gets a new cache instead of stale tokens.
+
+The store is columnar: ragged columns (e.g. input_ids, loss_mask) are concatenated into one flat
+binary file each and share an offsets array, scalar columns (e.g. prompt lengths) are one array each.
+Everything is memory-mapped, so a row is a slice of the mapping and no process loads the whole store.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Callable, Optional
+
+import numpy as np
+
+META_FILE = "meta.json"
+OFFSETS_FILE = "offsets.npy"
+
+
+def fingerprint(*parts) -> str:
+    """Stable hash of JSON-serializable parts."""
+    data = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()[:32]
+
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    """Hash of what decides a tokenizer's output: its class, vocabulary, special tokens and chat template."""
+    vocab = sorted(tokenizer.get_vocab().items(), key=lambda item: item[1])
+    return fingerprint(
+        type(tokenizer).__name__,
+        vocab,
+        getattr(tokenizer, "special_tokens_map", {}),
+        getattr(tokenizer, "chat_template", None),
+        getattr(tokenizer, "padding_side", None),
+    )
+
+
+def files_fingerprint(paths: list[str]) -> list:
+    """Identity of local data files: absolute path, size and modification time."""
+    stats = []
+    for path in paths:
+        stat = os.stat(path)
+        stats.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+    return stats
+
+
+class TokenStoreWriter:
+    """Appends rows to a new store at `path`; `close` writes the offsets, scalars and metadata."""
+
+    def __init__(self, path: str, ragged: dict[str, str], scalars: Optional[dict[str, str]] = None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.ragged = {name: np.dtype(dtype) for name, dtype in ragged.items()}
+        self.scalars = {name: np.dtype(dtype) for name, dtype in (scalars or {}).items()}
+        self.files = {name: open(os.path.join(path, f"{name}.bin"), "wb") for name in self.ragged}
+        self.lengths = []
+        self.scalar_values = {name: [] for name in self.scalars}
+
+    def append(self, **values):
+        length = None
+        for name, dtype in self.ragged.items():
+            array = np.asarray(values[name], dtype=dtype)
+            if length is None:
+                length = len(array)
+            assert len(array) == length, f"ragged column {name} has {len(array)} values, expected {length}"
+            self.files[name].write(array.tobytes())
+        self.lengths.append(length or 0)
+        for name in self.scalars:
+            self.scalar_values[name].append(values[name])
+
+    def close(self):
+        for file in self.files.values():
+            file.close()
+        offsets = np.zeros(len(self.lengths) + 1, dtype=np.int64)
+        np.cumsum(self.lengths, out=offsets[1:])
+        np.save(os.path.join(self.path, OFFSETS_FILE), offsets)
+        for name, dtype in self.scalars.items():
+            np.save(os.path.join(self.path, f"{name}.npy"), np.asarray(self.scalar_values[name], dtype=dtype))
+        meta = {
+            "num_rows": len(self.lengths),
+            "ragged": {name: dtype.str for name, dtype in self.ragged.items()},
+            "scalars": {name: dtype.str for name, dtype in self.scalars.items()},
+        }
+        # written last: a directory without meta.json is an unfinished store
+        with open(os.path.join(self.path, META_FILE), "w") as f:
+            json.dump(meta, f)
+
+
+class TokenStore:
+    """Read side of a store written by TokenStoreWriter."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        # copy-on-write mappings are writable, so torch.from_numpy shares them without a warning
+        self.offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="c")
+        self.columns = {}
+        for name, dtype in self.meta["ragged"].items():
+            file = os.path.join(path, f"{name}.bin")
+            if os.path.getsize(file) == 0:
+                self.columns[name] = np.empty(0, dtype=dtype)
+            else:
+                self.columns[name] = np.memmap(file, dtype=dtype, mode="c")
+        self.scalars = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="c") for name in self.meta["scalars"]
+        }
+
+    def __reduce__(self):
+        # reopened by path in dataloader workers instead of pickling the mapped arrays
+        return TokenStore, (self.path,)
+
+    def __len__(self):
+        return self.meta["num_rows"]
+
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def get(self, name: str, index: int) -> np.ndarray:
+        """Row `index` of ragged column `name`, as a view of the mapping."""
+        return self.columns[name][self.offsets[index] : self.offsets[index + 1]]
+
+
+def is_store(path: str) -> bool:
+    return os.path.exists(os.path.join(path, META_FILE))
+
+
+def load_or_build_store(path: str, build: Callable[[str], None]) -> TokenStore:
+    """
+    Open the store at `path`, first running `build(tmp_path)` to write it if it does not exist yet.
+    Concurrent processes (e.g. the ranks of a job) wait for the one building it.
+    """
+    from filelock import FileLock
+
+    if not is_store(path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with FileLock(f"{path}.lock"):
+            if not is_store(path):
+                tmp_path = f"{path}.tmp{os.getpid()}"
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                build(tmp_path)
+                shutil.rmtree(path, ignore_errors=True)
+                os.replace(tmp_path, path)
+    return TokenStore(path)
@@ -20,6 +20,13 @@ import torch
 from verl import DataProto
 from verl.workers.reward_manager import register
 from verl.workers.reward_manager.abstract import AbstractRewardManager, RawRewardFn
+from verl.workers.reward_manager.utils import (
+    ScorePool,
+    decode_prompt,
+    decode_responses,
+    get_ground_truths,
+    get_valid_response_lengths,
+)
 
 
 @register("batch")
@@ -32,46 +39,57 @@ class BatchRewardManager(AbstractRewardManager):
         num_examine (int): The number of responses to examine.
         compute_score (callable): The function to compute the rewards.
         reward_fn_key (str): The key to use for the reward function.
+        num_workers (int): The number of processes of a persistent pool among which the batch is split for
+            `compute_score`. If 0, the whole batch is scored in this process. `compute_score` must be picklable
+            to use a pool.
         reward_kwargs (dict): The keyword arguments to pass to the reward function.
     """
 
     def __init__(
-        self, tokenizer, num_examine, compute_score: RawRewardFn, reward_fn_key="data_source", **reward_kwargs
+        self,
+        tokenizer,
+        num_examine,
+        compute_score: RawRewardFn,
+        reward_fn_key="data_source",
+        num_workers: int = 0,
+        **reward_kwargs,
     ):
         self.tokenizer = tokenizer
         self.num_examine = num_examine
         self.compute_score = compute_score
         self.reward_fn_key = reward_fn_key
         self.reward_kwargs = reward_kwargs
+        self.score_pool = ScorePool(compute_score, num_workers) if num_workers > 0 else None
 
     def verify(self, data):
-        prompt_ids = data.batch["prompts"]
-        response_ids = data.batch["responses"]
-        attention_mask = data.batch["attention_mask"]
-
-        prompt_len = prompt_ids.shape[-1]
-        valid_response_lengths = attention_mask[:, prompt_len:].sum(dim=-1)
-
-        responses_str = []
-        for i in range(len(data)):
-            valid_len = valid_response_lengths[i]
-            valid_response_ids = response_ids[i][:valid_len]
-            response_str = self.tokenizer.decode(valid_response_ids, skip_special_tokens=True)
-            responses_str.append(response_str)
-
-        ground_truths = [item.non_tensor_batch["reward_model"].get("ground_truth", None) for item in data]
+        responses_str, _ = decode_responses(self.tokenizer, data)
+        ground_truths = get_ground_truths(data, strict=False)
         data_sources = data.non_tensor_batch[self.reward_fn_key]
         extras = data.non_tensor_batch.get("extra_info", [None] * len(data))
 
-        scores = self.compute_score(
-            data_sources=data_sources,
-            solution_strs=responses_str,
-            ground_truths=ground_truths,
-            extra_infos=extras,
-            **self.reward_kwargs,
-        )
-
-        return scores
+        if self.score_pool is None:
+            return self.compute_score(
+                data_sources=data_sources,
+                solution_strs=responses_str,
+                ground_truths=ground_truths,
+                extra_infos=extras,
+                **self.reward_kwargs,
+            )
+
+        # one contiguous chunk of the batch per worker
+        num_chunks = min(self.score_pool.num_workers, len(data))
+        bounds = [len(data) * chunk // num_chunks for chunk in range(num_chunks + 1)]
+        chunks = [
+            dict(
+                data_sources=data_sources[start:end],
+                solution_strs=responses_str[start:end],
+                ground_truths=ground_truths[start:end],
+                extra_infos=extras[start:end],
+                **self.reward_kwargs,
+            )
+            for start, end in zip(bounds[:-1], bounds[1:], strict=True)
+        ]
+        return [score for chunk_scores in self.score_pool.map(chunks) for score in chunk_scores]
 
     def __call__(self, data: DataProto, return_dict: bool = False) -> torch.Tensor | dict[str, Any]:
         # If there is rm score, we directly return rm score. Otherwise, we compute via rm_score_fn
@@ -86,9 +104,7 @@ class BatchRewardManager(AbstractRewardManager):
         reward_tensor = torch.zeros_like(data.batch["responses"], dtype=torch.float32)
         reward_extra_info = defaultdict(list)
         prompt_ids = data.batch["prompts"]
-        prompt_len = prompt_ids.shape[-1]
-        attention_mask = data.batch["attention_mask"]
-        valid_response_lengths = attention_mask[:, prompt_len:].sum(dim=-1)
+        valid_response_lengths = get_valid_response_lengths(data)
         data_sources = data.non_tensor_batch[self.reward_fn_key]
 
         scores = self.verify(data)
@@ -96,7 +112,6 @@ class BatchRewardManager(AbstractRewardManager):
         already_printed: dict[str, Any] = {}
 
         for i in range(len(data)):
-            length = valid_response_lengths[i].item()
             score = scores[i]
 
             if isinstance(score, dict):
@@ -107,13 +122,13 @@ class BatchRewardManager(AbstractRewardManager):
                 reward = score
 
             rewards.append(reward)
-            reward_tensor[i, length - 1] = reward
 
             data_source = data_sources[i]
             if already_printed.get(data_source, 0) < self.num_examine:
+                length = valid_response_lengths[i].item()
                 response_str = self.tokenizer.decode(data.batch["responses"][i][:length], skip_special_tokens=True)
-                prompt_str = self.tokenizer.decode(data.batch["prompts"][i], skip_special_tokens=True)
-                ground_truth = data[i].non_tensor_batch["reward_model"].get("ground_truth", None)
+                prompt_str = decode_prompt(self.tokenizer, data, i)
+                ground_truth = data.non_tensor_batch["reward_model"][i].get("ground_truth", None)
                 print("[prompt]", prompt_str)
                 print("[response]", response_str)
                 print("[ground_truth]", ground_truth)
@@ -121,6 +136,7 @@ class BatchRewardManager(AbstractRewardManager):
                 already_printed[data_source] = already_printed.get(data_source, 0) + 1
 
         data.batch["acc"] = torch.tensor(rewards, dtype=torch.float32, device=prompt_ids.device)
+        reward_tensor[torch.arange(len(data)), valid_response_lengths - 1] = data.batch["acc"].to(reward_tensor.device)
 
         if return_dict:
             return {"reward_tensor": reward_tensor, "reward_extra_info": reward_extra_info}
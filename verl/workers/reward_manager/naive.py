@@ -21,13 +21,16 @@ from verl import DataProto
 from verl.utils.reward_score import default_compute_score
 from verl.workers.reward_manager import register
 from verl.workers.reward_manager.abstract import AbstractRewardManager
+from verl.workers.reward_manager.utils import ScorePool, decode_prompt, decode_responses, get_ground_truths
 
 
 @register("naive")
 class NaiveRewardManager(AbstractRewardManager):
     """The reward manager."""
 
-    def __init__(self, tokenizer, num_examine, compute_score=None, reward_fn_key="data_source") -> None:
+    def __init__(
+        self, tokenizer, num_examine, compute_score=None, reward_fn_key="data_source", num_workers: int = 0
+    ) -> None:
         """
         Initialize the NaiveRewardManager instance.
 
@@ -37,11 +40,14 @@ class NaiveRewardManager(AbstractRewardManager):
             compute_score: A function to compute the reward score. If None, `default_compute_score` will be used.
             reward_fn_key: The key used to access the data source in the non-tensor batch data. Defaults to
                 "data_source".
+            num_workers: The number of processes of a persistent pool that runs `compute_score`. If 0, the scores
+                are computed in this process. `compute_score` must be picklable to use a pool.
         """
         self.tokenizer = tokenizer  # Store the tokenizer for decoding token IDs
         self.num_examine = num_examine  # the number of batches of decoded responses to print to the console
         self.compute_score = compute_score or default_compute_score
         self.reward_fn_key = reward_fn_key  # Store the key for accessing the data source
+        self.score_pool = ScorePool(self.compute_score, num_workers) if num_workers > 0 else None
 
     def __call__(self, data: DataProto, return_dict: bool = False) -> torch.Tensor | dict[str, Any]:
         """We will expand this function gradually based on the available datasets"""
@@ -60,37 +66,33 @@ class NaiveRewardManager(AbstractRewardManager):
 
         already_print_data_sources = {}
 
-        for i in range(len(data)):
-            data_item = data[i]  # DataProtoItem
-
-            prompt_ids = data_item.batch["prompts"]
-
-            prompt_length = prompt_ids.shape[-1]
-
-            valid_prompt_length = data_item.batch["attention_mask"][:prompt_length].sum()
-            valid_prompt_ids = prompt_ids[-valid_prompt_length:]
-
-            response_ids = data_item.batch["responses"]
-            valid_response_length = data_item.batch["attention_mask"][prompt_length:].sum()
-            valid_response_ids = response_ids[:valid_response_length]
-
-            # decode
-            prompt_str = self.tokenizer.decode(valid_prompt_ids, skip_special_tokens=True)
-            response_str = self.tokenizer.decode(valid_response_ids, skip_special_tokens=True)
+        # columns of the whole batch, instead of a DataProtoItem per sample
+        responses_str, valid_response_lengths = decode_responses(self.tokenizer, data)
+        ground_truths = get_ground_truths(data)
+        data_sources = data.non_tensor_batch[self.reward_fn_key]
+        extra_infos = data.non_tensor_batch.get("extra_info", None)
+        num_turns = data.non_tensor_batch.get("__num_turns__", None)
 
-            ground_truth = data_item.non_tensor_batch["reward_model"]["ground_truth"]
-            data_source = data_item.non_tensor_batch[self.reward_fn_key]
-            extra_info = data_item.non_tensor_batch.get("extra_info", {})
-            num_turns = data_item.non_tensor_batch.get("__num_turns__", None)
-            extra_info["num_turns"] = num_turns
-
-            score = self.compute_score(
-                data_source=data_source,
-                solution_str=response_str,
-                ground_truth=ground_truth,
-                extra_info=extra_info,
+        score_kwargs = []
+        for i in range(len(data)):
+            extra_info = extra_infos[i] if extra_infos is not None else {}
+            extra_info["num_turns"] = num_turns[i] if num_turns is not None else None
+            score_kwargs.append(
+                {
+                    "data_source": data_sources[i],
+                    "solution_str": responses_str[i],
+                    "ground_truth": ground_truths[i],
+                    "extra_info": extra_info,
+                }
             )
 
+        if self.score_pool is not None:
+            scores = self.score_pool.map(score_kwargs)
+        else:
+            scores = [self.compute_score(**kwargs) for kwargs in score_kwargs]
+
+        rewards = []
+        for i, score in enumerate(scores):
             if isinstance(score, dict):
                 reward = score["score"]
                 # Store the information including original reward
@@ -98,23 +100,27 @@ class NaiveRewardManager(AbstractRewardManager):
                     reward_extra_info[key].append(value)
             else:
                 reward = score
+            rewards.append(reward)
 
-            reward_tensor[i, valid_response_length - 1] = reward
-
+            data_source = data_sources[i]
             if data_source not in already_print_data_sources:
                 already_print_data_sources[data_source] = 0
 
             if already_print_data_sources[data_source] < self.num_examine:
                 already_print_data_sources[data_source] += 1
-                print("[prompt]", prompt_str)
-                print("[response]", response_str)
-                print("[ground_truth]", ground_truth)
+                print("[prompt]", decode_prompt(self.tokenizer, data, i))
+                print("[response]", responses_str[i])
+                print("[ground_truth]", ground_truths[i])
                 if isinstance(score, dict):
                     for key, value in score.items():
                         print(f"[{key}]", value)
                 else:
                     print("[score]", score)
 
+        reward_tensor[torch.arange(len(data)), valid_response_lengths - 1] = torch.tensor(
+            rewards, dtype=torch.float32, device=reward_tensor.device
+        )
+
         if return_dict:
             return {
                 "reward_tensor": reward_tensor,
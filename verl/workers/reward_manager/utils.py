@@ -0,0 +1,123 @@
+# Copyright 2024  Ltd. and/or its affiliates
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Batch-level helpers shared by the reward managers: decoding the valid part of every response at
+once, reading the non-tensor columns without building a DataProtoItem per sample, and a persistent
+process pool for the scoring functions.
+"""
+
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+import torch
+
+from verl import DataProto
+
+
+def get_valid_response_lengths(data: DataProto) -> torch.Tensor:
+    """Number of non-padding tokens of every response, shape (bs,)."""
+    prompt_length = data.batch["prompts"].shape[-1]
+    return data.batch["attention_mask"][:, prompt_length:].sum(dim=-1)
+
+
+def decode_responses(tokenizer, data: DataProto) -> tuple[list[str], torch.Tensor]:
+    """Decode the responses of a batch, trimmed to their valid length, with one `batch_decode`.
+
+    Returns:
+        responses_str: the decoded responses
+        valid_response_lengths: `(torch.Tensor)` shape (bs,)
+    """
+    valid_response_lengths = get_valid_response_lengths(data)
+    response_ids = data.batch["responses"].cpu().numpy()
+    # numpy views of the valid tokens: the tokenizer converts only those, not the padding
+    lengths = valid_response_lengths.tolist()
+    sequences = [ids[:length] for ids, length in zip(response_ids, lengths, strict=True)]
+    return tokenizer.batch_decode(sequences, skip_special_tokens=True), valid_response_lengths
+
+
+def decode_prompt(tokenizer, data: DataProto, i: int) -> str:
+    """Decode the (left padded) prompt of sample `i`."""
+    prompt_ids = data.batch["prompts"][i]
+    valid_prompt_length = int(data.batch["attention_mask"][i, : prompt_ids.shape[-1]].sum())
+    return tokenizer.decode(prompt_ids[len(prompt_ids) - valid_prompt_length :], skip_special_tokens=True)
+
+
+def get_ground_truths(data: DataProto, strict: bool = True) -> list:
+    """The `ground_truth` of every sample's `reward_model` entry; with `strict=False` a missing one is None."""
+    reward_models = data.non_tensor_batch["reward_model"]
+    if strict:
+        return [reward_model["ground_truth"] for reward_model in reward_models]
+    return [reward_model.get("ground_truth", None) for reward_model in reward_models]
+
+
+_score_fn: Optional[Callable] = None
+
+
+def _init_score_worker(score_fn: Callable):
+    global _score_fn
+    _score_fn = score_fn
+
+
+def _score(kwargs: dict) -> Any:
+    return _score_fn(**kwargs)
+
+
+class ScorePool:
+    """A process pool that lives as long as its reward manager and runs `score_fn(**kwargs)`.
+
+    The pool is started on first use, so `score_fn` (e.g. a custom reward function loaded from a
+    file) is sent to each worker once instead of once per call. Calls keep the order of their
+    inputs and raise the exceptions of `score_fn`. The pool is not pickled with its manager (e.g.
+    when the manager is sent to a Ray worker); a copy starts its own pool on first use.
+
+    Args:
+        score_fn (callable): the scoring function; it must be picklable.
+        num_workers (int): the number of worker processes.
+    """
+
+    def __init__(self, score_fn: Callable, num_workers: int):
+        assert num_workers > 0, f"num_workers must be positive, got {num_workers}"
+        self.score_fn = score_fn
+        self.num_workers = num_workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self._finalizer = None
+
+    def map(self, kwargs_list: list[dict]) -> list:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.num_workers, initializer=_init_score_worker, initargs=(self.score_fn,)
+            )
+            # shut down with the pool or at exit, before the interpreter tears down the modules the executor uses
+            self._finalizer = weakref.finalize(self, self.executor.shutdown, wait=False, cancel_futures=True)
+        chunksize = max(1, len(kwargs_list) // (self.num_workers * 4))
+        try:
+            return list(self.executor.map(_score, kwargs_list, chunksize=chunksize))
+        except BrokenProcessPool:
+            # a worker died (e.g. killed for memory), the next call starts a new pool
+            self.close()
+            raise
+
+    def close(self):
+        if self._finalizer is not None:
+            self._finalizer()
+        self.executor = None
+        self._finalizer = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["executor"] = None
+        state["_finalizer"] = None
+        return state
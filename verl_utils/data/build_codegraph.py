@@ -0,0 +1,301 @@
+"""
+Parallel, incremental construction of `codegraph/{instance_id}.db` for a whole dataset.
+
+Produces the same databases as `env_initialization.py`, but:
+- instances are grouped by project and sorted by base commit time, so instances of one project
+  at nearby commits are built together by the same worker;
+- files are listed with `git ls-tree` and read with a single `git cat-file --batch` process
+  instead of archiving and extracting the repo for every instance;
+- every distinct blob (git blob SHA) is parsed with tree-sitter only once per worker, and the
+  parsed entities are reused for every commit (and path) where the file is unchanged;
+- project chunks are fanned out over a process pool.
+
+With `--dedup`, bodies are stored once in the shared `codegraph/bodies.db` body store (see
+`DataBase`), which must be built before the codegraphs are served.
+
+Symlinks and submodules are skipped.
+
+Usage:
+    python verl_utils/data/build_codegraph.py --root data --input data/filtered_issue.jsonl --num_workers 32
+    python verl_utils/data/build_codegraph.py --root data_r2e2 --input data_r2e2/r2e.parquet
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from collections import defaultdict
+from dataclasses import replace
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+
+from tqdm import tqdm
+from tree_sitter_languages import get_parser
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+from verl_utils.data.env_initialization import recursive_visit_python
+from verl_utils.data.envs.DB import DataBase, FunctionEntry, ClassEntry
+from verl_utils.data.envs.WS import WorkSpace
+
+BUILD_CHUNK_SIZE = 32 # Instances of one project built by the same worker, sharing its blob cache
+BUILD_BLOB_CACHE_SIZE = 20000 # Parsed blobs kept per worker
+
+
+class EntityCollector():
+    """Stands in for the DataBase in `recursive_visit_python`, keeping the entries of one file."""
+
+    def __init__(self):
+        self.entries: list[FunctionEntry | ClassEntry] = []
+
+    def insert_entry(self, entry: FunctionEntry | ClassEntry) -> None:
+        self.entries.append(entry)
+
+
+class BlobReader():
+    """Reads blobs of a repo through one long-lived `git cat-file --batch` process."""
+
+    def __init__(self, src_path):
+        self.process = subprocess.Popen(
+            ['git', '-C', src_path, 'cat-file', '--batch'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+
+    def read(self, sha: str) -> bytes:
+        self.process.stdin.write(f'{sha}\n'.encode())
+        self.process.stdin.flush()
+        header = self.process.stdout.readline().decode().split()
+        if len(header) != 3:
+            raise RuntimeError(f"git cat-file failed on {sha}: {' '.join(header)}")
+        data = self.process.stdout.read(int(header[2]) + 1)
+        return data[:-1]
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+
+def list_python_files(src_path: str, commit: str) -> list[tuple[str, str]]:
+    """(path, blob sha) of the Python files at `commit`, skipping hidden files and directories."""
+    result = subprocess.run(
+        ['git', '-C', src_path, 'ls-tree', '-r', '-z', '--full-tree', commit],
+        check=True,
+        capture_output=True,
+    )
+    files = []
+    for record in result.stdout.decode().split('\0'):
+        if not record:
+            continue
+        info, path = record.split('\t', 1)
+        mode, obj_type, sha = info.split()
+        if obj_type != 'blob' or mode == '120000' or not path.endswith('.py'):
+            continue
+        if any(part.startswith('.') for part in path.split('/')):
+            continue
+        files.append((path, sha))
+    return files
+
+
+def missing_commits(src_path: str, commits: list[str]) -> list[str]:
+    result = subprocess.run(
+        ['git', '-C', src_path, 'cat-file', '--batch-check'],
+        input=''.join(f'{commit}^{{commit}}\n' for commit in commits),
+        capture_output=True,
+        text=True,
+    )
+    return [commit for commit, line in zip(commits, result.stdout.splitlines()) if line.endswith(' missing')]
+
+
+def commit_times(src_path: str, commits: list[str]) -> dict[str, int]:
+    missing = set(missing_commits(src_path, commits))
+    result = subprocess.run(
+        ['git', '-C', src_path, 'log', '--no-walk', '--stdin', '--format=%H %ct'],
+        input=''.join(f'{commit}\n' for commit in commits if commit not in missing),
+        capture_output=True,
+        text=True,
+    )
+    times = {}
+    for line in result.stdout.splitlines():
+        commit, timestamp = line.split()
+        times[commit] = int(timestamp)
+    return times
+
+
+def prepare_project(root: str, instance_id: str, commits: list[str]):
+    """
+    Clone the project if needed and pull it once if some base commits are not there yet.
+    Returns the project, its commit times, and the error if it could not be prepared.
+    """
+    ws = WorkSpace(root, f'{root}/workspace', instance_id)
+    try:
+        ws.init_src()
+        if missing_commits(ws.src_path, commits):
+            ws.update_src()
+        return ws.project, commit_times(ws.src_path, commits), None
+    except Exception as e:
+        return ws.project, {}, e
+
+
+_parser = None
+
+def parse_blob(data: bytes, path: str):
+    """Entries and the `files` entities string of one file, as `construct_ckg` would insert them."""
+    global _parser
+    if _parser is None:
+        _parser = get_parser("python")
+    collector = EntityCollector()
+    current_entities = []
+    recursive_visit_python(_parser.parse(data).root_node, collector, path, current_entities)
+    return collector.entries, "\n".join(current_entities)
+
+
+def construct_ckg_incremental(db: DataBase, files: list[tuple[str, str]], reader: BlobReader, cache: dict, stats: dict) -> None:
+    directory_files = defaultdict(set)
+    for rel_path, sha in files:
+        dir_path = os.path.dirname(rel_path)
+        dir_path = "." if dir_path == "" else dir_path.rstrip('/') + '/'
+        directory_files[dir_path].add(os.path.basename(rel_path))
+
+        parsed = cache.get(sha)
+        if parsed is None:
+            parsed = parse_blob(reader.read(sha), rel_path)
+            if len(cache) >= BUILD_BLOB_CACHE_SIZE:
+                cache.pop(next(iter(cache)))
+            cache[sha] = parsed
+            stats["parsed"] += 1
+        else:
+            stats["reused"] += 1
+        entries, entities = parsed
+
+        db.insert_entries(entry if entry.file_path == rel_path else replace(entry, file_path=rel_path) for entry in entries)
+        db.insert_file(rel_path, entities)
+
+    for dir_path, file_names in directory_files.items():
+        db.insert_directory(dir_path, "\n".join(sorted(file_names)))
+
+
+def log_skip(root: str, message: str):
+    with open(f'{root}/debug.log', 'a') as logf:
+        logf.write(f"{message}\n{'-'*80}\n")
+
+
+def build_chunk(root: str, instances: list[tuple[str, str]], dedup: bool = False) -> dict:
+    """Build the codegraphs of some instances of one project, in the given order."""
+    stats = {"built": 0, "skipped": 0, "parsed": 0, "reused": 0}
+    src_path = WorkSpace(root, f'{root}/workspace', instances[0][0]).src_path
+    reader = BlobReader(src_path)
+    cache = {}
+    try:
+        for instance_id, base_commit in instances:
+            db_path = f'{root}/codegraph/{instance_id}.db'
+            if os.path.exists(db_path):
+                continue
+            try:
+                files = list_python_files(src_path, base_commit)
+            except subprocess.CalledProcessError as e:
+                stats["skipped"] += 1
+                log_skip(root, f"SKIP: Error when listing files on instance_id: {instance_id}.\nError message: {e.stderr.decode().strip()}")
+                continue
+
+            # Written under a temporary name, so an interrupted build is not taken as done
+            temp_path = f'{db_path}.{os.getpid()}.tmp'
+            db = DataBase(root, instance_id, path=temp_path, dedup=dedup)
+            db.init_db()
+            try:
+                with db.bulk_load():
+                    construct_ckg_incremental(db, files, reader, cache, stats)
+                db.disconnect()
+                os.replace(temp_path, db_path)
+                stats["built"] += 1
+            except Exception as e:
+                db.disconnect()
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                stats["skipped"] += 1
+                log_skip(root, f"SKIP: Error when constructing ckg on instance_id: {instance_id}.\nError message: {e}")
+                if reader.process.poll() is not None:
+                    reader = BlobReader(src_path)
+    finally:
+        reader.close()
+    return stats
+
+
+def load_instances(path: str) -> list[tuple[str, str]]:
+    if path.endswith('.parquet'):
+        import pandas as pd
+        df = pd.read_parquet(path, columns=['instance_id', 'base_commit'])
+        return list(zip(df['instance_id'], df['base_commit']))
+    instances = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                meta = json.loads(line)
+                instances.append((meta['instance_id'], meta['base_commit']))
+    return instances
+
+
+def init(root, input_path, total_parts, part_idx, num_workers, chunk_size, dedup=False):
+    instances = load_instances(input_path)
+    part_size = math.ceil(len(instances) / total_parts)
+    instances = instances[part_idx * part_size:(part_idx + 1) * part_size]
+    instances = [(i, c) for i, c in instances if not os.path.exists(f'{root}/codegraph/{i}.db')]
+    os.makedirs(f'{root}/codegraph', exist_ok=True)
+
+    projects = defaultdict(list)
+    for instance_id, base_commit in instances:
+        projects['-'.join(instance_id.split('-')[:-1])].append((instance_id, base_commit))
+    print(f"Building {len(instances)} codegraphs over {len(projects)} projects.")
+
+    # Cloning and pulling is network bound, and must not race between workers of one project
+    times = {}
+    with ThreadPoolExecutor(min(8, max(1, len(projects)))) as executor:
+        futures = [
+            executor.submit(prepare_project, root, project_instances[0][0], [c for _, c in project_instances])
+            for project_instances in projects.values()
+        ]
+        for future in as_completed(futures):
+            project, project_times, error = future.result()
+            times.update(project_times)
+            if error is not None:
+                for instance_id, _ in projects.pop(project):
+                    log_skip(root, f"SKPI: Error when creating workspace on instance_id: {instance_id}.\nError message: {error}")
+
+    # Instances with the same or close base commits land in the same chunk
+    chunks = []
+    for project_instances in projects.values():
+        project_instances.sort(key=lambda instance: (times.get(instance[1], 0), instance[1]))
+        chunks.extend(project_instances[i:i + chunk_size] for i in range(0, len(project_instances), chunk_size))
+    chunks.sort(key=len, reverse=True)
+
+    totals = defaultdict(int)
+    with ProcessPoolExecutor(num_workers) as executor:
+        futures = [executor.submit(build_chunk, root, chunk, dedup) for chunk in chunks]
+        with tqdm(total=sum(len(chunk) for chunk in chunks), desc=f"Processing part {part_idx+1}/{total_parts}") as pbar:
+            for future in as_completed(futures):
+                stats = future.result()
+                for key, value in stats.items():
+                    totals[key] += value
+                pbar.update(stats["built"] + stats["skipped"])
+    parsed, reused = totals["parsed"], totals["reused"]
+    print(
+        f"Built {totals['built']} codegraphs, skipped {totals['skipped']}. "
+        f"Parsed {parsed} blobs for {parsed + reused} files ({reused / max(1, parsed + reused):.1%} reused)."
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root", type=str, required=True, help="Root directory path")
+    parser.add_argument("--input", type=str, default=None,
+                       help="Instances as jsonl or parquet with instance_id and base_commit, defaults to {root}/filtered_issue.jsonl")
+    parser.add_argument("--total_parts", type=int, default=1,
+                       help="Total number of parts to split the work into")
+    parser.add_argument("--part_idx", type=int, default=0,
+                       help="Index of the part to process (0-based)")
+    parser.add_argument("--num_workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk_size", type=int, default=BUILD_CHUNK_SIZE)
+    parser.add_argument("--dedup", action="store_true", help="store bodies once in the shared body store")
+
+    args = parser.parse_args()
+
+    init(args.root, args.input or f'{args.root}/filtered_issue.jsonl', args.total_parts, args.part_idx, args.num_workers, args.chunk_size, args.dedup)
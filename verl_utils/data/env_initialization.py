@@ -189,7 +189,8 @@ def init(root, total_parts, part_idx):
         db = DataBase(root, instance_id)
         db.init_db()
         try:
-            construct_ckg(db, ws.path)
+            with db.bulk_load():
+                construct_ckg(db, ws.path)
         except Exception as e:
             os.system(f'rm -rf {db.path}')
             os.system(f'rm -rf {ws.path}')
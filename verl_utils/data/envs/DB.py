@@ -1,6 +1,15 @@
+import hashlib
 import os
 import sqlite3
+from collections import defaultdict
+from contextlib import contextmanager
 from dataclasses import dataclass
+from typing import Iterable
+from urllib.parse import quote
+
+DB_BULK_BATCH_SIZE = 1000 # Buffered rows per statement before an executemany during bulk loads
+BODY_STORE_NAME = "bodies.db" # Shared body store of deduplicated codegraphs, next to the instance dbs
+BODY_STORE_TIMEOUT = 600.0 # Seconds to wait for the store's write lock, which builders take for one batch at a time
 
 @dataclass
 class FunctionEntry:
@@ -23,25 +32,111 @@ class ClassEntry:
     end_line: int
 
 class DataBase:
-    def __init__(self, root_dir, instance_id):
+    def __init__(self, root_dir, instance_id, path=None, dedup=False):
         self.root = root_dir
-        self.path = f'{root_dir}/codegraph/{instance_id}.db'
+        self.path = path or f'{root_dir}/codegraph/{instance_id}.db'
         
-        if not os.path.exists(f'{root_dir}/codegraph'):
-            os.mkdir(f'{root_dir}/codegraph')
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # With dedup, bodies are stored once by content hash in the shared body store and the
+        # instance db only keeps the hashes, see attach_body_store. The store has its own
+        # connection, so its writes are committed in small batches outside the instance's
+        # transaction and parallel builders only hold its lock briefly.
+        self.dedup = dedup
         self.db_connection = sqlite3.connect(self.path)
+        self.store_connection = None
+        if dedup:
+            store_path = os.path.join(os.path.dirname(os.path.abspath(self.path)), BODY_STORE_NAME)
+            self.store_connection = sqlite3.connect(store_path, timeout=BODY_STORE_TIMEOUT)
+        self.stored_hashes: set[bytes] = set()
+        # Bodies waiting to be written to the store, always before the rows referring to them are committed
+        self.pending_bodies: list[tuple[bytes, str]] = []
+        self.name_index = False
+        # Rows waiting for executemany while bulk loading, per insert statement
+        self.pending: dict[str, list[tuple]] | None = None
 
     def init_db(self):
-        for sql in [FUNCTION_SQL, CLASS_SQL, CLASS_METHOD_SQL, DIRECTORY_SQL, FILE_SQL]:
+        if self.dedup:
+            self.store_connection.execute(BODY_STORE_SQL)
+            self.store_connection.commit()
+            sqls = [*DEDUP_TABLE_SQLS, DIRECTORY_SQL, FILE_SQL, *DEDUP_NAME_INDEX_SQLS, META_SQL]
+        else:
+            sqls = [FUNCTION_SQL, CLASS_SQL, CLASS_METHOD_SQL, DIRECTORY_SQL, FILE_SQL, *NAME_INDEX_SQLS]
+        for sql in sqls:
             self.db_connection.execute(sql)
+        self.name_index = create_name_index(self.db_connection)
+        if self.dedup:
+            self.db_connection.execute(
+                "INSERT OR REPLACE INTO codegraph_meta (key, value) VALUES ('body_store', ?)", (BODY_STORE_NAME,)
+            )
         self.db_connection.commit()
 
     def disconnect(self):
         self.db_connection.close()
+        if self.store_connection is not None:
+            self.store_connection.close()
 
     def __del__(self):
         self.disconnect()
-        
+
+    @contextmanager
+    def bulk_load(self, vacuum: bool = False):
+        """
+        Build the database in one transaction: inserts are buffered and written with executemany,
+        without a rollback journal or fsyncs, and the database is analyzed at the end.
+        A database whose bulk load failed may be corrupt and should be deleted.
+        With dedup, the bodies are committed to the body store batch by batch as they come,
+        keeping the store's journal.
+        """
+        # Only for the instance db, the shared body store has its own connection
+        self.db_connection.execute("PRAGMA main.journal_mode = OFF")
+        self.db_connection.execute("PRAGMA main.synchronous = OFF")
+        self.pending = defaultdict(list)
+        try:
+            yield self
+            self.flush()
+        except BaseException:
+            self.pending = None
+            self.pending_bodies.clear()
+            self.stored_hashes.clear()
+            self.db_connection.rollback()
+            raise
+        self.pending = None
+        self.db_connection.commit()
+        self.db_connection.execute("ANALYZE main")
+        self.db_connection.commit()
+        if vacuum:
+            self.db_connection.execute("VACUUM main")
+        self.db_connection.execute("PRAGMA main.journal_mode = DELETE")
+        self.db_connection.execute("PRAGMA main.synchronous = FULL")
+
+    def flush(self) -> None:
+        """Write the buffered rows of a bulk load."""
+        self.flush_bodies()
+        if not self.pending:
+            return
+        for sql, rows in self.pending.items():
+            self.db_connection.executemany(sql, rows)
+        self.pending.clear()
+
+    def flush_bodies(self) -> None:
+        """Write and commit the buffered bodies to the body store, in a short transaction of its own."""
+        if not self.pending_bodies:
+            return
+        with self.store_connection:
+            self.store_connection.executemany("INSERT OR IGNORE INTO bodies (hash, body) VALUES (?, ?)", self.pending_bodies)
+        self.pending_bodies.clear()
+
+    def _execute(self, sql: str, row: tuple) -> None:
+        if self.pending is None:
+            self.db_connection.execute(sql, row)
+            self.db_connection.commit()
+            return
+        rows = self.pending[sql]
+        rows.append(row)
+        if len(rows) >= DB_BULK_BATCH_SIZE:
+            self.db_connection.executemany(sql, rows)
+            rows.clear()
+
     def insert_entry(self, entry: FunctionEntry | ClassEntry) -> None:
         match entry:
             case FunctionEntry():
@@ -49,68 +144,115 @@ class DataBase:
             case ClassEntry():
                 self._insert_class_handler(entry)
 
+    def insert_entries(self, entries: Iterable[FunctionEntry | ClassEntry]) -> None:
+        """Insert a batch of entries, e.g. all entries of one file."""
+        if self.pending is None:
+            with self.bulk_transaction():
+                for entry in entries:
+                    self.insert_entry(entry)
+            return
+        for entry in entries:
+            self.insert_entry(entry)
+        self.flush_bodies()
+
+    @contextmanager
+    def bulk_transaction(self):
+        """Buffer the inserts of the block and commit them once, keeping the journal."""
+        self.pending = defaultdict(list)
+        try:
+            yield self
+            self.flush()
+        except BaseException:
+            self.pending = None
+            self.pending_bodies.clear()
+            self.stored_hashes.clear()
+            self.db_connection.rollback()
+            raise
+        self.pending = None
         self.db_connection.commit()
 
     def insert_directory(self, path: str, files: str) -> None:
         """Insert directory information into database."""
-        self.db_connection.execute(
+        self._execute(
             """
             INSERT OR REPLACE INTO directories (path, files)
             VALUES (?, ?)
             """,
             (path, files)
         )
-        self.db_connection.commit()
         
     def insert_file(self, path: str, entities: str) -> None:
         """Insert file information into database."""
-        self.db_connection.execute(
+        self._execute(
             """
             INSERT OR REPLACE INTO files (path, entities)
             VALUES (?, ?)
             """,
             (path, entities)
         )
-        self.db_connection.commit()
+
+    def _store_body(self, body: str) -> str | bytes:
+        """The value of the body column: the body itself, or with dedup its hash in the body store."""
+        if not self.dedup:
+            return body
+        body_hash = hashlib.sha1(body.encode()).digest()
+        if body_hash not in self.stored_hashes:
+            self.stored_hashes.add(body_hash)
+            self.pending_bodies.append((body_hash, body))
+            if self.pending is None or len(self.pending_bodies) >= DB_BULK_BATCH_SIZE:
+                self.flush_bodies()
+        return body_hash
+
+    def _insert_name(self, construct: str, name: str, file_path: str, class_name: str | None = None) -> None:
+        if self.name_index:
+            self._execute(
+                "INSERT INTO names (name, construct, qualified_name) VALUES (?, ?, ?)",
+                (name, construct, qualified_name(file_path, name, class_name)),
+            )
 
     def _insert_function_handler(self, entry: FunctionEntry) -> None:
+        table, body_column = ("_refs", "body_hash") if self.dedup else ("", "body")
         if entry.parent_class:
-            self.db_connection.execute(
-                """
-                    INSERT INTO class_methods (name, class_name, file_path, body, start_line, end_line)
+            self._insert_name("class_method", entry.name, entry.file_path, entry.parent_class.name)
+            self._execute(
+                f"""
+                    INSERT INTO class_methods{table} (name, class_name, file_path, {body_column}, start_line, end_line)
                     VALUES (?, ?, ?, ?, ?, ?)
                 """,
                 (
                     entry.name,
                     entry.parent_class.name,
                     entry.file_path,
-                    entry.body,
+                    self._store_body(entry.body),
                     entry.start_line,
                     entry.end_line,
                 ),
             )
         else:
             # no parent class, so we need to insert a function
-            self.db_connection.execute(
-                """
-                    INSERT INTO functions (name, file_path, body, start_line, end_line)
+            self._insert_name("function", entry.name, entry.file_path)
+            self._execute(
+                f"""
+                    INSERT INTO functions{table} (name, file_path, {body_column}, start_line, end_line)
                     VALUES (?, ?, ?, ?, ?)
                 """,
-                (entry.name, entry.file_path, entry.body, entry.start_line, entry.end_line),
+                (entry.name, entry.file_path, self._store_body(entry.body), entry.start_line, entry.end_line),
             )
 
     def _insert_class_handler(self, entry: ClassEntry) -> None:
+        table, body_column = ("_refs", "body_hash") if self.dedup else ("", "body")
         class_fields: str = "\n".join(entry.fields)
         class_methods: str = "\n".join(entry.methods)
-        self.db_connection.execute(
-            """
-                INSERT INTO classes (name, file_path, body, fields, methods, start_line, end_line)
+        self._insert_name("class", entry.name, entry.file_path)
+        self._execute(
+            f"""
+                INSERT INTO classes{table} (name, file_path, {body_column}, fields, methods, start_line, end_line)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 entry.name,
                 entry.file_path,
-                entry.body,
+                self._store_body(entry.body),
                 class_fields,
                 class_methods,
                 entry.start_line,
@@ -164,4 +306,253 @@ FILE_SQL = """
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         path TEXT NOT NULL UNIQUE,
         entities TEXT NOT NULL
-    )"""
\ No newline at end of file
+    )"""
+
+# every search_tool query is `WHERE name = ?`
+NAME_INDEX_SQLS = [
+    "CREATE INDEX IF NOT EXISTS idx_functions_name ON functions (name)",
+    "CREATE INDEX IF NOT EXISTS idx_classes_name ON classes (name)",
+    "CREATE INDEX IF NOT EXISTS idx_class_methods_name ON class_methods (name)",
+]
+
+# Deduplicated codegraphs keep the hash of each body in *_refs tables, and the bodies once in
+# the body store shared by all instance dbs of a codegraph dir
+BODY_STORE_SQL = """
+    CREATE TABLE IF NOT EXISTS bodies (
+        hash BLOB PRIMARY KEY,
+        body TEXT NOT NULL
+    )"""
+
+DEDUP_TABLE_SQLS = [
+    """
+    CREATE TABLE IF NOT EXISTS functions_refs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        file_path TEXT NOT NULL,
+        body_hash BLOB NOT NULL,
+        start_line INTEGER NOT NULL,
+        end_line INTEGER NOT NULL
+    )""",
+    """
+    CREATE TABLE IF NOT EXISTS classes_refs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        file_path TEXT NOT NULL,
+        body_hash BLOB NOT NULL,
+        fields TEXT NOT NULL,
+        methods TEXT NOT NULL,
+        start_line INTEGER NOT NULL,
+        end_line INTEGER NOT NULL
+    )""",
+    """
+    CREATE TABLE IF NOT EXISTS class_methods_refs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        class_name TEXT NOT NULL,
+        file_path TEXT NOT NULL,
+        body_hash BLOB NOT NULL,
+        start_line INTEGER NOT NULL,
+        end_line INTEGER NOT NULL
+    )""",
+]
+
+DEDUP_NAME_INDEX_SQLS = [
+    "CREATE INDEX IF NOT EXISTS idx_functions_refs_name ON functions_refs (name)",
+    "CREATE INDEX IF NOT EXISTS idx_classes_refs_name ON classes_refs (name)",
+    "CREATE INDEX IF NOT EXISTS idx_class_methods_refs_name ON class_methods_refs (name)",
+]
+
+META_SQL = """
+    CREATE TABLE IF NOT EXISTS codegraph_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )"""
+
+# Temp views under the plain table names, so readers query deduplicated codegraphs unchanged
+DEDUP_VIEW_SQLS = [
+    """
+    CREATE TEMP VIEW IF NOT EXISTS functions AS
+    SELECT r.id, r.name, r.file_path, b.body, r.start_line, r.end_line
+    FROM main.functions_refs r JOIN store.bodies b ON b.hash = r.body_hash""",
+    """
+    CREATE TEMP VIEW IF NOT EXISTS classes AS
+    SELECT r.id, r.name, r.file_path, b.body, r.fields, r.methods, r.start_line, r.end_line
+    FROM main.classes_refs r JOIN store.bodies b ON b.hash = r.body_hash""",
+    """
+    CREATE TEMP VIEW IF NOT EXISTS class_methods AS
+    SELECT r.id, r.name, r.class_name, r.file_path, b.body, r.start_line, r.end_line
+    FROM main.class_methods_refs r JOIN store.bodies b ON b.hash = r.body_hash""",
+]
+
+# Trigram index over the simple and the qualified name (`module.Class.method`) of each entity,
+# for the fuzzy lookups of the search tools. Needs SQLite >= 3.34 built with FTS5.
+NAMES_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS names USING fts5(
+        name,
+        construct UNINDEXED,
+        qualified_name,
+        tokenize = 'trigram'
+    )"""
+
+def module_name(file_path: str) -> str:
+    """`a/b/c.py` -> `a.b.c`, `a/b/__init__.py` -> `a.b`"""
+    module = file_path[:-3] if file_path.endswith('.py') else file_path
+    if module == '__init__' or module.endswith('/__init__'):
+        module = module[:-len('__init__')].rstrip('/')
+    return module.replace('/', '.')
+
+def qualified_name(file_path: str, name: str, class_name: str | None = None) -> str:
+    return '.'.join(part for part in (module_name(file_path), class_name, name) if part)
+
+def create_name_index(db_connection: sqlite3.Connection) -> bool:
+    try:
+        db_connection.execute(NAMES_SQL)
+        return True
+    except sqlite3.OperationalError as e:
+        print(f"Name index is disabled, this SQLite has no FTS5 trigram tokenizer: {e}")
+        return False
+
+def fill_name_index(db_connection: sqlite3.Connection, table_suffix: str = '') -> None:
+    """Index the names of a codegraph built without the name index."""
+    db_connection.create_function("qualified_name", 3, qualified_name, deterministic=True)
+    db_connection.execute("DELETE FROM names")
+    for construct, table, class_name in [
+        ('function', 'functions', 'NULL'), ('class', 'classes', 'NULL'), ('class_method', 'class_methods', 'class_name'),
+    ]:
+        db_connection.execute(
+            f"""
+            INSERT INTO names (name, construct, qualified_name)
+            SELECT name, '{construct}', qualified_name(file_path, name, {class_name})
+            FROM {table}{table_suffix}
+            """
+        )
+
+def attach_body_store(db_connection: sqlite3.Connection, db_path: str, uri: bool = False) -> bool:
+    """
+    If `db_path` is a deduplicated codegraph, attach its body store to `db_connection` and create
+    the functions/classes/class_methods views over it. Returns False for a plain codegraph.
+    With `uri` (the connection was opened with uri=True), the store is attached read-only; it is
+    not immutable, since builders keep appending bodies to it.
+    """
+    if db_connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'codegraph_meta'").fetchone() is None:
+        return False
+    row = db_connection.execute("SELECT value FROM codegraph_meta WHERE key = 'body_store'").fetchone()
+    if row is None:
+        return False
+    store_path = os.path.join(os.path.dirname(os.path.abspath(db_path)), row[0])
+    if uri:
+        db_connection.execute(f"ATTACH DATABASE 'file:{quote(store_path)}?mode=ro' AS store")
+    else:
+        db_connection.execute("ATTACH DATABASE ? AS store", (store_path,))
+    for sql in DEDUP_VIEW_SQLS:
+        db_connection.execute(sql)
+    return True
+
+def dedup_db(db_path: str) -> bool:
+    """
+    Rewrite a plain codegraph database in place as a deduplicated one, moving its bodies to the
+    body store next to it. Returns False if it is not a plain codegraph database.
+    """
+    db_connection = sqlite3.connect(db_path)
+    try:
+        tables = {row[0] for row in db_connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if not {'functions', 'classes', 'class_methods', 'directories', 'files'} <= tables:
+            return False
+        codegraph_dir = os.path.dirname(os.path.abspath(db_path))
+        temp_path = f'{db_path}.{os.getpid()}.tmp'
+        db = DataBase(os.path.dirname(codegraph_dir), None, path=temp_path, dedup=True)
+        try:
+            db.init_db()
+            with db.bulk_load():
+                for name, file_path, body, start_line, end_line in db_connection.execute(
+                    "SELECT name, file_path, body, start_line, end_line FROM functions ORDER BY id"
+                ):
+                    db.insert_entry(FunctionEntry(name, file_path, body, start_line, end_line))
+                for name, file_path, body, fields, methods, start_line, end_line in db_connection.execute(
+                    "SELECT name, file_path, body, fields, methods, start_line, end_line FROM classes ORDER BY id"
+                ):
+                    db.insert_entry(ClassEntry(
+                        name, file_path, body, fields.split("\n") if fields else [],
+                        methods.split("\n") if methods else [], start_line, end_line,
+                    ))
+                for name, class_name, file_path, body, start_line, end_line in db_connection.execute(
+                    "SELECT name, class_name, file_path, body, start_line, end_line FROM class_methods ORDER BY id"
+                ):
+                    parent_class = ClassEntry(class_name, file_path, "", [], [], start_line, end_line)
+                    db.insert_entry(FunctionEntry(name, file_path, body, start_line, end_line, parent_class=parent_class))
+                for path, files in db_connection.execute("SELECT path, files FROM directories ORDER BY id"):
+                    db.insert_directory(path, files)
+                for path, entities in db_connection.execute("SELECT path, entities FROM files ORDER BY id"):
+                    db.insert_file(path, entities)
+        except BaseException:
+            db.disconnect()
+            os.remove(temp_path)
+            raise
+        db.disconnect()
+        os.replace(temp_path, db_path)
+        return True
+    finally:
+        db_connection.close()
+
+def migrate_db(db_path: str, vacuum: bool = False) -> bool:
+    """
+    Add the name indexes and the trigram name index to an existing codegraph database in place,
+    rebuilding a trigram index that does not cover the qualified names. Returns False if it has
+    no codegraph tables.
+    """
+    db_connection = sqlite3.connect(db_path)
+    try:
+        tables = {row[0] for row in db_connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if {'functions_refs', 'classes_refs', 'class_methods_refs'} <= tables:
+            index_sqls = DEDUP_NAME_INDEX_SQLS
+        elif {'functions', 'classes', 'class_methods'} <= tables:
+            index_sqls = NAME_INDEX_SQLS
+        else:
+            return False
+        for sql in index_sqls:
+            db_connection.execute(sql)
+        names_sql = db_connection.execute("SELECT sql FROM sqlite_master WHERE name = 'names'").fetchone()
+        if names_sql is not None and 'qualified_name UNINDEXED' in names_sql[0]:
+            db_connection.execute("DROP TABLE names")
+            names_sql = None
+        if names_sql is None and create_name_index(db_connection):
+            fill_name_index(db_connection, '_refs' if index_sqls is DEDUP_NAME_INDEX_SQLS else '')
+        db_connection.execute("ANALYZE")
+        db_connection.commit()
+        if vacuum:
+            db_connection.execute("VACUUM")
+        return True
+    finally:
+        db_connection.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description="Upgrade existing codegraph databases in place.")
+    parser.add_argument("paths", nargs="+", help="codegraph .db files, or root dirs containing codegraph/*.db")
+    parser.add_argument("--vacuum", action="store_true", help="also rebuild the files to reclaim free pages")
+    parser.add_argument("--dedup", action="store_true", help=f"move the bodies to the shared {BODY_STORE_NAME} body store")
+    args = parser.parse_args()
+
+    db_paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            db_paths.extend(sorted(
+                db_path for db_path in glob.glob(os.path.join(path, "codegraph", "*.db"))
+                if os.path.basename(db_path) != BODY_STORE_NAME
+            ))
+        else:
+            db_paths.append(path)
+
+    migrated = 0
+    for db_path in db_paths:
+        try:
+            if (dedup_db(db_path) if args.dedup else migrate_db(db_path, args.vacuum)):
+                migrated += 1
+            else:
+                print(f"Skipped {db_path}: not a codegraph database.")
+        except sqlite3.Error as e:
+            print(f"Failed to migrate {db_path}: {e}")
+    print(f"Migrated {migrated}/{len(db_paths)} databases.")
@@ -1,16 +1,35 @@
+import contextlib
+import fcntl
+import hashlib
 import uuid
 import os
+import queue
+import shutil
 import subprocess
 import re
+import tempfile
+import threading
+import time
+from collections import Counter
+
+WS_POOL_MAX_SNAPSHOTS = 64 # Snapshots kept on disk per temp_dir, least recently used are dropped first
+WS_SNAPSHOT_MIN_IDLE = 600 # Seconds a snapshot must be unused before it can be dropped
+DIFF_CONTEXT_LINES = 3
+DIFF_MAX_CHANGED_LINES = 255 # Larger edits may take git's non-minimal diff heuristics, they go through git diff
+DIFF_SAFE_PATH_CHARS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789._-+/@=,~')
 
 class WorkSpace():
 
-    def __init__(self, root_dir, temp_dir, instance_id):
+    def __init__(self, root_dir, temp_dir, instance_id, pool=None, track_edits=False):
         self.uuid = str(uuid.uuid4())[:8]
         self.project = '-'.join(instance_id.split('-')[:-1])
         self.src_path = f'{root_dir}/project/{self.project}'
         self.path = f'{temp_dir}/temp_{instance_id}_{self.uuid}'
         self.instance_id = instance_id
+        self.pool = pool
+        # With track_edits, all changes go through edit_file and get_diff is computed in-process
+        self.track_edits = track_edits
+        self.originals = {}
 
     def init_src(self):
         project_name = self.project.replace('__', '/')
@@ -34,9 +53,16 @@ class WorkSpace():
     def create_ws(self, base_commit, git=True):
         if os.path.exists(self.path):
             self.del_ws()
-        os.mkdir(self.path)
+        self.originals = {}
+        if self.pool is not None and git:
+            self.pool.checkout(self, base_commit, self.path)
+        else:
+            self.materialize(self.path, base_commit, git)
+
+    def materialize(self, path, base_commit, git=True):
+        os.mkdir(path)
 
-        temp_archive_file = os.path.abspath(f'{self.path}/archive.tar')
+        temp_archive_file = os.path.abspath(f'{path}/archive.tar')
 
         try:
             archive_cmd = [
@@ -52,7 +78,7 @@ class WorkSpace():
             )
 
             extract_cmd = [
-                'tar', '-x', '-f', temp_archive_file, '-C', self.path
+                'tar', '-x', '-f', temp_archive_file, '-C', path
             ]
             subprocess.run(
                 extract_cmd,
@@ -69,7 +95,7 @@ class WorkSpace():
             - Output: {e.stdout}
             - Error: {e.stderr}
             - Src path: {self.src_path}
-            - Dest path: {self.path}
+            - Dest path: {path}
             - Instance ID: {self.instance_id}
             """
             print(error_msg)
@@ -81,7 +107,7 @@ class WorkSpace():
 
         if git:
             git_cmd = f"""
-            cd {self.path} && 
+            cd {path} && 
             git init && 
             git add . && 
             git commit -m 'Initial commit'
@@ -97,34 +123,347 @@ class WorkSpace():
 
     def del_ws(self):
         if os.path.exists(self.path):
+            if self.pool is not None:
+                self.pool.recycle(self.path)
+                return
             cmd = f"rm -rf {self.path}"
             os.system(cmd)
 
-    def get_diff(self) -> str:
-        if not os.path.isdir(self.path):
-            return ""
+    def edit_file(self, path, content):
+        """Write `path` in the workspace, remembering its content before the first edit."""
+        rel_path = os.path.relpath(os.path.abspath(path), os.path.abspath(self.path))
+        if not rel_path.startswith('..') and rel_path not in self.originals:
+            with open(path, 'rb') as f:
+                self.originals[rel_path] = f.read()
+        write_file(path, content)
+
+    def _diff_edits(self):
+        """`git diff HEAD` over the edited files, or None if a path would need git's quoting or git's alignment is ambiguous."""
+        file_diffs = []
+        for rel_path in sorted(self.originals):
+            if not DIFF_SAFE_PATH_CHARS.issuperset(rel_path):
+                return None
+            full_path = os.path.join(self.path, rel_path)
+            with open(full_path, 'rb') as f:
+                content = f.read()
+            if content != self.originals[rel_path]:
+                mode = '100755' if os.stat(full_path).st_mode & 0o100 else '100644'
+                file_diff = format_git_diff(rel_path, self.originals[rel_path], content, mode)
+                if file_diff is None:
+                    return None
+                file_diffs.append(file_diff)
+        return ''.join(file_diffs)
+
+    def _git_diff(self):
+        result = subprocess.run(
+            ["git", "diff", "HEAD"],
+            cwd=self.path,
+            capture_output=True,
+            text=True
+        )
         
-        try:
+        if result.returncode != 0:
             result = subprocess.run(
-                ["git", "diff", "HEAD"],
+                ["git", "diff"],
                 cwd=self.path,
                 capture_output=True,
                 text=True
             )
-            
             if result.returncode != 0:
-                result = subprocess.run(
-                    ["git", "diff"],
-                    cwd=self.path,
-                    capture_output=True,
-                    text=True
-                )
-                if result.returncode != 0:
-                    return f"Error obtaining diff patch: {result.stderr}\nFind and fix the problem with `search_tool` and `edit_tool`, then use `patch_submission` again to generate and submit the patch."
-            
-            patch = result.stdout
+                raise RuntimeError(result.stderr)
+        return result.stdout
+
+    def get_diff(self) -> str:
+        if not os.path.isdir(self.path):
+            return ""
+        
+        try:
+            patch = self._diff_edits() if self.track_edits else None
+            if patch is None:
+                patch = self._git_diff()
             if patch.strip() == '':
                 return "The patch is empty, meanning that you have not performed any valid edit yet. Please use `edit_tool` to fix buggy code before patch submission."
             return f"Successfully obtained and submitted diff patch:\n[PATCH]\n{patch}\n[/PATCH]\nReview this patch. If you find anything wrong, you can use `edit_tool` to fix them, and then use `patch_submission` again to generate a new one. Otherwise, you can just end this conversation."
         except Exception as e:
             return f"Error obtaining diff patch: {str(e)}\nFind and fix the problem with `search_tool` and `edit_tool`, then use `patch_submission` again to generate and submit the patch."
+
+def split_git_lines(data):
+    lines = [line + b'\n' for line in data.split(b'\n')]
+    lines[-1] = lines[-1][:-1]
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+def format_hunk_range(start, stop):
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f'{beginning}'
+    if not length:
+        beginning -= 1
+    return f'{beginning},{length}'
+
+def find_func_line(lines, index):
+    """git's default funcname: the last line before the hunk starting with a letter, '_' or '$'."""
+    for line in reversed(lines[:index + 1]):
+        if line[:1].isalpha() and line[:1].isascii() or line[:1] in (b'_', b'$'):
+            return line[:80].rstrip()
+    return b''
+
+def align_lines(old_lines, new_lines):
+    """
+    The blocks of changed lines `(a1, a2, b1, b2)` of git's diff, when it does not depend on how
+    git aligns the files, else None. Like git, the common head and tail are trimmed first; the
+    remaining lines then align one way only if the lines they have in common occur once on each
+    side and in the same order, the edit is small enough for git's diff to be minimal, and no
+    block of changed lines could slide along equal lines (git's slider heuristics).
+    """
+    n_old, n_new = len(old_lines), len(new_lines)
+    head = 0
+    while head < min(n_old, n_new) and old_lines[head] == new_lines[head]:
+        head += 1
+    tail = 0
+    while tail < min(n_old, n_new) - head and old_lines[n_old - 1 - tail] == new_lines[n_new - 1 - tail]:
+        tail += 1
+    old_middle, new_middle = old_lines[head:n_old - tail], new_lines[head:n_new - tail]
+    old_counts, new_counts = Counter(old_middle), Counter(new_middle)
+    new_index = {line: j for j, line in enumerate(new_middle) if line in old_counts}
+    matches = [(i, i) for i in range(head)]
+    for i, line in enumerate(old_middle):
+        if line in new_counts:
+            if old_counts[line] > 1 or new_counts[line] > 1:
+                return None
+            if matches and head + new_index[line] <= matches[-1][1]: # moved lines
+                return None
+            matches.append((head + i, head + new_index[line]))
+    if len(old_middle) + len(new_middle) - 2 * (len(matches) - head) > DIFF_MAX_CHANGED_LINES:
+        return None
+    matches.extend((n_old - tail + k, n_new - tail + k) for k in range(tail))
+
+    blocks = []
+    for (i, j), (next_i, next_j) in zip([(-1, -1)] + matches, matches + [(n_old, n_new)]):
+        if next_i == i + 1 and next_j == j + 1:
+            continue
+        a1, a2, b1, b2 = i + 1, next_i, j + 1, next_j
+        for lines, start, stop in ((old_lines, a1, a2), (new_lines, b1, b2)):
+            if start < stop and (
+                start > 0 and lines[start - 1] == lines[stop - 1] or stop < len(lines) and lines[stop] == lines[start]
+            ):
+                return None
+        blocks.append((a1, a2, b1, b2))
+    return blocks
+
+def format_git_diff(rel_path, old, new, mode='100644'):
+    """
+    Unified diff of one file in the format of `git diff HEAD` (without rename or mode changes),
+    or None when git might align the lines differently, see align_lines.
+    """
+    old_lines = split_git_lines(old)
+    new_lines = split_git_lines(new)
+    blocks = align_lines(old_lines, new_lines)
+    if blocks is None:
+        return None
+    old_sha = hashlib.sha1(b'blob %d\0' % len(old) + old).hexdigest()
+    new_sha = hashlib.sha1(b'blob %d\0' % len(new) + new).hexdigest()
+    output = [
+        f'diff --git a/{rel_path} b/{rel_path}\n'.encode(),
+        f'index {old_sha[:7]}..{new_sha[:7]} {mode}\n'.encode(),
+        f'--- a/{rel_path}\n'.encode(),
+        f'+++ b/{rel_path}\n'.encode(),
+    ]
+
+    def emit(sign, lines):
+        for line in lines:
+            output.append(sign + line)
+            if not line.endswith(b'\n'):
+                output.append(b'\n\\ No newline at end of file\n')
+
+    # Blocks at most 2 * DIFF_CONTEXT_LINES equal lines apart share a hunk, as in git
+    hunks = []
+    for block in blocks:
+        if hunks and block[0] - hunks[-1][-1][1] <= 2 * DIFF_CONTEXT_LINES:
+            hunks[-1].append(block)
+        else:
+            hunks.append([block])
+    for hunk in hunks:
+        i1 = max(0, hunk[0][0] - DIFF_CONTEXT_LINES)
+        i2 = min(len(old_lines), hunk[-1][1] + DIFF_CONTEXT_LINES)
+        j1 = hunk[0][2] - (hunk[0][0] - i1)
+        j2 = hunk[-1][3] + (i2 - hunk[-1][1])
+        header = f'@@ -{format_hunk_range(i1, i2)} +{format_hunk_range(j1, j2)} @@'.encode()
+        func_line = find_func_line(old_lines, i1 - 1)
+        output.append(header + (b' ' + func_line if func_line else b'') + b'\n')
+        emit(b' ', old_lines[i1:hunk[0][0]])
+        for k, (a1, a2, b1, b2) in enumerate(hunk):
+            emit(b'-', old_lines[a1:a2])
+            emit(b'+', new_lines[b1:b2])
+            emit(b' ', old_lines[a2:hunk[k + 1][0] if k + 1 < len(hunk) else i2])
+    return b''.join(output).decode('utf-8', errors='replace')
+
+def write_file(path, content):
+    """
+    Write a file by replacing it rather than writing into it, so a file shared with a pool
+    snapshot (hardlink) is copied on edit instead of changing the snapshot and its other copies.
+    """
+    mode = os.stat(path).st_mode & 0o7777 if os.path.exists(path) else None
+    fd, temp_path = tempfile.mkstemp(prefix='.edit_', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        if mode is not None:
+            os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+class WorkspacePool():
+    """
+    Materializes each (project, base_commit) once under `{temp_dir}/snapshots` as a pristine
+    tree with a committed .git, and hands out per-request copies of it: reflinks where the
+    filesystem supports them, a hardlink farm otherwise. Copies share file data with the
+    snapshot until edited, so edits must go through `write_file`. Released copies are moved
+    aside and deleted by a background thread. Processes sharing `temp_dir` hold a shared flock
+    on a snapshot's lock file while copying it, and eviction takes it exclusively.
+    """
+
+    def __init__(self, temp_dir):
+        self.snapshot_dir = f'{temp_dir}/snapshots'
+        self.trash_dir = f'{temp_dir}/trash'
+        self.lock_dir = f'{temp_dir}/locks'
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        os.makedirs(self.trash_dir, exist_ok=True)
+        os.makedirs(self.lock_dir, exist_ok=True)
+        self.clone_mode = 'reflink'
+        self.lock = threading.Lock()
+        self.snapshot_locks = {}
+        self.stats = {
+            'hits': 0, 'misses': 0, 'clones': 0, 'recycled': 0,
+            'materialize_time': 0.0, 'clone_time': 0.0,
+        }
+        self.trash = queue.Queue()
+        for name in os.listdir(self.trash_dir): # left over by a previous run
+            self.trash.put(f'{self.trash_dir}/{name}')
+        threading.Thread(target=self._reap, daemon=True).start()
+
+    def _snapshot_lock(self, snapshot_path):
+        with self.lock:
+            return self.snapshot_locks.setdefault(snapshot_path, threading.Lock())
+
+    @contextlib.contextmanager
+    def _file_lock(self, snapshot_path, operation):
+        # Lock files are kept after eviction: removing a flocked file races with processes opening it
+        fd = os.open(f'{self.lock_dir}/{os.path.basename(snapshot_path)}.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, operation)
+            yield
+        finally:
+            os.close(fd) # releases the lock
+
+    def get_snapshot_path(self, workspace, base_commit):
+        return f'{self.snapshot_dir}/{workspace.project}@{base_commit}'
+
+    def checkout(self, workspace, base_commit, path):
+        """Copy the snapshot of `base_commit` to `path`, building it first if needed."""
+        snapshot_path = self.get_snapshot_path(workspace, base_commit)
+        with self._file_lock(snapshot_path, fcntl.LOCK_SH): # not evicted by any process until copied
+            self.get_snapshot(workspace, base_commit)
+            self.clone(snapshot_path, path)
+
+    def get_snapshot(self, workspace, base_commit):
+        snapshot_path = self.get_snapshot_path(workspace, base_commit)
+        with self._snapshot_lock(snapshot_path):
+            if os.path.isdir(snapshot_path):
+                os.utime(snapshot_path) # LRU order across processes
+                with self.lock:
+                    self.stats['hits'] += 1
+                return snapshot_path
+
+            start = time.perf_counter()
+            build_path = f'{snapshot_path}.tmp-{uuid.uuid4().hex[:8]}'
+            try:
+                workspace.materialize(build_path, base_commit)
+                # Copies get new inodes/ctimes, compare only mtime and size to keep `git diff` cheap
+                subprocess.run(
+                    f"cd {build_path} && git config core.trustctime false && git config core.checkStat minimal",
+                    shell=True, executable='/bin/bash', check=True, capture_output=True, text=True
+                )
+                os.rename(build_path, snapshot_path)
+            except OSError:
+                if not os.path.isdir(snapshot_path): # not built by another process meanwhile
+                    raise
+            finally:
+                if os.path.exists(build_path):
+                    shutil.rmtree(build_path, ignore_errors=True)
+            with self.lock:
+                self.stats['misses'] += 1
+                self.stats['materialize_time'] += time.perf_counter() - start
+        self._evict()
+        return snapshot_path
+
+    def clone(self, snapshot_path, path):
+        start = time.perf_counter()
+        if self.clone_mode == 'reflink':
+            result = subprocess.run(['cp', '-a', '--reflink=always', snapshot_path, path], capture_output=True, text=True)
+            if result.returncode != 0:
+                reason = result.stderr.strip().split('\n')[0]
+                print(f"Reflink copies are not supported in {self.snapshot_dir}, using hardlinks: {reason}")
+                self.clone_mode = 'hardlink'
+                shutil.rmtree(path, ignore_errors=True)
+        if self.clone_mode == 'hardlink':
+            subprocess.run(['cp', '-al', snapshot_path, path], check=True, capture_output=True, text=True)
+        with self.lock:
+            self.stats['clones'] += 1
+            self.stats['clone_time'] += time.perf_counter() - start
+
+    def recycle(self, path):
+        trash_path = f'{self.trash_dir}/{os.path.basename(path)}-{uuid.uuid4().hex[:8]}'
+        os.rename(path, trash_path)
+        self.trash.put(trash_path)
+        with self.lock:
+            self.stats['recycled'] += 1
+
+    def _reap(self):
+        while True:
+            shutil.rmtree(self.trash.get(), ignore_errors=True)
+
+    def _evict(self):
+        snapshots = [
+            f'{self.snapshot_dir}/{name}' for name in os.listdir(self.snapshot_dir) if '.tmp-' not in name
+        ]
+        if len(snapshots) <= WS_POOL_MAX_SNAPSHOTS:
+            return
+        # Copies keep their own links to the data, so dropping a snapshot does not affect them
+        snapshots.sort(key=lambda path: os.stat(path).st_mtime)
+        now = time.time()
+        for snapshot_path in snapshots[:len(snapshots) - WS_POOL_MAX_SNAPSHOTS]:
+            if now - os.stat(snapshot_path).st_mtime < WS_SNAPSHOT_MIN_IDLE:
+                break
+            with self._snapshot_lock(snapshot_path):
+                try:
+                    # Skip snapshots being copied by any process, and ones touched since they were listed
+                    with self._file_lock(snapshot_path, fcntl.LOCK_EX | fcntl.LOCK_NB):
+                        if now - os.stat(snapshot_path).st_mtime >= WS_SNAPSHOT_MIN_IDLE:
+                            self.recycle(snapshot_path)
+                except OSError: # BlockingIOError when locked, FileNotFoundError when already evicted
+                    pass
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['avg_materialize_time'] = stats['materialize_time'] / stats['misses'] if stats['misses'] else 0.0
+        stats['avg_clone_time'] = stats['clone_time'] / stats['clones'] if stats['clones'] else 0.0
+        stats['pending_deletes'] = self.trash.qsize()
+        return stats
+
+_workspace_pools = {}
+_workspace_pools_lock = threading.Lock()
+
+def get_workspace_pool(temp_dir):
+    with _workspace_pools_lock:
+        if temp_dir not in _workspace_pools:
+            _workspace_pools[temp_dir] = WorkspacePool(temp_dir)
+        return _workspace_pools[temp_dir]
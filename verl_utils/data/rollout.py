@@ -1,6 +1,5 @@
 import pandas as pd
 import argparse
-from tqdm import tqdm
 import sys
 import os
 import json
@@ -9,6 +8,7 @@ import yaml
 
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 from verl_utils.data.utils.api import get_chat_completion
+from verl_utils.data.utils.rollout_driver import RolloutDriver, ROLLOUT_CONCURRENCY
 from verl_utils.eval.result_evaluator import evaluate_batch, evaluate_naive, extract_batch_combine
 from verl_utils.tool.function.get_func_from_context import get_impl_and_deps
 
@@ -17,14 +17,16 @@ def get_tool_config(path: str):
     tool_config = [tool_config['tool_schema'] for tool_config in config]
     return tool_config
 
-def loop(model: str, messages: list, tools: list, tree: dict, max_rounds=25, max_tokens=32768):
+def loop(model: str, messages: list, tools: list, tree: dict, max_rounds=25, max_tokens=32768, chat=get_chat_completion):
     tokens = 0
     rounds = 0
     while tokens < max_tokens and rounds < max_rounds:
-        messages, tokens, finish_reason = get_chat_completion(model, messages, tools)
+        messages, tokens, finish_reason = chat(model, messages, tools)
         rounds += 1
         if finish_reason == 'stop' or finish_reason == 'length':
             return messages, tokens, finish_reason
+        elif finish_reason == 'error': # the request failed after its retries
+            break
         else:
             tool_calls = messages[-1]['tool_calls']
             for tool_call in tool_calls:
@@ -42,58 +44,36 @@ def loop(model: str, messages: list, tools: list, tree: dict, max_rounds=25, max
                 })
     return messages, tokens, finish_reason
 
-def rollout(model, data_path, output_path, tool_path=None, context_path=None, total_parts=1, part_idx=0):
+def rollout(model, data_path, output_path, tool_path=None, context_path=None, concurrency=ROLLOUT_CONCURRENCY, requests_per_second=None):
+    if bool(tool_path) != bool(context_path):
+        raise ValueError('tool_path and context_path are not aligned.')
     data = pd.read_parquet(data_path)
-    
-    # Split data into parts if needed
-    if total_parts > 1:
-        part_size = len(data) // total_parts
-        start_idx = part_idx * part_size
-        end_idx = (part_idx + 1) * part_size if part_idx < total_parts - 1 else len(data)
-        data = data.iloc[start_idx:end_idx]
-        # Modify output path to include part info
-        base, ext = os.path.splitext(output_path)
-        output_path = f"{base}_{part_idx}-{total_parts}{ext}"
-    
-    if os.path.exists(output_path):
-        msg_df = pd.read_parquet(output_path)
-        processed_idx = set(msg_df['idx'].tolist())
-        msg_df['is_invalid'] = msg_df.apply(lambda x: extract_batch_combine(x['messages'][-1]['content']) is None, axis=1)
-        invalid_idx = set(msg_df.loc[msg_df['is_invalid'], 'idx'])
-        processed_idx = set(msg_df['idx'].tolist()) - invalid_idx
-        msg_df = msg_df[~msg_df['is_invalid']].drop(columns=['is_invalid'])
-        print(f"Remove {len(invalid_idx)} invalid lines.")
-    else:
-        msg_df = pd.DataFrame()
-        processed_idx = set()
-        
-    for idx, row in tqdm(data.iterrows(), total=len(data), desc=f"Part {part_idx}/{total_parts}"):
-        if idx in processed_idx:
-            continue
+    tool = get_tool_config(tool_path) if tool_path else None
+    driver = RolloutDriver(output_path, concurrency, requests_per_second)
+    chat = driver.limit(get_chat_completion)
+
+    def process(idx, row):
         messages = row['prompt']
         label = row['reward_model']['ground_truth']
         original_messages = deepcopy(messages)
         if tool_path and context_path:
-            tool = get_tool_config(tool_path)
             with open(f"{context_path}/{row['extra_info']['id']}.json", "r") as f:
                 tree = json.load(f)
-            messages, tokens, _ = loop(model, original_messages, tool, tree)
-        elif not tool_path and not context_path:
-            messages, tokens, _ = get_chat_completion(model, original_messages)
+            messages, tokens, _ = loop(model, original_messages, tool, tree, chat=chat)
         else:
-            raise ValueError('tool_path and context_path are not aligned.')
-        new_row = pd.DataFrame([{
+            messages, tokens, _ = chat(model, original_messages)
+        return {
             "idx": idx,
             "id": row['extra_info']['id'],
             "messages": messages,
             "ground_truth": label,
             "total_tokens": tokens
-        }])
-        msg_df = pd.concat([msg_df, new_row], ignore_index=True)
-        if idx % 10 == 0: # save per 10 instance
-            msg_df.to_parquet(output_path)
-    msg_df.to_parquet(output_path)
-    print(f"Rollout finished. Output path: {output_path}")
+        }
+
+    def is_valid(record):
+        return extract_batch_combine(record['messages'][-1]['content']) is not None
+
+    return driver.run(data, process, is_valid)
     
 
 if __name__ == "__main__":
@@ -105,25 +85,25 @@ if __name__ == "__main__":
     parser.add_argument("--tooluse", type=bool, default=False, help="output path")
     parser.add_argument("--naive", type=bool, default=False, help="use batch or naive")
     parser.add_argument("--distill", type=bool, default=False, help="for distillation")
-    parser.add_argument("--total_parts", type=int, default=1, help="Total number of parts to split the data into")
-    parser.add_argument("--part_idx", type=int, default=0, help="Index of the part to process (0-based)")
+    parser.add_argument("--concurrency", type=int, default=ROLLOUT_CONCURRENCY, help="Conversations in flight per process; run more processes on the same output to share the work")
+    parser.add_argument("--rps", type=float, default=None, help="Requests per second per process")
     
     args = parser.parse_args()
 
     if args.tooluse:
         output_path = f'data/test_{args.model}_{args.tag}.parquet'
-        rollout(args.model, args.data_path, output_path, args.tool_config_path, args.context_path, args.total_parts, args.part_idx)
+        finished = rollout(args.model, args.data_path, output_path, args.tool_config_path, args.context_path, args.concurrency, args.rps)
     elif args.naive:
         output_path = f'data/test_without_tool_{args.model}_naive.parquet'
-        rollout(args.model, args.data_path, output_path, total_parts=args.total_parts, part_idx=args.part_idx)
+        finished = rollout(args.model, args.data_path, output_path, concurrency=args.concurrency, requests_per_second=args.rps)
     elif args.distill:
         output_path = f'data/distill_rollouts_{args.model}.parquet'
-        rollout(args.model, args.data_path, output_path, total_parts=args.total_parts, part_idx=args.part_idx)
+        finished = rollout(args.model, args.data_path, output_path, concurrency=args.concurrency, requests_per_second=args.rps)
     else:
         output_path = f'data/test_without_tool_{args.model}_batch.parquet'
-        rollout(args.model, args.data_path, output_path, total_parts=args.total_parts, part_idx=args.part_idx)
+        finished = rollout(args.model, args.data_path, output_path, concurrency=args.concurrency, requests_per_second=args.rps)
         
-    if args.total_parts == 1:
+    if finished: # only the last process evaluates
         if args.naive:
             from verl_utils.reward.extract_answer import extract_answer_naive
             evaluate_naive(output_path, extract_answer_naive)
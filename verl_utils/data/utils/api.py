@@ -1,67 +1,229 @@
+import asyncio
+import atexit
+import bisect
 import openai
 import json
+import random
+import threading
+import time
+
+from verl_utils.data.utils.rate_limit import RateLimiter
 
 meta_config = json.load(open("config.json", "r")) # low effort
 # meta_config = json.load(open("config_high.json", "r")) # high effort
 
-def get_chat_completion(model: str, messages: list, tools: list = [], parallel_tool_calls: bool = False):
+API_MAX_RETRIES: int = 6 # Retries of a request failing with 429, 5xx or a connection error
+API_BACKOFF_BASE: float = 1.0 # Seconds, doubled per retry and jittered
+API_BACKOFF_MAX: float = 60.0
+API_TIMEOUT: float = 600.0
+LATENCY_BUCKETS = [0.5, 1, 2, 4, 8, 16, 32, 64, 128, 256] # Upper bounds in seconds
+TOKEN_BUCKETS = [2 ** i for i in range(8, 18)] # Upper bounds in tokens
+
+_lock = threading.Lock()
+_clients = {}
+_async_clients = {}
+_limiters = {}
+
+
+def _client_kwargs(config: dict) -> dict:
+    return dict(
+        azure_endpoint=config['base_url'],
+        api_version=config['api_version'],
+        api_key=config['api_key'],
+        timeout=config.get('timeout', API_TIMEOUT),
+        max_retries=0, # retried by get_chat_completion
+    )
+
+
+def get_client(model: str) -> openai.AzureOpenAI:
+    """One client, and so one connection pool, per model for the whole process"""
+    with _lock:
+        if model not in _clients:
+            _clients[model] = openai.AzureOpenAI(**_client_kwargs(meta_config[model]))
+        return _clients[model]
+
+
+def get_async_client(model: str) -> openai.AsyncAzureOpenAI:
+    """One client per model and event loop, as the connections of an async client belong to its loop"""
+    key = (model, id(asyncio.get_running_loop()))
+    with _lock:
+        if key not in _async_clients:
+            _async_clients[key] = openai.AsyncAzureOpenAI(**_client_kwargs(meta_config[model]))
+        return _async_clients[key]
+
+
+def get_rate_limiter(model: str):
+    """Limiter of the model's `requests_per_second` (and `burst`) in config.json, None if unset"""
+    with _lock:
+        if model not in _limiters:
+            config = meta_config[model]
+            rate = config.get('requests_per_second', None)
+            _limiters[model] = RateLimiter(rate, config.get('burst', 1)) if rate else None
+        return _limiters[model]
+
+
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, openai.APIStatusError):
+        return e.status_code == 429 or e.status_code >= 500
+    return isinstance(e, openai.APIConnectionError) # including timeouts
+
+
+def backoff(attempt: int, e: Exception) -> float:
+    """Seconds before retry `attempt` (0-based): Retry-After when the server sends it, else full jitter"""
+    response = getattr(e, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
     try:
-        config = meta_config[model]
-        
-        client = openai.AzureOpenAI(
-            azure_endpoint=config['base_url'],
-            api_version=config['api_version'],
-            api_key=config['api_key']
-        )
-        
-        completion = client.chat.completions.create(
-            model=config['model'],
-            temperature=config['temperature'],
-            messages=messages,
-            extra_headers={"X-TT-LOGID": ""},
-            reasoning_effort=config.get("reasoning_effort", None),
-            tools=tools,
-            max_tokens=config['max_tokens'],
-        )
-
-        # print(completion.choices) # for debug
-
-        response = completion.choices[-1].message.content
-        tokens = completion.usage.total_tokens
-        finish_reason = completion.choices[-1].finish_reason
-        messages = list(messages)
-
-        # for tool call
-        if finish_reason == "tool_calls" and completion.choices[-1].message.tool_calls:
-            tool_calls = []
-            for tool_call in completion.choices[-1].message.tool_calls:
-                tool_calls.append({
-                    "id": tool_call.id,
-                    "type": tool_call.type,
-                    "function": {
-                        "name": tool_call.function.name,
-                        "arguments": tool_call.function.arguments,
-                    }
-                })
-            messages.append({
-                "role": "assistant",
-                "content": response,
-                "tool_calls": tool_calls
-            })
-        
-        # for normal completion 
-        else:
-            messages.append({
-                "role": "assistant",
-                "content": response,
-                "tool_calls": None
+        return min(float(retry_after), API_BACKOFF_MAX)
+    except (TypeError, ValueError):
+        return random.uniform(0, min(API_BACKOFF_MAX, API_BACKOFF_BASE * 2 ** attempt))
+
+
+class UsageStats:
+    """Per model request, retry and error counts, token totals and latency/token histograms of a run"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.models = {}
+
+    def _model(self, model: str) -> dict:
+        if model not in self.models:
+            self.models[model] = {
+                "requests": 0, "retries": 0, "errors": 0,
+                "prompt_tokens": 0, "completion_tokens": 0, "latency": 0.0,
+                "latency_histogram": [0] * (len(LATENCY_BUCKETS) + 1),
+                "prompt_tokens_histogram": [0] * (len(TOKEN_BUCKETS) + 1),
+                "completion_tokens_histogram": [0] * (len(TOKEN_BUCKETS) + 1),
+            }
+        return self.models[model]
+
+    def record(self, model: str, usage, latency: float):
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        with self.lock:
+            stats = self._model(model)
+            stats["requests"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["latency"] += latency
+            stats["latency_histogram"][bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+            stats["prompt_tokens_histogram"][bisect.bisect_left(TOKEN_BUCKETS, prompt_tokens)] += 1
+            stats["completion_tokens_histogram"][bisect.bisect_left(TOKEN_BUCKETS, completion_tokens)] += 1
+
+    def record_retry(self, model: str):
+        with self.lock:
+            self._model(model)["retries"] += 1
+
+    def record_error(self, model: str):
+        with self.lock:
+            self._model(model)["errors"] += 1
+
+    def summary(self) -> dict:
+        with self.lock:
+            return json.loads(json.dumps(self.models))
+
+    def report(self):
+        summary = self.summary()
+        if summary:
+            print(f"API USAGE: {json.dumps({'latency_buckets': LATENCY_BUCKETS, 'token_buckets': TOKEN_BUCKETS, 'models': summary})}")
+
+
+api_usage = UsageStats()
+atexit.register(api_usage.report)
+
+
+def _request_kwargs(config: dict, messages: list, tools: list) -> dict:
+    return dict(
+        model=config['model'],
+        temperature=config['temperature'],
+        messages=messages,
+        extra_headers={"X-TT-LOGID": ""},
+        reasoning_effort=config.get("reasoning_effort", None),
+        tools=tools,
+        max_tokens=config['max_tokens'],
+    )
+
+
+def _append_response(messages: list, completion):
+    # print(completion.choices) # for debug
+
+    response = completion.choices[-1].message.content
+    tokens = completion.usage.total_tokens
+    finish_reason = completion.choices[-1].finish_reason
+    messages = list(messages)
+
+    # for tool call
+    if finish_reason == "tool_calls" and completion.choices[-1].message.tool_calls:
+        tool_calls = []
+        for tool_call in completion.choices[-1].message.tool_calls:
+            tool_calls.append({
+                "id": tool_call.id,
+                "type": tool_call.type,
+                "function": {
+                    "name": tool_call.function.name,
+                    "arguments": tool_call.function.arguments,
+                }
             })
-        
-        return messages, tokens, finish_reason
-        
-    except Exception as e:
-        print(f"API REQUEST ERROR: {str(e)}")
-        return messages, 0, 'stop'
+        messages.append({
+            "role": "assistant",
+            "content": response,
+            "tool_calls": tool_calls
+        })
+
+    # for normal completion
+    else:
+        messages.append({
+            "role": "assistant",
+            "content": response,
+            "tool_calls": None
+        })
+
+    return messages, tokens, finish_reason
+
+
+def get_chat_completion(model: str, messages: list, tools: list = [], parallel_tool_calls: bool = False):
+    """
+    (messages with the assistant's reply appended, total tokens, finish reason). Requests failing
+    with 429, 5xx or a connection error are retried; when a request cannot succeed, the messages are
+    returned unchanged with finish reason 'error'.
+    """
+    limiter = get_rate_limiter(model)
+    for attempt in range(API_MAX_RETRIES + 1):
+        if limiter is not None:
+            limiter.acquire()
+        start = time.monotonic()
+        try:
+            completion = get_client(model).chat.completions.create(**_request_kwargs(meta_config[model], messages, tools))
+            api_usage.record(model, completion.usage, time.monotonic() - start)
+            return _append_response(messages, completion)
+        except Exception as e:
+            if is_retryable(e) and attempt < API_MAX_RETRIES:
+                api_usage.record_retry(model)
+                time.sleep(backoff(attempt, e))
+                continue
+            api_usage.record_error(model)
+            print(f"API REQUEST ERROR: {str(e)}")
+            return messages, 0, 'error'
+
+
+async def get_chat_completion_async(model: str, messages: list, tools: list = [], parallel_tool_calls: bool = False):
+    """get_chat_completion for coroutines"""
+    limiter = get_rate_limiter(model)
+    for attempt in range(API_MAX_RETRIES + 1):
+        if limiter is not None:
+            await limiter.acquire_async()
+        start = time.monotonic()
+        try:
+            completion = await get_async_client(model).chat.completions.create(**_request_kwargs(meta_config[model], messages, tools))
+            api_usage.record(model, completion.usage, time.monotonic() - start)
+            return _append_response(messages, completion)
+        except Exception as e:
+            if is_retryable(e) and attempt < API_MAX_RETRIES:
+                api_usage.record_retry(model)
+                await asyncio.sleep(backoff(attempt, e))
+                continue
+            api_usage.record_error(model)
+            print(f"API REQUEST ERROR: {str(e)}")
+            return messages, 0, 'error'
 
 if __name__ == "__main__":
     message = [
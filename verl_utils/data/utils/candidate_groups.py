@@ -0,0 +1,186 @@
+"""
+Candidate groups for the batch verifier data: every row holds the patches of one instance from
+`group_size` different sources (e.g. rollouts of different models) and their `resolved` labels.
+
+Sources are indexed by instance_id once, groups are assembled with index lookups over every
+combination of `group_size` sources, and balancing and shuffling work on row index arrays.
+Sampling uses np.random.RandomState like DataFrame.sample, so a balanced and row shuffled
+batch selects the same rows, in the same order, as the previous per-row pandas scripts.
+"""
+from dataclasses import dataclass
+import itertools
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+def remove_index_from_patch(patch_str):
+    """Remove the 'index xxxx..xxxx' line from patch string using regex"""
+    if not isinstance(patch_str, str):
+        return patch_str
+
+    pattern = r'\nindex [a-f0-9]+\.\.[a-f0-9]+(?: \d+)?\n'
+    return re.sub(pattern, '\n', patch_str, flags=re.MULTILINE)
+
+
+def drop_empty_patches(df: pd.DataFrame) -> pd.DataFrame:
+    return df[df['patch'].fillna('').str.strip() != '']
+
+
+def load_sources(paths, clean=remove_index_from_patch) -> list[pd.DataFrame]:
+    """
+    One DataFrame per source, a source given as a list of parquet files being their concatenation.
+    Rows with an empty patch are dropped, before and after cleaning the patches with `clean`.
+    """
+    sources = []
+    for path in paths:
+        files = [path] if isinstance(path, str) else path
+        df = drop_empty_patches(pd.concat([pd.read_parquet(file) for file in files], ignore_index=True))
+        if clean is not None:
+            df = drop_empty_patches(df.assign(patch=df['patch'].map(clean)))
+        sources.append(df)
+    return sources
+
+
+@dataclass
+class CandidateGroups:
+    frame: pd.DataFrame # Other columns, from the first source of each row's combination
+    patch: np.ndarray # (rows, group_size)
+    resolved: np.ndarray # (rows, group_size)
+    combination: np.ndarray # (rows,) index of the source combination each row comes from
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def group_size(self) -> int:
+        return self.patch.shape[1]
+
+    def take(self, rows: np.ndarray) -> "CandidateGroups":
+        return CandidateGroups(self.frame.iloc[rows], self.patch[rows], self.resolved[rows], self.combination[rows])
+
+    def num_correct(self) -> np.ndarray:
+        return (self.resolved == True).sum(axis=1)
+
+    def counts(self) -> dict[str, int]:
+        """Rows by number of resolved candidates, as {"0": ..., "group_size": ...}"""
+        counts = np.bincount(self.num_correct(), minlength=self.group_size + 1)
+        return {str(i): int(count) for i, count in enumerate(counts)}
+
+    def overlap_count(self, all_equal: bool = False) -> int:
+        """Rows where some (or, with `all_equal`, all) candidates share the same patch."""
+        if len(self) == 0:
+            return 0
+        same = self.patch[:, :, None] == self.patch[:, None, :]
+        if all_equal:
+            return int(same.all(axis=(1, 2)).sum())
+        off_diagonal = ~np.eye(self.group_size, dtype=bool)
+        return int((same & off_diagonal).any(axis=(1, 2)).sum())
+
+    def to_frame(self) -> pd.DataFrame:
+        df = self.frame.reset_index(drop=True)
+        df['patch'] = self.patch.tolist()
+        df['resolved'] = self.resolved.tolist()
+        return df
+
+    def to_parquet(self, path: str) -> None:
+        """Written with the candidates as list columns, without going through per-row Python lists."""
+        table = pa.Table.from_pandas(self.frame.reset_index(drop=True), preserve_index=False)
+        offsets = pa.array(np.arange(0, self.patch.size + 1, self.group_size, dtype=np.int32))
+        for name, values in [("patch", self.patch), ("resolved", self.resolved)]:
+            table = table.append_column(name, pa.ListArray.from_arrays(offsets, pa.array(values.ravel())))
+        pq.write_table(table, path)
+
+
+def build_candidate_groups(sources: list[pd.DataFrame], group_size: int) -> CandidateGroups:
+    """
+    Rows for every combination of `group_size` sources, combinations ordered by the sources they
+    leave out, over the instances present in all of them. The first row of an instance in a source
+    provides its candidate; the rows of the combination's first source provide the other columns.
+    """
+    firsts = [source.drop_duplicates('instance_id').set_index('instance_id') for source in sources]
+    frames, patches, resolveds, combinations = [], [], [], []
+    for dropped in itertools.combinations(range(len(sources)), len(sources) - group_size):
+        combination = [i for i in range(len(sources)) if i not in dropped]
+        common_ids = firsts[combination[0]].index
+        for i in combination[1:]:
+            common_ids = common_ids.intersection(firsts[i].index)
+        base = sources[combination[0]]
+        base = base[base['instance_id'].isin(common_ids)]
+        positions = [firsts[i].index.get_indexer(base['instance_id']) for i in combination]
+
+        frames.append(base.drop(columns=['patch', 'resolved']))
+        patches.append(np.stack([firsts[i]['patch'].to_numpy()[p] for i, p in zip(combination, positions)], axis=1))
+        resolveds.append(np.stack([firsts[i]['resolved'].to_numpy()[p] for i, p in zip(combination, positions)], axis=1))
+        combinations.append(np.full(len(base), len(combinations)))
+    return CandidateGroups(
+        pd.concat(frames, axis=0),
+        np.concatenate(patches).reshape(-1, group_size),
+        np.concatenate(resolveds).reshape(-1, group_size),
+        np.concatenate(combinations),
+    )
+
+
+def sample_rows(rows: np.ndarray, n: int, seed: int = 42) -> np.ndarray:
+    """Same rows, in the same order, as DataFrame.sample(n=n, random_state=seed) over `rows`."""
+    return rows[np.random.RandomState(seed).choice(len(rows), size=n, replace=False)]
+
+
+def balance_complementary(groups: CandidateGroups, seed: int = 42) -> CandidateGroups:
+    """
+    Per source combination, keep as many rows with i resolved candidates as with group_size - i:
+    the larger side is sampled down, and the all-incorrect and all-correct sides are always sampled.
+    """
+    num_correct = groups.num_correct()
+    size = groups.group_size
+    keep = []
+    for combination in np.unique(groups.combination):
+        rows = np.flatnonzero(groups.combination == combination)
+        by_correct = [rows[num_correct[rows] == i] for i in range(size + 1)]
+        for i in range(1, (size + 1) // 2):
+            n = min(len(by_correct[i]), len(by_correct[size - i]))
+            for j in (i, size - i):
+                if len(by_correct[j]) > n:
+                    by_correct[j] = sample_rows(by_correct[j], n, seed)
+        n = min(len(by_correct[0]), len(by_correct[size]))
+        by_correct[0] = sample_rows(by_correct[0], n, seed)
+        by_correct[size] = sample_rows(by_correct[size], n, seed)
+        keep.extend(by_correct)
+    return groups.take(np.concatenate(keep))
+
+
+def cap_uniform(groups: CandidateGroups, seed: int = 42) -> CandidateGroups:
+    """
+    Per source combination, keep the mixed rows, and at most a third as many all-correct and
+    all-incorrect rows each.
+    """
+    num_correct = groups.num_correct()
+    size = groups.group_size
+    keep = []
+    for combination in np.unique(groups.combination):
+        rows = np.flatnonzero(groups.combination == combination)
+        mixed = rows[(num_correct[rows] > 0) & (num_correct[rows] < size)]
+        keep.append(mixed)
+        for uniform in (rows[num_correct[rows] == size], rows[num_correct[rows] == 0]):
+            if len(uniform) > len(mixed) // 3:
+                uniform = sample_rows(uniform, len(mixed) // 3, seed)
+            keep.append(uniform)
+    return groups.take(np.concatenate(keep))
+
+
+def shuffle_rows(groups: CandidateGroups, seed: int = 42) -> CandidateGroups:
+    return groups.take(sample_rows(np.arange(len(groups)), len(groups), seed))
+
+
+def shuffle_candidates(groups: CandidateGroups, seed: int = 42) -> CandidateGroups:
+    """Shuffle the candidates within every row, keeping each patch with its label."""
+    perm = np.random.default_rng(seed).random(groups.patch.shape).argsort(axis=1)
+    return CandidateGroups(
+        groups.frame,
+        np.take_along_axis(groups.patch, perm, axis=1),
+        np.take_along_axis(groups.resolved, perm, axis=1),
+        groups.combination,
+    )
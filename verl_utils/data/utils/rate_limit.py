@@ -0,0 +1,45 @@
+import asyncio
+import functools
+import threading
+import time
+from typing import Callable
+
+
+class RateLimiter:
+    """
+    Token bucket of `rate` requests per second and bursts of `burst`, shared by the threads and
+    coroutines of a process. A caller reserves its token under the lock and then sleeps until the
+    token is due, so waiting callers are served in order.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return how long to wait before it may be used"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate) - 1
+            self.updated = now
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def wrap(self, fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def limited(*args, **kwargs):
+            self.acquire()
+            return fn(*args, **kwargs)
+        return limited
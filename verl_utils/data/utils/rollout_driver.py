@@ -0,0 +1,194 @@
+"""
+Concurrent, resumable driver for the rollout scripts (rollout.py, ver.py, gen.py).
+
+Every process working on an output shares a work queue, `{output}.queue.db` (SQLite), from which
+it claims rows under a lease, and runs `concurrency` conversations at a time. Each finished row is
+appended as one JSON line to the process's own shard in `{output}.shards/`, so a crash loses at
+most the conversations in flight. Starting the same command again, or on more machines sharing the
+output directory, resumes: rows with a valid result are skipped, invalid ones are run again, and
+the leases of rows held by dead processes expire. The process that finishes the queue writes the
+latest result of every row to `{output}` as before.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import json
+import os
+import socket
+import sqlite3
+import time
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from verl_utils.data.utils.rate_limit import RateLimiter
+
+ROLLOUT_CONCURRENCY: int = 8 # Conversations in flight per process
+ROLLOUT_LEASE_SECONDS: float = 4 * 3600 # A claimed row is given to another process after this long
+ROLLOUT_QUEUE_TIMEOUT: float = 600.0
+
+QUEUE_SQL = "CREATE TABLE IF NOT EXISTS queue (key INTEGER PRIMARY KEY, state TEXT NOT NULL, owner TEXT, lease REAL)"
+CLAIM_SQL = """
+UPDATE queue SET state = 'running', owner = ?, lease = ?
+WHERE key = (SELECT key FROM queue WHERE state = 'pending' OR (state = 'running' AND lease < ?) ORDER BY key LIMIT 1)
+RETURNING key
+"""
+
+
+def to_builtin(value):
+    """json.dumps default for the numpy values of rows read from parquet"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class RolloutDriver:
+    def __init__(self, output_path: str, concurrency: int = ROLLOUT_CONCURRENCY,
+                 requests_per_second: Optional[float] = None, lease_seconds: float = ROLLOUT_LEASE_SECONDS):
+        self.output_path = output_path
+        self.shard_dir = f"{output_path}.shards"
+        self.queue_path = f"{output_path}.queue.db"
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.limiter = RateLimiter(requests_per_second, burst=concurrency) if requests_per_second else None
+        self.owner = f"{socket.gethostname()}-{os.getpid()}"
+        self.shard_path = os.path.join(self.shard_dir, f"{self.owner}.jsonl")
+
+    def limit(self, fn: Callable) -> Callable:
+        """`fn` (e.g. get_chat_completion) behind the driver's rate limit"""
+        return self.limiter.wrap(fn) if self.limiter else fn
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.queue_path, timeout=ROLLOUT_QUEUE_TIMEOUT, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def load_records(self) -> dict:
+        """Latest result of every row, from a previous `output_path` and the shards"""
+        records = {}
+        if os.path.exists(self.output_path):
+            for record in pd.read_parquet(self.output_path).to_dict('records'):
+                records[int(record['idx'])] = (0.0, record)
+        for shard in glob.glob(os.path.join(self.shard_dir, "*.jsonl")):
+            with open(shard, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError: # truncated by a crash
+                        continue
+                    if entry['key'] not in records or records[entry['key']][0] <= entry['time']:
+                        records[entry['key']] = (entry['time'], entry['record'])
+        return {key: record for key, (_, record) in records.items()}
+
+    def _init_queue(self, keys: list, is_valid: Callable[[dict], bool]):
+        os.makedirs(self.shard_dir, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(QUEUE_SQL)
+            if conn.execute("SELECT COUNT(*) FROM queue").fetchone()[0] == 0:
+                records = self.load_records()
+                done = {key for key, record in records.items() if is_valid(record)}
+                conn.executemany(
+                    "INSERT INTO queue (key, state) VALUES (?, ?)",
+                    [(key, 'done' if key in done else 'pending') for key in keys]
+                )
+                print(f"Resume from {len(done)} finished rows, {len(records) - len(done)} invalid rows are run again.")
+            else:
+                conn.executemany("INSERT OR IGNORE INTO queue (key, state) VALUES (?, 'pending')", [(key,) for key in keys])
+                conn.execute("UPDATE queue SET state = 'pending', owner = NULL WHERE state = 'failed'")
+                dead = [(owner,) for (owner,) in conn.execute("SELECT DISTINCT owner FROM queue WHERE state = 'running'") if not self._alive(owner)]
+                conn.executemany("UPDATE queue SET state = 'pending', owner = NULL WHERE state = 'running' AND owner = ?", dead)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _alive(owner: str) -> bool:
+        """Whether the process holding a claim may still run; only processes on this host can be checked"""
+        host, _, pid = owner.rpartition("-")
+        if host != socket.gethostname():
+            return True
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _claim(self, conn: sqlite3.Connection) -> Optional[int]:
+        now = time.time()
+        row = conn.execute(CLAIM_SQL, (self.owner, now + self.lease_seconds, now)).fetchone()
+        return None if row is None else row[0]
+
+    def _finish(self, conn: sqlite3.Connection, key: int, valid: bool):
+        conn.execute(
+            "UPDATE queue SET state = ?, lease = NULL WHERE key = ? AND owner = ?",
+            ('done' if valid else 'failed', key, self.owner)
+        )
+
+    def count(self, *states: str) -> int:
+        conn = self._connect()
+        try:
+            placeholders = ", ".join("?" * len(states))
+            return conn.execute(f"SELECT COUNT(*) FROM queue WHERE state IN ({placeholders})", states).fetchone()[0]
+        finally:
+            conn.close()
+
+    async def _work(self, conn, pool, shard, data: pd.DataFrame, process: Callable, is_valid: Callable, pbar: tqdm):
+        loop = asyncio.get_running_loop()
+        while (key := self._claim(conn)) is not None:
+            try:
+                record = await loop.run_in_executor(pool, process, key, data.loc[key])
+            except Exception as e:
+                print(f"ROLLOUT ERROR: row {key}: {str(e)}")
+                self._finish(conn, key, False)
+                pbar.update(1)
+                continue
+            shard.write(json.dumps({"key": key, "time": time.time(), "record": record}, default=to_builtin) + "\n")
+            shard.flush()
+            self._finish(conn, key, is_valid(record))
+            pbar.update(1)
+
+    async def _run(self, data, process, is_valid):
+        conn = self._connect()
+        try:
+            total = conn.execute("SELECT COUNT(*) FROM queue WHERE state = 'pending'").fetchone()[0]
+            with ThreadPoolExecutor(self.concurrency) as pool, open(self.shard_path, "a+") as shard, \
+                    tqdm(total=total, desc=self.owner) as pbar:
+                if shard.tell() > 0: # a shard left by an earlier process with the same pid
+                    shard.seek(shard.tell() - 1)
+                    if shard.read(1) != "\n":
+                        shard.write("\n")
+                await asyncio.gather(*[
+                    self._work(conn, pool, shard, data, process, is_valid, pbar) for _ in range(self.concurrency)
+                ])
+        finally:
+            conn.close()
+
+    def run(self, data: pd.DataFrame, process: Callable[[int, pd.Series], dict], is_valid: Callable[[dict], bool]) -> bool:
+        """
+        Run `process(idx, row)` over the rows of `data` not yet done by any process, and return
+        whether the queue is finished, in which case `output_path` holds every row's latest record.
+        `process` is called from worker threads and `is_valid` decides which records are run again.
+        """
+        self._init_queue([int(key) for key in data.index], is_valid)
+        asyncio.run(self._run(data, process, is_valid))
+        if self.count('pending', 'running') > 0:
+            print(f"Rows are still claimed by other processes, {self.output_path} is written by the last one.")
+            return False
+        self.consolidate()
+        return True
+
+    def consolidate(self):
+        records = self.load_records()
+        msg_df = pd.DataFrame([records[key] for key in sorted(records)])
+        tmp_path = f"{self.output_path}.{self.owner}.tmp"
+        msg_df.to_parquet(tmp_path)
+        os.replace(tmp_path, self.output_path)
+        print(f"Rollout finished. Output path: {self.output_path} ({len(msg_df)} rows, {self.count('failed')} invalid)")
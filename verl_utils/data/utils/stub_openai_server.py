@@ -0,0 +1,128 @@
+"""
+Local stand-in for the OpenAI / Azure OpenAI chat completions endpoint, to exercise api.py and the
+rollout scripts without a real deployment. Point a config.json entry at it:
+
+    {"stub": {"base_url": "http://127.0.0.1:8000", "api_version": "2024-10-21", "api_key": "stub",
+              "model": "stub", "temperature": 0, "max_tokens": 1024}}
+
+    python verl_utils/data/utils/stub_openai_server.py --port 8000 --fail 429,500
+
+Every POST to a path ending in /chat/completions is answered, after the status codes queued in
+`fail` have been returned to the first requests. `reply(body)` gives the assistant's content, tool
+calls and finish reason; by default the last message is echoed back.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128 # concurrent clients connecting at once
+
+
+def echo_reply(body: dict):
+    return f"echo: {body['messages'][-1]['content']}", None, "stop"
+
+
+class StubOpenAIServer:
+    def __init__(self, port: int = 0, reply: Callable = echo_reply, fail: Optional[List[int]] = None, delay: float = 0.0):
+        self.reply = reply
+        self.fail = list(fail or [])
+        self.delay = delay
+        self.requests = [] # Bodies of the requests received, failed ones included
+        self.lock = threading.Lock()
+        self.server = Server(("127.0.0.1", port), self._handler())
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # keep-alive, like the real endpoint
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, payload: dict, headers: Optional[dict] = None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if not self.path.split("?")[0].endswith("/chat/completions"):
+                    return self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                with stub.lock:
+                    stub.requests.append(body)
+                    status = stub.fail.pop(0) if stub.fail else 200
+                if stub.delay:
+                    time.sleep(stub.delay)
+                if status != 200:
+                    # Retry-After of 0 keeps retrying clients fast
+                    return self._send(status, {"error": {"message": f"stub error {status}"}}, {"Retry-After": "0"})
+                self._send(200, stub.completion(body))
+
+        return Handler
+
+    def completion(self, body: dict) -> dict:
+        content, tool_calls, finish_reason = self.reply(body)
+        prompt_tokens = sum(len(str(message.get("content") or "").split()) for message in body["messages"])
+        completion_tokens = len(str(content or "").split())
+        return {
+            "id": f"chatcmpl-stub-{len(self.requests)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content, "tool_calls": tool_calls},
+                "finish_reason": finish_reason,
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def start(self) -> "StubOpenAIServer":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on")
+    parser.add_argument("--fail", type=str, default="", help="comma separated status codes returned to the first requests")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before every response")
+    args = parser.parse_args()
+
+    fail = [int(status) for status in args.fail.split(",") if status]
+    server = StubOpenAIServer(args.port, fail=fail, delay=args.delay)
+    print(f"Stub OpenAI server at {server.url}")
+    server.server.serve_forever()
@@ -1,54 +1,117 @@
 import json
+import multiprocessing
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-# def extract_think_format(llm_solution: str):
-#     assistant_turns = list(filter(None, llm_solution.split('assistant\n')))
+SOLUTION_TAGS = (
+    '<think>', '</think>', '<tool_call>', '</tool_call>', '<tool_response>', '</tool_response>',
+    '[PATCH]', '[/PATCH]', '\\boxed{',
+)
+PAIRED_TAGS = {
+    '<think>': ('think', False), '</think>': ('think', True),
+    '<tool_call>': ('tool_call', False), '</tool_call>': ('tool_call', True),
+    '<tool_response>': ('tool_response', False), '</tool_response>': ('tool_response', True),
+}
 
-#     if not assistant_turns:
-#         return False
+def tokenize_solution(llm_solution: str):
+    """Positions of all SOLUTION_TAGS in order. The tags cannot overlap, so literal searches suffice."""
+    tokens = []
+    find = llm_solution.find
+    for tag in SOLUTION_TAGS:
+        pos = find(tag)
+        while pos != -1:
+            tokens.append((pos, tag))
+            pos = find(tag, pos + len(tag))
+    tokens.sort()
+    return tokens
 
-#     for i, turn in enumerate(assistant_turns):
-#         if turn.count('<think>') != 1 or turn.count('</think>') != 1:
-#             return False
+def parse_solution(llm_solution: str):
+    """
+    Tokenize a solution once for every tag the extractors below look at. Spans are paired the same
+    way as a non-greedy, non-overlapping `re.findall(r'<tag>(.*?)</tag>')` would pair them.
+    Returns a dict with the tag counts, the think/tool_call/tool_response contents, the last
+    [PATCH] block and the last \\boxed{} answer (None if absent).
+    """
+    counts = dict.fromkeys(SOLUTION_TAGS, 0)
+    open_at = {}
+    contents = {'think': [], 'tool_call': [], 'tool_response': []}
+    patch_start = None
+    last_patch = None
+    boxed_end = 0
+    last_boxed = None
+    for start, tag in tokenize_solution(llm_solution):
+        counts[tag] += 1
+        end = start + len(tag)
+        if tag in PAIRED_TAGS:
+            name, is_close = PAIRED_TAGS[tag]
+            if not is_close:
+                open_at.setdefault(name, end)
+            elif name in open_at:
+                contents[name].append(llm_solution[open_at.pop(name):start])
+        elif tag == '\\boxed{':
+            # \boxed{(.*?)} without DOTALL: the answer ends at the first '}' on the same line
+            if start < boxed_end:
+                continue
+            close = llm_solution.find('}', end)
+            if close != -1 and llm_solution.find('\n', end, close) == -1:
+                last_boxed = llm_solution[end:close]
+                boxed_end = close + 1
+        elif tag == '[/PATCH]':
+            # [PATCH]\n(.*?)\n[/PATCH]: the closing tag needs a newline inside the block before it
+            if patch_start is not None and start > patch_start and llm_solution[start - 1] == '\n':
+                last_patch = llm_solution[patch_start:start - 1]
+                patch_start = None
+        elif patch_start is None and llm_solution.startswith('\n', end):
+            patch_start = end + 1
+    return {
+        'counts': counts,
+        'think': contents['think'],
+        'tool_call': contents['tool_call'],
+        'tool_response': contents['tool_response'],
+        'patch': last_patch,
+        'boxed': last_boxed,
+        'bad_think': '<think>\n ' in llm_solution, # verl sglang multi_turn bug: extra space after think.
+    }
 
-#         match = re.search(r'<think>\n(.*?)\n</think>', turn, re.DOTALL)
-#         thought_content = match.group(1)
+def has_not_found_error(text: str):
+    """Same as re.search(r"No .* named .* found\\.", text), i.e. all three parts on one line."""
+    start = text.find('No ')
+    while start != -1:
+        line_end = text.find('\n', start)
+        if line_end == -1:
+            line_end = len(text)
+        named = text.find(' named ', start + 3, line_end)
+        if named != -1 and text.find(' found.', named + 7, line_end) != -1:
+            return True
+        # a later 'No ' on the same line cannot match either
+        start = text.find('No ', line_end)
+    return False
 
-#         if not thought_content:
-#             return False
+def extract_think_format(llm_solution: str, parsed=None):
+    parsed = parsed or parse_solution(llm_solution)
+    think_pair_count = len(parsed['think'])
+    think_left_count = parsed['counts']['<think>']
+    think_right_count = parsed['counts']['</think>']
 
-#         first_char = thought_content[0]
-#         if not first_char.isalnum():
-#             return False
-
-#     return True
-
-def extract_think_format(llm_solution: str):
-    think_pair_count = len(re.findall(r'<think>(.*?)</think>', llm_solution, re.DOTALL))
-    think_left_count = len(re.findall(r'<think>', llm_solution, re.DOTALL))
-    think_right_count = len(re.findall(r'</think>', llm_solution, re.DOTALL))
-
-    bad_pattern = re.search(r'<think>\n ', llm_solution) # verl sglang multi_turn bug: extra space after think.
-
-    if think_pair_count == think_left_count and think_left_count == think_right_count and not bad_pattern:
+    if think_pair_count == think_left_count and think_left_count == think_right_count and not parsed['bad_think']:
         return True
     else:
         return False
 
-def extract_tool_format(llm_solution: str):
-    tool_call_pattern = r'<tool_call>(.*?)</tool_call>'
-    tool_calls = re.findall(tool_call_pattern, llm_solution, re.DOTALL)
-    
-    tool_response_pattern = r'<tool_response>(.*?)</tool_response>'
-    tool_responses = re.findall(tool_response_pattern, llm_solution, re.DOTALL)
+def extract_tool_format(llm_solution: str, parsed=None):
+    parsed = parsed or parse_solution(llm_solution)
+    tool_calls = parsed['tool_call']
+    tool_responses = parsed['tool_response']
 
     error_count = 0
     for tool_response in tool_responses:
         if 'Tool call execute failed, exception message:' in tool_response: # format error
             return False
-        elif re.search(r"No .* named .* found\.", tool_response): # search error
+        elif has_not_found_error(tool_response): # search error
             error_count += 1
-        elif re.search(r"No edit was performed\.", tool_response): # edit error
+        elif "No edit was performed." in tool_response: # edit error
             error_count += 1
     
     tool_call_count = len(tool_calls)
@@ -57,11 +120,12 @@ def extract_tool_format(llm_solution: str):
     unique_tool_call_count = len(set(tool_calls))
     unique_tool_response_count = len(set(tool_responses))
 
-    tool_call_left_count = len(re.findall(r'<tool_call>', llm_solution, re.DOTALL))
-    tool_call_right_count = len(re.findall(r'</tool_call>', llm_solution, re.DOTALL))
+    counts = parsed['counts']
+    tool_call_left_count = counts['<tool_call>']
+    tool_call_right_count = counts['</tool_call>']
 
-    tool_response_left_count = len(re.findall(r'<tool_response>', llm_solution, re.DOTALL))
-    tool_response_right_count = len(re.findall(r'</tool_response>', llm_solution, re.DOTALL)) 
+    tool_response_left_count = counts['<tool_response>']
+    tool_response_right_count = counts['</tool_response>']
     if tool_call_count == 0 and tool_response_count == 0: # do not use tool
         return False
     elif tool_call_count != tool_response_count: # call and response do not match
@@ -79,29 +143,64 @@ def extract_tool_format(llm_solution: str):
                 call_dict = json.loads(call_json)
                 if call_dict['name'] == 'search_tool': # search only (mandatory)
                     construct = call_dict['arguments']['construct']
-                    if construct in ["function", "class", "class_method"] and not re.search(r"No .* named .* found\.", tool_responses[i].strip()):
+                    if construct in ["function", "class", "class_method"] and not has_not_found_error(tool_responses[i].strip()):
                         return True
             return False
         except Exception as e:
             print(f"Error occurred when extracting tool format: {str(e)}")
             return False
 
-def extract_patch(llm_solution: str):
-    patch_pattern = r'\[PATCH\]\n(.*?)\n\[/PATCH\]'
-    patch_match = re.findall(patch_pattern, llm_solution, re.DOTALL)
-    if patch_match:
-        return patch_match[-1].strip() # use final patch
+def extract_patch(llm_solution: str, parsed=None):
+    parsed = parsed or parse_solution(llm_solution)
+    if parsed['patch'] is not None:
+        return parsed['patch'].strip() # use final patch
     else:
         return "" # no patch
         
-def extract_answer_naive(llm_solution: str):
-    answer_pattern = r'\\boxed\{(.*?)\}'
-    answer_match = re.findall(answer_pattern, llm_solution)
-    if answer_match:
-        return answer_match[-1].strip() # use final answer
+def extract_answer_naive(llm_solution: str, parsed=None):
+    parsed = parsed or parse_solution(llm_solution)
+    if parsed['boxed'] is not None:
+        return parsed['boxed'].strip() # use final answer
     else:
         return None # no answer
 
+def extract_solution(llm_solution: str):
+    """Patch and format flags of one rollout from a single parse."""
+    parsed = parse_solution(llm_solution)
+    return (
+        extract_patch(llm_solution, parsed),
+        extract_tool_format(llm_solution, parsed),
+        extract_think_format(llm_solution, parsed),
+    )
+
+EXTRACT_NUM_WORKERS = int(os.environ.get("EXTRACT_NUM_WORKERS", min(8, os.cpu_count() or 1)))
+EXTRACT_PARALLEL_THRESHOLD = 512 # Smaller batches are parsed in-process, where pickling would dominate
+_extract_pool = None
+
+def extract_solution_batch(solution_strs):
+    """
+    extract_solution over a batch of rollouts, returning (patch_strs, tool_format_flags, think_format_flags).
+    Large batches are spread over a persistent process pool.
+    """
+    global _extract_pool
+    if EXTRACT_NUM_WORKERS > 1 and len(solution_strs) >= EXTRACT_PARALLEL_THRESHOLD:
+        if _extract_pool is None:
+            # spawn: the caller may hold threads (e.g. the reward client event loop)
+            _extract_pool = ProcessPoolExecutor(EXTRACT_NUM_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        chunksize = max(1, len(solution_strs) // (EXTRACT_NUM_WORKERS * 4))
+        try:
+            results = list(_extract_pool.map(extract_solution, solution_strs, chunksize=chunksize))
+        except BrokenProcessPool as e:
+            print(f"Extraction pool failed: {str(e)}. Falling back to in-process parsing.")
+            _extract_pool = None
+            results = [extract_solution(sol) for sol in solution_strs]
+    else:
+        results = [extract_solution(sol) for sol in solution_strs]
+    if not results:
+        return [], [], []
+    patch_strs, tool_format_flags, think_format_flags = map(list, zip(*results))
+    return patch_strs, tool_format_flags, think_format_flags
+
 def extract_answer_vm(llm_solution: str):
     answer_pattern = r'<judgement>(.*?)</judgement>'
     answer_match = re.findall(answer_pattern, llm_solution)
@@ -124,23 +223,12 @@ def extract_answer_rm(llm_solution: str):
     else:
         return None # no answer
 
-def extract_answer_pair(llm_solution: str):
-    answer_pattern = r'\\boxed\{(.*?)\}'
-    answer_match = re.findall(answer_pattern, llm_solution)
-    if answer_match:
-        return answer_match[-1].strip() # use final answer
-    else:
-        return None # no answer
+def extract_answer_pair(llm_solution: str, parsed=None):
+    return extract_answer_naive(llm_solution, parsed)
 
-def extract_batch_combine(llm_solution: str):
-    answer = None
-    # answer_pattern = r'\\boxed\{(\d*?)\}'
-    answer_pattern = r'\\boxed\{(.*?)\}'
-    answer_match = re.findall(answer_pattern, llm_solution)
-    # if answer_match and len(answer_match) == 1:
-    if answer_match:
-        answer = answer_match[-1].strip() # use final answer
-    else:
+def extract_batch_combine(llm_solution: str, parsed=None):
+    answer = extract_answer_naive(llm_solution, parsed) # use final answer
+    if answer is None:
         return None # no answer
 
     if ', ' in answer: # fuzz match
@@ -164,4 +252,77 @@ def extract_batch_combine(llm_solution: str):
         if len(answer_list) == len(answer_set):
             return [True if i in answer_set else False for i in range(1, 5)]
         else:
-            return None # duplicated
\ No newline at end of file
+            return None # duplicated
+
+# patch functions
+
+INDEX_LINE_PATTERN = re.compile(r'index [a-f0-9]+\.\.[a-f0-9]+(?: \d+)?')
+NEW_FILE_MODE_PATTERN = re.compile(r'new file mode \d{6}')
+
+def is_noise_line(line):
+    """
+    Checks if a changed line (without its +/- sign) only touches comments or whitespace.
+    A line is considered noise if it's empty/whitespace, a single-line comment or a one-line docstring.
+    """
+    stripped_line = line.strip()
+    return not stripped_line \
+        or stripped_line.startswith('#') \
+        or (stripped_line.startswith('"""') and stripped_line.endswith('"""')) \
+        or (stripped_line.startswith("'''") and stripped_line.endswith("'''"))
+
+def clean_file_diff(lines, has_trailing_newline):
+    """
+    Scan the lines of one `diff --git` section once. Returns None if the section should be
+    dropped (non-python/test/reproduce/new file, or only comment/whitespace changes), otherwise
+    the section text with its 'index xxxx..xxxx' line removed.
+    """
+    # The header must be followed by a newline, i.e. the section has a body
+    if len(lines) < 2:
+        return None
+    header = lines[0][len('diff --git a/'):]
+    if ' b/' not in header:
+        return None
+    origin_filename = header[:header.index(' b/')]
+    filename_lower = origin_filename.lower()
+    if ".py" not in filename_lower \
+        or "test" in filename_lower and 'pytest' not in filename_lower \
+        or "reproduce" in filename_lower \
+        or origin_filename == '/dev/null':
+        return None
+
+    has_substantive_change = False
+    kept_lines = [lines[0]]
+    last = len(lines) - 1
+    prev_removed = False
+    for i in range(1, len(lines)):
+        line = lines[i]
+        if line == '--- /dev/null' or NEW_FILE_MODE_PATTERN.fullmatch(line):
+            return None
+        # Added or removed lines, excluding the diff header lines --- and +++
+        if len(line) > 1 and line[0] in '+-' \
+                and not (line[1] in '+-' and line[2:3] in ('+', '-') and line[3:4] == ' ') \
+                and not is_noise_line(line[1:]):
+            has_substantive_change = True
+        # Drop 'index' lines enclosed by newlines (the newline before a dropped line is consumed)
+        if not prev_removed and (i < last or has_trailing_newline) and INDEX_LINE_PATTERN.fullmatch(line):
+            prev_removed = True
+            continue
+        prev_removed = False
+        kept_lines.append(line)
+
+    if not has_substantive_change:
+        return None
+    return '\n'.join(kept_lines) + ('\n' if has_trailing_newline else '')
+
+def get_pure_patch(patch_str):
+    lines = patch_str.split('\n')
+    header_indices = [i for i, line in enumerate(lines) if line.startswith('diff --git a/')]
+    filtered_patches = []
+    for n, start in enumerate(header_indices):
+        is_last = n == len(header_indices) - 1
+        end = len(lines) if is_last else header_indices[n + 1]
+        file_diff = clean_file_diff(lines[start:end], has_trailing_newline=not is_last)
+        if file_diff is not None:
+            filtered_patches.append(file_diff)
+    patch = '\n'.join(filtered_patches)
+    return patch.strip()
@@ -0,0 +1,80 @@
+"""
+Local stand-in for the SWE-bench evaluation harness, serving the same /evaluate, /progress/{run_id}
+and /download/{result_file} endpoints used by model_client.py. Each run stays 'running' for
+--duration seconds, then resolves a deterministic pseudo-random subset of the submitted patches.
+
+Usage:
+    python verl_utils/reward/harness_stub.py --port 8366 --duration 30
+    # then set HARNESS_URL = "http://127.0.0.1:8366/" in model_client.py
+"""
+import argparse
+import hashlib
+import json
+import time
+import uuid
+
+from aiohttp import web
+
+
+def is_resolved(instance_id: str, patch: str, resolve_rate: float) -> bool:
+    digest = hashlib.sha1(f"{instance_id}\n{patch}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") / 2**32 < resolve_rate
+
+
+def create_app(duration: float, resolve_rate: float, error_rate: float) -> web.Application:
+    runs = {}
+
+    async def evaluate(request: web.Request) -> web.Response:
+        form = await request.post()
+        content = form["file"].file.read().decode("utf-8")
+        predictions = [json.loads(line) for line in content.splitlines() if line.strip()]
+        run_id = uuid.uuid4().hex[:12]
+        resolved_ids = sorted({
+            p["instance_id"] for p in predictions if is_resolved(p["instance_id"], p["model_patch"], resolve_rate)
+        })
+        runs[run_id] = {
+            "start": time.monotonic(),
+            "failed": is_resolved(run_id, "", error_rate),
+            "result": {
+                "dataset": form.get("dataset"),
+                "submitted_instances": len(predictions),
+                "resolved_instances": len(resolved_ids),
+                "resolved_ids": resolved_ids,
+            },
+        }
+        print(f"Run {run_id}: {len(predictions)} predictions, {len(resolved_ids)} resolved.")
+        return web.json_response({"run_id": run_id})
+
+    async def progress(request: web.Request) -> web.Response:
+        run_id = request.match_info["run_id"]
+        if run_id not in runs:
+            return web.json_response({"error": f"Unknown run_id {run_id}"}, status=404)
+        run = runs[run_id]
+        if time.monotonic() - run["start"] < duration:
+            return web.json_response({"status": "running"})
+        if run["failed"]:
+            return web.json_response({"status": "error", "output": "Simulated harness failure."})
+        return web.json_response({"status": "completed", "result_file": f"{run_id}.json"})
+
+    async def download(request: web.Request) -> web.Response:
+        run_id = request.match_info["result_file"].rsplit(".", 1)[0]
+        if run_id not in runs:
+            return web.json_response({"error": "Unknown result file"}, status=404)
+        return web.json_response(runs[run_id]["result"])
+
+    app = web.Application(client_max_size=1024**3)
+    app.router.add_post("/evaluate", evaluate)
+    app.router.add_get("/progress/{run_id}", progress)
+    app.router.add_get("/download/{result_file}", download)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8366)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds each run stays running")
+    parser.add_argument("--resolve-rate", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of runs that end in an error")
+    args = parser.parse_args()
+    web.run_app(create_app(args.duration, args.resolve_rate, args.error_rate), host=args.host, port=args.port)
@@ -1,24 +1,57 @@
+import asyncio
+import atexit
+import concurrent.futures
+import gzip
+import hashlib
 import json
 import os
 import random
+import sqlite3
 import sys
+import threading
 import time
+import uuid
 from collections import defaultdict
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+import aiohttp
 import requests
 from pydantic import BaseModel
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 from verl_utils.reward.extract_answer import (extract_patch,
+                                              extract_solution_batch,
                                               extract_think_format,
-                                              extract_tool_format)
+                                              extract_tool_format,
+                                              get_pure_patch)
 
 random.seed(42)
 HARNESS_URL = "http://@/"
 SERVER_URL = "@:/score"
 RM_BATCH_SIZE = 4
+RM_CHUNK_SIZE = 16 # Number of batches per sub-request to the reward server
+RM_MAX_CONCURRENCY = 8 # Number of sub-requests in flight at once
+RM_MAX_CONNECTIONS = 64
+RM_TIMEOUT = 3600.0 # Total timeout of one sub-request in seconds
+RM_CONNECT_TIMEOUT = 30.0
+RM_MAX_RETRIES = 3
+RM_RETRY_DELAY = 2.0 # Base delay of exponential backoff in seconds
+RM_GZIP = False # Gzip request payloads, which contain full issues and patches
+RM_CACHE_PATH = os.environ.get("RM_CACHE_PATH", "") # Score cache, e.g. ~/.cache/verl_utils/reward_scores.db; off when empty
+RM_CACHE_TTL = 7 * 24 * 3600 # Seconds before a cached score expires
+RM_JUDGE_ID_TTL = 600.0 # Seconds before the judge fingerprint is fetched from the server again
+RM_CACHE_MAX_ENTRIES = 1000000
+HARNESS_POLL_MIN_INTERVAL = 5.0 # First polling interval in seconds, grows while the run is still running
+HARNESS_POLL_MAX_INTERVAL = 60.0
+HARNESS_POLL_BACKOFF = 1.5
+HARNESS_TIMEOUT = 4500.0 # Seconds before a run is given up
+HARNESS_REPORT_ONLY = os.environ.get("HARNESS_REPORT_ONLY", "0") == "1" # Test batches get placeholder scores, harness results are only logged
 
 # --- Pydantic Models ---
 class BatchRequest(BaseModel):
@@ -32,6 +65,321 @@ class BatchItem(BaseModel):
 class MultiBatchRequest(BaseModel):
     batches: List[BatchItem]
 
+class RewardClient:
+    """
+    Pooled HTTP client for the reward server. Requests are split into chunks that are sent
+    concurrently and retried independently, on an event loop owned by a background thread so
+    that connections are reused across synchronous `compute_score_batch` calls.
+    """
+    def __init__(self, url: str):
+        self.url = url
+        self.info_url = url.rsplit('/', 1)[0] + '/info'
+        self.session = None
+        self.judge_id = None
+        self.judge_id_time = 0.0
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=RM_MAX_CONNECTIONS)
+            timeout = aiohttp.ClientTimeout(total=RM_TIMEOUT, connect=RM_CONNECT_TIMEOUT)
+            # trust_env=False: do not use proxy
+            self.session = aiohttp.ClientSession(connector=connector, timeout=timeout, trust_env=False)
+        return self.session
+
+    def _encode(self, payload: MultiBatchRequest):
+        data = payload.model_dump(mode="json")
+        body = orjson.dumps(data) if orjson is not None else json.dumps(data).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if RM_GZIP:
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        return body, headers
+
+    async def _post_chunk(self, chunk: List[BatchItem], semaphore: asyncio.Semaphore) -> Tuple[Dict[str, List[float]], List[str]]:
+        body, headers = self._encode(MultiBatchRequest(batches=chunk))
+        async with semaphore:
+            for attempt in range(RM_MAX_RETRIES):
+                try:
+                    session = await self._get_session()
+                    async with session.post(self.url, data=body, headers=headers) as response:
+                        response.raise_for_status()
+                        result = await response.json(loads=orjson.loads if orjson is not None else json.loads)
+                        return result.get("scores", {}), result.get("fallback", [])
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e: # ValueError: truncated or invalid JSON body
+                    if attempt < RM_MAX_RETRIES - 1:
+                        print(f"Request failed: {str(e)}. Retry attempts: {attempt+1}.")
+                        await asyncio.sleep(RM_RETRY_DELAY * (2 ** attempt))
+                    else:
+                        print(f"Request failed for {len(chunk)} batches: {str(e)}. They get 0 reward.")
+        return {}, []
+
+    async def _score(self, batch_items: List[BatchItem]) -> Tuple[Dict[str, List[float]], List[str]]:
+        semaphore = asyncio.Semaphore(RM_MAX_CONCURRENCY)
+        chunks = [batch_items[i:i+RM_CHUNK_SIZE] for i in range(0, len(batch_items), RM_CHUNK_SIZE)]
+        results = await asyncio.gather(*[self._post_chunk(chunk, semaphore) for chunk in chunks])
+        batch_results = {}
+        fallback = []
+        for scores, chunk_fallback in results:
+            batch_results.update(scores)
+            fallback.extend(chunk_fallback)
+        return batch_results, fallback
+
+    def score(self, batch_items: List[BatchItem]) -> Tuple[Dict[str, List[float]], List[str]]:
+        """Scores of every batch that was scored, and the ids of those scored by the server's no-vote fallback"""
+        return asyncio.run_coroutine_threadsafe(self._score(batch_items), self.loop).result()
+
+    async def _get_info(self) -> Dict[str, Any]:
+        session = await self._get_session()
+        async with session.get(self.info_url, timeout=aiohttp.ClientTimeout(total=RM_CONNECT_TIMEOUT)) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    def get_judge_id(self) -> Optional[str]:
+        """Fingerprint of the judge checkpoint and sampling setup served by the reward server."""
+        if self.judge_id is not None and time.monotonic() - self.judge_id_time < RM_JUDGE_ID_TTL:
+            return self.judge_id
+        try:
+            info = asyncio.run_coroutine_threadsafe(self._get_info(), self.loop).result()
+        except Exception as e:
+            print(f"Failed to get reward server info: {str(e)}. Score cache is bypassed.")
+            return None
+        self.judge_id = hashlib.sha256(json.dumps(info, sort_keys=True).encode("utf-8")).hexdigest()
+        self.judge_id_time = time.monotonic()
+        return self.judge_id
+
+    def close(self):
+        if self.session is not None and not self.session.closed:
+            asyncio.run_coroutine_threadsafe(self.session.close(), self.loop).result(timeout=10)
+
+class ScoreCache:
+    """
+    On-disk SQLite cache of reward server scores, keyed by the judge fingerprint and the cleaned
+    issue and patches. Entries of any other judge are dropped once a new judge is seen.
+    """
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.judge_id = None
+        self.lock = threading.Lock()
+        self.db_connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.db_connection.execute("PRAGMA journal_mode=WAL")
+        self.db_connection.execute(SCORE_CACHE_SQL)
+        self.db_connection.execute("CREATE INDEX IF NOT EXISTS idx_scores_accessed ON scores (accessed)")
+        self.db_connection.commit()
+
+    @staticmethod
+    def get_key(judge_id: str, issue: str, patch_list: List[str]) -> str:
+        content = json.dumps([judge_id, issue.strip(), [get_pure_patch(patch) for patch in patch_list]])
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def set_judge(self, judge_id: str) -> None:
+        if judge_id == self.judge_id:
+            return
+        with self.lock:
+            self.db_connection.execute("DELETE FROM scores WHERE judge != ?", (judge_id,))
+            self.db_connection.commit()
+            self.judge_id = judge_id
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        now = time.time()
+        hits = {}
+        with self.lock:
+            for i in range(0, len(keys), 500): # stay below the sqlite variable limit
+                chunk = keys[i:i+500]
+                placeholders = ','.join('?' * len(chunk))
+                entries = self.db_connection.execute(
+                    f"SELECT key, scores FROM scores WHERE key IN ({placeholders}) AND created >= ?",
+                    (*chunk, now - RM_CACHE_TTL)
+                ).fetchall()
+                hits.update({key: json.loads(scores) for key, scores in entries})
+            self.db_connection.executemany(
+                "UPDATE scores SET accessed = ? WHERE key = ?", [(now, key) for key in hits]
+            )
+            self.db_connection.commit()
+        return hits
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        now = time.time()
+        with self.lock:
+            self.db_connection.executemany(
+                "INSERT OR REPLACE INTO scores (key, judge, scores, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                [(key, self.judge_id, json.dumps(scores), now, now) for key, scores in items.items()]
+            )
+            # TTL and size eviction, least recently used first
+            self.db_connection.execute("DELETE FROM scores WHERE created < ?", (now - RM_CACHE_TTL,))
+            total = self.db_connection.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+            if total > RM_CACHE_MAX_ENTRIES:
+                self.db_connection.execute(
+                    "DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY accessed LIMIT ?)",
+                    (total - RM_CACHE_MAX_ENTRIES,)
+                )
+            self.db_connection.commit()
+
+SCORE_CACHE_SQL = """
+    CREATE TABLE IF NOT EXISTS scores (
+        key TEXT PRIMARY KEY,
+        judge TEXT NOT NULL,
+        scores TEXT NOT NULL,
+        created REAL NOT NULL,
+        accessed REAL NOT NULL
+    )"""
+
+_reward_client = None
+_score_cache = None
+
+def get_reward_client() -> RewardClient:
+    global _reward_client
+    if _reward_client is None:
+        _reward_client = RewardClient(SERVER_URL)
+    return _reward_client
+
+def get_score_cache(judge_id: Optional[str]) -> Optional[ScoreCache]:
+    global _score_cache
+    if not RM_CACHE_PATH or judge_id is None:
+        return None
+    if _score_cache is None:
+        _score_cache = ScoreCache(RM_CACHE_PATH)
+    _score_cache.set_judge(judge_id)
+    return _score_cache
+
+class HarnessClient:
+    """
+    Client for the SWE-bench evaluation harness. Runs are submitted and polled on the event loop
+    of the reward client, so several runs can be in flight while the caller carries on.
+    """
+    def __init__(self, url: str, client: RewardClient):
+        self.url = url
+        self.client = client
+        self.lock = threading.Lock()
+        self.pending: List[concurrent.futures.Future] = []
+        self.finished: List[Tuple[str, List[float]]] = []
+
+    async def _submit(self, jsonl_content: str) -> str:
+        session = await self.client._get_session()
+        form = aiohttp.FormData()
+        form.add_field("dataset", "SWE-bench/SWE-bench_Verified")
+        form.add_field("file", jsonl_content.encode("utf-8"), filename="predictions.jsonl", content_type="application/octet-stream")
+        async with session.post(f"{self.url}evaluate", data=form, timeout=aiohttp.ClientTimeout(total=60)) as response:
+            response.raise_for_status()
+            result = await response.json()
+        run_id = result.get("run_id")
+        if not run_id:
+            raise ValueError("Server response did not include a run_id.")
+        return run_id
+
+    async def _poll(self, run_id: str) -> Optional[str]:
+        polling_url = f"{self.url}progress/{run_id}"
+        interval = HARNESS_POLL_MIN_INTERVAL
+        deadline = time.monotonic() + HARNESS_TIMEOUT
+        while time.monotonic() < deadline:
+            try:
+                session = await self.client._get_session()
+                async with session.get(polling_url, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                    response.raise_for_status()
+                    data = await response.json()
+                status = data.get("status")
+                if status == "completed":
+                    print(f"Evaluation {run_id} completed.")
+                    return data.get("result_file")
+                elif status == "error":
+                    print(f"Evaluation {run_id} failed on the server. Log: {data.get('output')}")
+                    return None
+                elif status != "running":
+                    print(f"Unknown status received for {run_id}: {status}. Aborting.")
+                    return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Error polling for progress of {run_id}: {e}. Retrying in {interval:.0f}s...")
+            await asyncio.sleep(interval)
+            interval = min(interval * HARNESS_POLL_BACKOFF, HARNESS_POLL_MAX_INTERVAL)
+        print(f"Polling timed out. Could not retrieve results of {run_id}.")
+        return None
+
+    async def _evaluate(self, payload: List[Dict[str, str]], run_key: str) -> Optional[List[str]]:
+        """Evaluate one submission and return its resolved instance ids, or None on failure."""
+        jsonl_content = "\n".join([json.dumps(p) for p in payload])
+        with open(f'cached_submission_{run_key}.jsonl', 'w') as f:
+            f.write(jsonl_content)
+        try:
+            run_id = await self._submit(jsonl_content)
+            print(f"Submission successful. Received run_id: {run_id}")
+        except Exception as e:
+            print(f"Error submitting evaluation request: {e}")
+            return None
+
+        result_filename = await self._poll(run_id)
+        if not result_filename:
+            return None
+
+        try:
+            session = await self.client._get_session()
+            download_url = f"{self.url}download/{result_filename}"
+            print(f"Downloading result file from: {download_url}")
+            async with session.get(download_url, timeout=aiohttp.ClientTimeout(total=60)) as response:
+                response.raise_for_status()
+                eval_results = await response.json(content_type=None)
+            with open(f"cached_harness_{run_key}.json", 'w') as f:
+                f.write(json.dumps(eval_results))
+            return eval_results['resolved_ids']
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Failed to download or parse result file: {e}")
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Error parsing result file: {e}")
+        return None
+
+    def evaluate(self, payload: List[Dict[str, str]], run_key: str) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(self._evaluate(payload, run_key), self.client.loop)
+
+    def defer(self, payload: List[Dict[str, str]], run_key: str, to_scores: Callable[[Optional[List[str]]], List[float]],
+              on_result: Optional[Callable[[str, List[float]], None]] = None) -> concurrent.futures.Future:
+        """
+        Evaluate in the background and attach the scores to `finished` once the run returns.
+        `on_result` is called on the event loop thread and should not block.
+        """
+        async def _run():
+            scores = to_scores(await self._evaluate(payload, run_key))
+            with self.lock:
+                self.finished.append((run_key, scores))
+            if on_result is not None:
+                try:
+                    on_result(run_key, scores)
+                except Exception as e:
+                    print(f"Callback for evaluation {run_key} failed: {e}")
+
+        def _done(future):
+            with self.lock:
+                self.pending.remove(future)
+
+        future = asyncio.run_coroutine_threadsafe(_run(), self.client.loop)
+        with self.lock:
+            self.pending.append(future)
+        future.add_done_callback(_done)
+        return future
+
+    def collect(self, wait: bool = False) -> List[Tuple[str, List[float]]]:
+        """Pop the scores of runs finished so far; with `wait`, first wait for all runs in flight."""
+        if wait:
+            with self.lock:
+                pending = list(self.pending)
+            concurrent.futures.wait(pending)
+        with self.lock:
+            finished, self.finished = self.finished, []
+        return finished
+
+_harness_client = None
+
+def get_harness_client() -> HarnessClient:
+    global _harness_client
+    if _harness_client is None:
+        _harness_client = HarnessClient(HARNESS_URL, get_reward_client())
+    return _harness_client
+
+def new_run_key() -> str:
+    """Unique key of one evaluation, used in the names of its cached files and in collect() results."""
+    return f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{uuid.uuid4().hex[:8]}"
+
 def compute_score_remote_stage(data_sources, solution_strs, ground_truths, extra_infos):
     scores = compute_score_remote(data_sources, solution_strs, ground_truths, extra_infos)
     new_scores = []
@@ -58,6 +406,11 @@ def random_reward(data_sources, solution_strs, ground_truths, extra_infos):
 
 def compute_score_remote(data_sources, solution_strs, ground_truths, extra_infos):
     if 'test' in data_sources[0]:
+        if HARNESS_REPORT_ONLY:
+            # scores of earlier runs were logged by log_bench_scores when they arrived
+            collect_bench_scores()
+            return report_score_bench(data_sources, solution_strs, ground_truths, extra_infos,
+                                      on_result=log_bench_scores)
         # return compute_score_bench(data_sources, solution_strs, ground_truths, extra_infos)
         return compute_score_record(data_sources, solution_strs, ground_truths, extra_infos)
     else:
@@ -68,7 +421,7 @@ def compute_score_random(data_sources, solution_strs, ground_truths, extra_infos
     return [float(random.choice([0, 1])) if extract_tool_format(sol) and extract_think_format(sol) else 0.0 for sol in solution_strs]
 
 def compute_score_record(data_sources, solution_strs, ground_truths, extra_infos):
-    ts = datetime.fromtimestamp(time.time()).strftime("%Y-%m-%d_%H-%M-%S")
+    run_key = new_run_key()
     patch_strs = [extract_patch(sol) for sol in solution_strs]
     payload = []
     for idx, (patch, extra_info) in enumerate(zip(patch_strs, extra_infos)):
@@ -80,20 +433,17 @@ def compute_score_record(data_sources, solution_strs, ground_truths, extra_infos
             })
 
     jsonl_content = "\n".join([json.dumps(p) for p in payload])
-    with open(f'cached_submission_{ts}.jsonl', 'w') as f:
+    with open(f'cached_submission_{run_key}.jsonl', 'w') as f:
         f.write(jsonl_content)
     if os.path.exists("/mnt/bn/-research-models/"):
-        with open(f"/mnt/bn/-research-models/cached_submission_{ts}.jsonl", 'w') as f:
+        with open(f"/mnt/bn/-research-models/cached_submission_{run_key}.jsonl", 'w') as f:
             f.write(jsonl_content)
     else:
         print("ERROR: NO MNT FOR SAVING!")
 
     return [0.0] * len(patch_strs)
 
-def compute_score_bench(data_sources, solution_strs, ground_truths, extra_infos):
-
-    ts = datetime.fromtimestamp(time.time()).strftime("%Y-%m-%d_%H-%M-%S")
-    
+def prepare_bench_submission(solution_strs, extra_infos, run_key):
     payload = []
     empty_indices = []
     empty_instances = []
@@ -115,109 +465,63 @@ def compute_score_bench(data_sources, solution_strs, ground_truths, extra_infos)
             if instance_id not in valid_indices_map:
                 valid_indices_map[instance_id] = idx
 
-    with open(f'cached_empty_ids_{ts}.txt', 'w') as f:
+    with open(f'cached_empty_ids_{run_key}.txt', 'w') as f:
         f.write('\n'.join(empty_instances))
 
-    if not payload:
-        scores = [0.0] * len(patch_strs)
+    def to_scores(resolved_ids):
+        if resolved_ids is None:
+            print("All submissions get 0 reward.")
+            return [0.0] * len(patch_strs)
+        final_scores = [0.0] * len(patch_strs)
+        for resolved_id in resolved_ids:
+            if resolved_id not in valid_indices_map:
+                print(f"Resolved id {resolved_id} was not submitted, ignored.")
+                continue
+            final_scores[valid_indices_map[resolved_id]] = 1.0
         for idx in empty_indices:
-            scores[idx] = -1.0
-        return scores
-
-    run_id = None
-    try:
-        jsonl_content = "\n".join([json.dumps(p) for p in payload])
-
-        with open(f'cached_submission_{ts}.jsonl', 'w') as f:
-            f.write(jsonl_content)
-        
-        data = {"dataset": "SWE-bench/SWE-bench_Verified"}
-        files = {'file': ('predictions.jsonl', jsonl_content.encode('utf-8'), 'application/octet-stream')}
-        
-        print("Uploading patches to evaluation server...")
-        submit_url = f"{HARNESS_URL}evaluate"
-        response = requests.post(submit_url, data=data, files=files, timeout=60)
-        response.raise_for_status()
-        
-        result = response.json()
-        run_id = result.get("run_id")
-        if not run_id:
-            raise ValueError("Server response did not include a run_id.")
-        print(f"Submission successful. Received run_id: {run_id}")
+            final_scores[idx] = -1.0
+        return final_scores
 
-    except Exception as e:
-        print(f"Error submitting evaluation request: {e}")
-        print("All submissions get 0 reward.")
-        return [0.0] * len(patch_strs)
+    return payload, to_scores
 
-    result_filename = None
-    polling_url = f"{HARNESS_URL}progress/{run_id}"
-    POLLING_INTERVAL = 15
-    MAX_POLLING_ATTEMPTS = 300
-    
-    print("Polling for results...")
-    for attempt in range(MAX_POLLING_ATTEMPTS):
-        try:
-            response = requests.get(polling_url, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            
-            status = data.get('status')
-            if status == 'completed':
-                print("Evaluation completed.")
-                result_filename = data.get('result_file')
-                break
-            elif status == 'error':
-                print(f"Evaluation failed on the server. Log: {data.get('output')}")
-                print("All submissions get 0 reward.")
-                return [0.0] * len(patch_strs)
-            elif status == 'running':
-                print(f"Attempt {attempt + 1}/{MAX_POLLING_ATTEMPTS}: Status is 'running'. Waiting for {POLLING_INTERVAL}s...")
-                time.sleep(POLLING_INTERVAL)
-            else:
-                print(f"Unknown status received: {status}. Aborting.")
-                return [0.0] * len(patch_strs)
-
-        except requests.exceptions.RequestException as e:
-            print(f"Error polling for progress: {e}. Retrying in {POLLING_INTERVAL}s...")
-            time.sleep(POLLING_INTERVAL)
-    
-    if not result_filename:
-        print("Polling timed out. Could not retrieve results.")
-        return [0.0] * len(patch_strs)
+def compute_score_bench(data_sources, solution_strs, ground_truths, extra_infos):
+    run_key = new_run_key()
+    payload, to_scores = prepare_bench_submission(solution_strs, extra_infos, run_key)
+    if not payload:
+        return to_scores([])
+
+    print("Uploading patches to evaluation server...")
+    resolved_ids = get_harness_client().evaluate(payload, run_key).result()
+    return to_scores(resolved_ids)
+
+def report_score_bench(data_sources, solution_strs, ground_truths, extra_infos, on_result=None):
+    """
+    Report-only, non-blocking compute_score_bench: submits the patches and returns placeholder
+    scores (-1.0 for empty patches, 0.0 otherwise) right away. The placeholders are not the
+    harness verdict and the real scores never reach the trainer's rewards or validation metrics:
+    they are passed to `on_result(run_key, scores)`, returned by collect_bench_scores() and
+    written to cached_harness_{run_key}.json once the harness finishes.
+    """
+    run_key = new_run_key()
+    payload, to_scores = prepare_bench_submission(solution_strs, extra_infos, run_key)
+    placeholder_scores = to_scores([])
+    if not payload:
+        return placeholder_scores
 
-    final_scores = [0.0] * len(patch_strs)
-    try:
-        download_url = f"{HARNESS_URL}download/{result_filename}"
-        print(f"Downloading result file from: {download_url}")
-        response = requests.get(download_url, timeout=60)
-        response.raise_for_status()
-        eval_results = response.json()
-
-        with open(f"cached_harness_{ts}.json", 'w') as f:
-            f.write(json.dumps(eval_results))
-            
-        for resolved_id in eval_results['resolved_ids']:
-            original_index = valid_indices_map[resolved_id]
-            final_scores[original_index] = 1.0
+    print(f"Uploading patches to evaluation server, results of {run_key} are reported when the harness finishes...")
+    get_harness_client().defer(payload, run_key, to_scores, on_result)
+    return placeholder_scores
 
-    except requests.exceptions.RequestException as e:
-        print(f"Failed to download or parse result file: {e}")
-        return [0.0] * len(patch_strs)
-    except (ValueError, KeyError, json.JSONDecodeError) as e:
-        print(f"Error parsing result file: {e}")
-        return [0.0] * len(patch_strs)
+def collect_bench_scores(wait=False):
+    return get_harness_client().collect(wait)
 
-    for idx in empty_indices:
-        final_scores[idx] = -1.0
-        
-    return final_scores
+def log_bench_scores(run_key, scores):
+    resolved = sum(score == 1.0 for score in scores)
+    print(f"Deferred evaluation {run_key}: {resolved}/{len(scores)} resolved ({resolved / max(len(scores), 1):.2%}).")
 
 def compute_score_batch(data_sources, solution_strs, ground_truths, extra_infos):
     grouped_data = defaultdict(list)
-    patch_strs = [extract_patch(sol) for sol in solution_strs]
-    tool_format_flags = [extract_tool_format(sol) for sol in solution_strs]
-    think_format_flags = [extract_think_format(sol) for sol in solution_strs]
+    patch_strs, tool_format_flags, think_format_flags = extract_solution_batch(solution_strs)
     for idx, (sol, info) in enumerate(zip(patch_strs, extra_infos)):
         instance_id = info["instance_id"]
         issue = info['issue']
@@ -254,29 +558,31 @@ def compute_score_batch(data_sources, solution_strs, ground_truths, extra_infos)
     if not batch_items_pydantic:
         return [0.0] * len(patch_strs)
 
-    payload = MultiBatchRequest(batches=batch_items_pydantic)
+    # Reuse scores of (issue, patch_list) tuples judged before by the same judge
+    score_cache = get_score_cache(get_reward_client().get_judge_id() if RM_CACHE_PATH else None)
+    cached_results = {}
+    if score_cache is not None:
+        cache_keys = {
+            item.batch_id: score_cache.get_key(score_cache.judge_id, item.data.issue, item.data.patch_list)
+            for item in batch_items_pydantic
+        }
+        hits = score_cache.get_many(list(cache_keys.values()))
+        cached_results = {batch_id: hits[key] for batch_id, key in cache_keys.items() if key in hits}
+        hit_ratio = len(cached_results) / len(batch_items_pydantic)
+        print(f"Reward cache hit ratio: {len(cached_results)}/{len(batch_items_pydantic)} ({hit_ratio:.2%})")
+    uncached_items = [item for item in batch_items_pydantic if item.batch_id not in cached_results]
 
     try:
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                response = requests.post(
-                    SERVER_URL,
-                    json=payload.model_dump(mode="json"),
-                    headers={"Content-Type": "application/json"},
-                    proxies={"http": None, "https": None} # do not use proxy
-                )
-                response.raise_for_status()
-                break
-            except (requests.exceptions.RequestException, requests.exceptions.Timeout) as e:
-                if attempt < max_retries - 1:
-                    print(f"Request failed: {str(e)}. Retry attempts: {attempt+1}.")
-                else:
-                    raise RuntimeError(f"Request failed.") from e
-        
-        result = response.json()
-        batch_results = result.get("scores", {})
-        
+        # Failed chunks are missing from the results and keep 0 reward
+        batch_results, fallback = get_reward_client().score(uncached_items) if uncached_items else ({}, [])
+        if score_cache is not None and batch_results:
+            # fallback zeros stand for an unparsed judgement, not a verdict; they are asked again next time
+            fallback = set(fallback)
+            score_cache.put_many({
+                cache_keys[batch_id]: scores for batch_id, scores in batch_results.items() if batch_id not in fallback
+            })
+        batch_results.update(cached_results)
+
         if not batch_results:
             raise ValueError("Empty response from reward server.")
     
@@ -286,7 +592,7 @@ def compute_score_batch(data_sources, solution_strs, ground_truths, extra_infos)
     
     final_scores = [0.0] * len(patch_strs)
     
-    for batch in payload.batches:
+    for batch in batch_items_pydantic:
         batch_id = batch.batch_id
         if batch_id in batch_results:
             scores = batch_results[batch_id]
@@ -1,10 +1,16 @@
 import os
 import asyncio
+import gzip
+import hashlib
+import json
 import numpy as np
 import uuid
-from fastapi import FastAPI, HTTPException
+from collections import OrderedDict
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRoute
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from vllm import SamplingParams
 from vllm.engine.arg_utils import AsyncEngineArgs
 from vllm.engine.async_llm_engine import AsyncLLMEngine
@@ -13,11 +19,10 @@ import ray
 from ray import serve
 from ray.serve.handle import DeploymentHandle
 import sys
-import re
 from ray.exceptions import RayActorError
 
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
-from verl_utils.reward.extract_answer import extract_batch_combine
+from verl_utils.reward.extract_answer import extract_batch_combine, get_pure_patch
 
 MODEL_PATH = "/mnt/bn/-research-models/experiments/verl/SB_DAPO_RL_32B/global_step_225/actor/huggingface" # modify it
 TOKENIZER_PATH = MODEL_PATH
@@ -28,6 +33,11 @@ MAX_CONTEXT_LEN = 32768
 MAX_NEW_TOKENS = 8192
 TEMPERATURE = 1.0
 N_VOTING = 5
+EARLY_STOP_VOTING = True  # Abort remaining samples once the majority of every patch is decided
+ENGINE_TOKEN_BUDGET = 8 * MAX_CONTEXT_LEN * N_VOTING  # Estimated KV tokens in flight per engine before items wait in queue
+CHARS_PER_TOKEN = 4  # Heuristic for estimating prompt length without tokenizing in the API server
+PREFIX_CACHE_SIZE = 4096  # Number of distinct issue prefixes tracked for engine affinity and token reuse
+PATCH_CACHE_SIZE = 65536  # Number of cleaned patches (with token counts) cached per engine replica
 
 SYSTEM_PROMPT = "You are a software expert. You will be given a software issue and some patch candidates in user query. You need to judge which patch(es) can resolve the issue. Carefully review, critic, and compare the given candidates. You need to first think about the reasoning process in the mind until you get the final answer. Finally, put the ID(s) of correct patch candidates within \\boxed{}, e.g., \\boxed{1}, \\boxed{2, 4}, \\boxed{1, 2, 3, 4} (all correct), \\boxed{} (all wrong)."
 
@@ -53,47 +63,134 @@ class MultiBatchRequest(BaseModel):
 
 class ScoreResponse(BaseModel):
     scores: Dict[str, List[float]]
+    cached_tokens: Dict[str, int] = {}
+    num_samples: Dict[str, int] = {}
+    fallback: List[str] = [] # Batches scored by the no-vote fallback, clients must not cache them
 
 # --- Ray Serve Deployments ---
 
+def estimate_item_tokens(item: BatchItem) -> int:
+    """Rough KV footprint of one batch item: prompt tokens plus all voting completions."""
+    prompt_chars = len(SYSTEM_PROMPT) + len(item.data.issue) + sum(len(p) for p in item.data.patch_list)
+    prompt_tokens = min(prompt_chars // CHARS_PER_TOKEN, MAX_CONTEXT_LEN)
+    return prompt_tokens + N_VOTING * MAX_NEW_TOKENS
+
+def get_content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
 @serve.deployment(
     num_replicas=1,
     ray_actor_options={"num_cpus": 64} # More CPUs might be needed for batching/logic
 )
 class APIServer:
+    """
+    Continuous-batching front end. Every BatchItem is queued individually and admitted
+    into the engine replica with the most free KV budget, so a slow judgement only
+    holds its own slot instead of the whole request.
+    """
     def __init__(self, engine_handles: List[DeploymentHandle]):
         self.engine_handles = engine_handles
         self.dp_size = len(engine_handles)
 
+        self.queue: asyncio.Queue = None
+        self.capacity: asyncio.Condition = None
+        self.dispatcher: asyncio.Task = None
+
+        # Occupancy bookkeeping per engine replica
+        self.inflight_tokens = [0] * self.dp_size
+        self.inflight_requests = [0] * self.dp_size
+        self.finished_requests = [0] * self.dp_size
+
+        # issue hash -> engine index, so items of one instance hit the same prefix cache
+        self.prefix_affinity: OrderedDict[str, int] = OrderedDict()
+
+    def _ensure_dispatcher(self):
+        # Created lazily so that they bind to the replica's running event loop
+        if self.dispatcher is None or self.dispatcher.done():
+            self.queue = self.queue or asyncio.Queue()
+            self.capacity = self.capacity or asyncio.Condition()
+            self.dispatcher = asyncio.create_task(self._dispatch_loop())
+
+    def _pick_engine(self, cost: int, prefix_key: str):
+        free_budgets = [ENGINE_TOKEN_BUDGET - tokens for tokens in self.inflight_tokens]
+        # Prefer the engine that already holds this issue prefix in its KV cache
+        engine_idx = self.prefix_affinity.get(prefix_key)
+        if engine_idx is not None and free_budgets[engine_idx] >= cost:
+            return engine_idx
+        engine_idx = int(np.argmax(free_budgets))
+        # An idle engine always accepts, otherwise oversized items would wait forever
+        if free_budgets[engine_idx] >= cost or self.inflight_requests[engine_idx] == 0:
+            return engine_idx
+        return None
+
+    async def _dispatch_loop(self):
+        while True:
+            item, future = await self.queue.get()
+            cost = estimate_item_tokens(item)
+            prefix_key = get_content_hash(item.data.issue)
+            async with self.capacity:
+                while (engine_idx := self._pick_engine(cost, prefix_key)) is None:
+                    await self.capacity.wait()
+                self.inflight_tokens[engine_idx] += cost
+                self.inflight_requests[engine_idx] += 1
+                self.prefix_affinity[prefix_key] = engine_idx
+                self.prefix_affinity.move_to_end(prefix_key)
+                if len(self.prefix_affinity) > PREFIX_CACHE_SIZE:
+                    self.prefix_affinity.popitem(last=False)
+            asyncio.create_task(self._run_item(engine_idx, item, cost, future))
+
+    async def _run_item(self, engine_idx: int, item: BatchItem, cost: int, future: asyncio.Future):
+        try:
+            result = await self.engine_handles[engine_idx].process_request.remote(item)
+            if not future.done():
+                future.set_result(result)
+        except Exception as e:
+            print(f"Error when scoring batch {item.batch_id} on engine {engine_idx}: {e}")
+            if not future.done():
+                future.set_exception(e)
+        finally:
+            async with self.capacity:
+                self.inflight_tokens[engine_idx] -= cost
+                self.inflight_requests[engine_idx] -= 1
+                self.finished_requests[engine_idx] += 1
+                self.capacity.notify_all()
+
+    def _submit(self, batches: List[BatchItem]) -> List[asyncio.Future]:
+        self._ensure_dispatcher()
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in batches]
+        # Enqueue items sharing an issue back to back so they land on the same warm engine
+        order = sorted(range(len(batches)), key=lambda i: get_content_hash(batches[i].data.issue))
+        for i in order:
+            self.queue.put_nowait((batches[i], futures[i]))
+        return futures
+
     async def __call__(self, request: MultiBatchRequest) -> ScoreResponse:
         try:
             batches = request.batches
-            
-            # This handles cases where len(batches) is not a multiple of self.dp_size
             if not batches:
                 return ScoreResponse(scores={})
 
-            sub_batch_groups = np.array_split(batches, self.dp_size)
-            
-            # Create concurrent tasks for each engine
-            tasks = []
-            for i, sub_batch_group in enumerate(sub_batch_groups):
-                if len(sub_batch_group) > 0:
-                    # np.array_split returns numpy arrays, convert back to list
-                    tasks.append(
-                        self.engine_handles[i].process_batch.remote(sub_batch_group.tolist())
-                    )
-
-            # Gather results from all engines
-            results_list = await asyncio.gather(*tasks)
-            
-            # Combine results from all engines into a single dictionary
-            final_scores = {}
-            for result_dict in results_list:
-                final_scores.update(result_dict)
-            
-            return ScoreResponse(scores=final_scores)
-        
+            futures = self._submit(batches)
+            results = await asyncio.gather(*futures)
+
+            final_scores = {
+                item.batch_id: result["scores"]
+                for item, result in zip(batches, results)
+            }
+            cached_tokens = {
+                item.batch_id: result["cached_tokens"]
+                for item, result in zip(batches, results)
+            }
+            num_samples = {
+                item.batch_id: result["num_samples"]
+                for item, result in zip(batches, results)
+            }
+            fallback = [item.batch_id for item, result in zip(batches, results) if result["fallback"]]
+            return ScoreResponse(
+                scores=final_scores, cached_tokens=cached_tokens, num_samples=num_samples, fallback=fallback
+            )
+
         except Exception as e:
             # Add more detailed logging here if needed
             print(f"Error in APIServer: {e}")
@@ -102,62 +199,52 @@ class APIServer:
                 detail=f"Failed when processing request: {str(e)}"
             )
 
-# patch functions
+    async def stream(self, request: MultiBatchRequest):
+        """Yield one JSON line per batch as soon as its scores are ready."""
+        futures = self._submit(request.batches)
+
+        async def _with_id(batch_id, future):
+            try:
+                return {"batch_id": batch_id, **(await future)}
+            except Exception as e:
+                return {"batch_id": batch_id, "error": str(e)}
 
-def is_only_comment_or_whitespace(patch_str):
+        tasks = [_with_id(item.batch_id, future) for item, future in zip(request.batches, futures)]
+        for finished in asyncio.as_completed(tasks):
+            yield json.dumps(await finished) + "\n"
+
+    async def metrics(self) -> Dict[str, Any]:
+        engine_stats = await asyncio.gather(*[handle.get_stats.remote() for handle in self.engine_handles])
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "engines": [
+                {
+                    "engine": f"vllm_engine_{i}",
+                    "inflight_requests": self.inflight_requests[i],
+                    "inflight_tokens": self.inflight_tokens[i],
+                    "token_budget": ENGINE_TOKEN_BUDGET,
+                    "occupancy": self.inflight_tokens[i] / ENGINE_TOKEN_BUDGET,
+                    "finished_requests": self.finished_requests[i],
+                    **engine_stats[i],
+                }
+                for i in range(self.dp_size)
+            ],
+        }
+
+def is_vote_decided(all_votes, num_pending, num_patches=4):
     """
-    Checks if a patch contains only changes to comments or whitespace.
-    Returns True if only noise changes are present, False otherwise.
+    Checks if the majority (> 0.5 of the valid votes) of every patch is already fixed,
+    no matter whether the pending samples accept, reject or fail to parse.
     """
-    # Regex to find all added or removed lines, excluding the diff header lines --- and +++
-    changed_lines = re.findall(r'^[+-](?![+-]{2} )(.+)', patch_str, flags=re.MULTILINE)
-
-    if not changed_lines:
-        # No lines were added or removed, so it's not a substantive change.
-        return True
-
-    for line in changed_lines:
-        stripped_line = line.strip()
-        # Check if the line is NOT noise. A line is considered noise if it's:
-        # 1. Empty or just whitespace.
-        # 2. A single-line comment.
-        if stripped_line and not stripped_line.startswith('#') and not (stripped_line.startswith('"""') and stripped_line.endswith('"""')) and not (stripped_line.startswith("'''") and stripped_line.endswith("'''")):
-            # If we find even one line that is actual code, the patch is valid.
-            return False
-            
-    # If all changed lines were noise, return True to filter this patch out.
-    return True
-
-def remove_index_from_patch(patch_str):
-    """Remove the 'index xxxx..xxxx' line from patch string using regex"""
-    if not isinstance(patch_str, str):
-        return patch_str
-    
-    pattern = r'\nindex [a-f0-9]+\.\.[a-f0-9]+(?: \d+)?\n'
-    return re.sub(pattern, '\n', patch_str, flags=re.MULTILINE)
-
-def get_pure_patch(patch_str):
-    patches = re.split(r'(?=^diff --git a/)', patch_str, flags=re.MULTILINE)
-    filtered_patches = []
-    for patch in patches:
-        m = re.match(r'diff --git a/(.*?) b/(.*?)\n', patch)
-        if not m:
+    for i in range(num_patches):
+        accepted = sum(1 for vote in all_votes if vote[i])
+        rejected = len(all_votes) - accepted
+        if accepted > rejected + num_pending: # accepted even if all pending samples reject
             continue
-        origin_filename = m.group(1)
-        filename_lower = origin_filename.lower()
-        if ".py" not in filename_lower \
-            or "test" in filename_lower and 'pytest' not in filename_lower\
-            or "reproduce" in filename_lower \
-            or origin_filename == '/dev/null' \
-            or re.search(r'^new file mode \d{6}$', patch, flags=re.MULTILINE) \
-            or re.search(r'^--- /dev/null$', patch, flags=re.MULTILINE):
+        if accepted + num_pending <= rejected: # rejected even if all pending samples accept
             continue
-        if is_only_comment_or_whitespace(patch):
-            continue
-            
-        filtered_patches.append(remove_index_from_patch(patch))
-    patch = '\n'.join(filtered_patches)
-    return patch.strip()
+        return False
+    return True
 
 @serve.deployment(
     # This `num_replicas` is for a single deployment.
@@ -181,6 +268,8 @@ class vLLMEngine:
             # This is a crucial performance tuning parameter. It depends on context length and batch size.
             max_num_batched_tokens=MAX_CONTEXT_LEN, # A heuristic
             trust_remote_code=True,
+            # Batch items of one instance share the system prompt + issue block
+            enable_prefix_caching=True,
         )
         self.engine = AsyncLLMEngine.from_engine_args(engine_args)
         
@@ -195,6 +284,73 @@ class vLLMEngine:
             max_tokens=MAX_NEW_TOKENS,
         )
 
+        # prefix hash -> {"claimed", "ready"}; the first request of a prefix
+        # prefills it, later ones wait for that so they hit the cache instead of recomputing
+        self.prefix_cache: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+        self.prefix_stats = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0}
+        self.voting_stats = {"early_stopped": 0, "samples_used": 0}
+
+        # raw patch hash -> (pure patch, token count); rollouts resubmit identical patches a lot
+        self.patch_cache: OrderedDict[str, Tuple[str, int]] = OrderedDict()
+        self.patch_cache_stats = {"hits": 0, "misses": 0}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.prefix_stats,
+            **self.voting_stats,
+            "cached_prefixes": len(self.prefix_cache),
+            "patch_cache_hits": self.patch_cache_stats["hits"],
+            "patch_cache_misses": self.patch_cache_stats["misses"],
+        }
+
+    def clean_patches(self, patch_list: List[str]) -> List[Tuple[str, int]]:
+        """Return (pure patch, token count) for each patch, cleaning and tokenizing only cache misses."""
+        keys = [get_content_hash(patch_str) for patch_str in patch_list]
+        results, missing = {}, {}
+        for key, patch_str in zip(keys, patch_list):
+            if key in results or key in missing:
+                continue
+            if key in self.patch_cache:
+                self.patch_cache.move_to_end(key)
+                self.patch_cache_stats["hits"] += 1
+                results[key] = self.patch_cache[key]
+            else:
+                self.patch_cache_stats["misses"] += 1
+                missing[key] = get_pure_patch(patch_str)
+
+        if missing:
+            # One batched call lets the fast tokenizer encode all patches in parallel
+            pure_patches = list(missing.values())
+            token_ids = self.tokenizer(pure_patches, add_special_tokens=False).input_ids
+            for key, pure_patch, ids in zip(missing.keys(), pure_patches, token_ids):
+                results[key] = self.patch_cache[key] = (pure_patch, len(ids))
+            while len(self.patch_cache) > PATCH_CACHE_SIZE:
+                self.patch_cache.popitem(last=False)
+
+        return [results[key] for key in keys]
+
+    def encode_prompt(self, issue: str, patch_list: List[str]):
+        """
+        Tokenize the prompt and key it by its shared prefix (system prompt + issue), which is the
+        same for all batch items of one instance. The prompt is tokenized as a whole, as tokenizing
+        prefix and patches apart may split a BPE merge across the boundary.
+        """
+        prompt = self.generate_prompt(issue, patch_list)
+        prompt_ids = self.tokenizer(prompt, add_special_tokens=False).input_ids
+        issue_block = f"<issue>\n{issue}\n</issue>\n"
+        split_at = prompt.find(issue_block)
+        if split_at == -1:
+            return None, prompt_ids
+
+        prefix_key = get_content_hash(prompt[:split_at + len(issue_block)])
+        if prefix_key in self.prefix_cache:
+            self.prefix_cache.move_to_end(prefix_key)
+        else:
+            self.prefix_cache[prefix_key] = {"claimed": False, "ready": asyncio.Event()}
+            if len(self.prefix_cache) > PREFIX_CACHE_SIZE:
+                self.prefix_cache.popitem(last=False)
+        return prefix_key, prompt_ids
+
     def generate_prompt(self, issue: str, patch_list: List[str]) -> str:
         # Max token of each patch. If exceeds, then remove it and gets 0 reward.
         patch_token_limit = MAX_CONTEXT_LEN // 4
@@ -202,14 +358,8 @@ class vLLMEngine:
         # This makes the USER_PROMPT formatting safe
         assert len(patch_list) == 4, f"Error: patch_list size: {len(patch_list)}, not 4."
         # remove redundant strings for better rm performance
-        patch_list = [get_pure_patch(patch_str) for patch_str in patch_list]
-
         final_patches = []
-        for patch_str in patch_list:
-            pure_patch = get_pure_patch(patch_str)
-            
-            patch_token_count = len(self.tokenizer(pure_patch, add_special_tokens=False).input_ids)
-            
+        for pure_patch, patch_token_count in self.clean_patches(patch_list):
             if patch_token_count > patch_token_limit:
                 print(f"Warning: A patch was too long ({patch_token_count} tokens > limit {patch_token_limit}) and was replaced with an empty string.")
                 print(f"The original overlong patch is:\n{pure_patch}")
@@ -233,34 +383,70 @@ class vLLMEngine:
             add_generation_prompt=True
         )
     
-    async def process_request(self, item: BatchItem) -> List[float]:
-        prompt = self.generate_prompt(item.data.issue, item.data.patch_list)
-        
+    async def process_request(self, item: BatchItem) -> Dict[str, Any]:
+        prefix_key, prompt_ids = self.encode_prompt(item.data.issue, item.data.patch_list)
+        prefix_entry = self.prefix_cache.get(prefix_key)
+
+        is_leader = False
+        if prefix_entry is not None:
+            if prefix_entry["claimed"]:
+                await prefix_entry["ready"].wait()
+            else:
+                prefix_entry["claimed"] = is_leader = True
+
         request_id = f"req_{item.batch_id}_{uuid.uuid4().hex}"
-        
-        result_generator = self.engine.generate(
-            prompt, 
-            self.sampling_params, 
-            request_id=request_id
-        )
-        
-        # The final result is the only one we need from the generator
-        final_output = None
-        async for request_output in result_generator:
-            final_output = request_output
-        
-        outputs = [output.text for output in final_output.outputs]
-        
-        all_votes = []
-        for text in outputs:
-            # Your custom function to parse the model's text output
-            result = extract_batch_combine(text)
-            if result is not None:
-                all_votes.append(result)
-        
+
+        try:
+            result_generator = self.engine.generate(
+                {"prompt_token_ids": prompt_ids},
+                self.sampling_params,
+                request_id=request_id
+            )
+
+            # sample index -> parsed vote (None if it can not be parsed)
+            votes = {}
+            early_stopped = False
+            final_output = None
+            async for request_output in result_generator:
+                # First output means the prefill (and thus the shared prefix) is done
+                if is_leader and not prefix_entry["ready"].is_set():
+                    prefix_entry["ready"].set()
+                final_output = request_output
+                if not EARLY_STOP_VOTING:
+                    continue
+
+                newly_finished = False
+                for output in request_output.outputs:
+                    if output.finish_reason is not None and output.index not in votes:
+                        votes[output.index] = extract_batch_combine(output.text)
+                        newly_finished = True
+                num_pending = N_VOTING - len(votes)
+                if newly_finished and num_pending > 0 \
+                        and is_vote_decided([vote for vote in votes.values() if vote is not None], num_pending):
+                    await self.engine.abort(request_id)
+                    early_stopped = True
+                    break
+        finally:
+            if is_leader:
+                prefix_entry["ready"].set()
+
+        if not early_stopped:
+            votes = {i: extract_batch_combine(output.text) for i, output in enumerate(final_output.outputs)}
+
+        cached_tokens = getattr(final_output, "num_cached_tokens", None) or 0
+        self.prefix_stats["requests"] += 1
+        self.prefix_stats["prompt_tokens"] += len(prompt_ids)
+        self.prefix_stats["cached_tokens"] += cached_tokens
+        num_samples = len(votes)
+        self.voting_stats["early_stopped"] += int(early_stopped)
+        self.voting_stats["samples_used"] += num_samples
+
+        all_votes = [vote for vote in votes.values() if vote is not None]
+
         if not all_votes:
             print("####### [WRANING] No votes parsed. Return all 0 reward.")
-            return [0.0] * 4 # Default to all wrong if no valid votes are parsed
+            # Default to all wrong if no valid votes are parsed
+            return {"scores": [0.0] * 4, "cached_tokens": cached_tokens, "num_samples": num_samples, "fallback": True}
         
         # Perform majority voting
         num_patches = 4 # Assuming always 4 patches
@@ -274,22 +460,34 @@ class vLLMEngine:
         
         # Score is 1.0 if accepted in more than half the votes, else 0.0
         final_scores = [1.0 if rate > 0.5 else 0.0 for rate in acceptance_rates]
-        return final_scores
-    
-    async def process_batch(self, batch: List[BatchItem]) -> Dict[str, List[float]]:
-        # This method runs multiple requests concurrently on a single engine replica
-        tasks = [self.process_request(item) for item in batch]
-        results = await asyncio.gather(*tasks)
-        
-        return {
-            item.batch_id: score
-            for item, score in zip(batch, results)
-        }
+        return {"scores": final_scores, "cached_tokens": cached_tokens, "num_samples": num_samples, "fallback": False}
+
+class GzipRequest(Request):
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            body = await super().body()
+            if "gzip" in self.headers.getlist("Content-Encoding"):
+                body = gzip.decompress(body)
+            self._body = body
+        return self._body
+
+class GzipRoute(APIRoute):
+    """Accept gzip-compressed request payloads from the reward client."""
+    def get_route_handler(self):
+        original_route_handler = super().get_route_handler()
+
+        async def custom_route_handler(request: Request):
+            return await original_route_handler(GzipRequest(request.scope, request.receive))
+
+        return custom_route_handler
+
+app = FastAPI()
+app.router.route_class = GzipRoute
 
 # This deployment wraps the application in a FastAPI app.
 # It's the entrypoint for HTTP requests.
 @serve.deployment(num_replicas=1)
-@serve.ingress(app := FastAPI())
+@serve.ingress(app)
 class FastAPIWrapper:
     def __init__(self, api_server_handle: DeploymentHandle):
         self.api_server_handle = api_server_handle
@@ -311,6 +509,29 @@ class FastAPIWrapper:
                 detail=f"An internal server error occurred: {str(e)}"
             )
 
+    @app.post("/score_stream")
+    async def score_stream(self, request: MultiBatchRequest):
+        # NDJSON stream: one {"batch_id": ..., "scores": [...]} line per finished batch
+        stream_handle = self.api_server_handle.options(method_name="stream", stream=True)
+        return StreamingResponse(
+            stream_handle.remote(request),
+            media_type="application/x-ndjson"
+        )
+
+    @app.get("/metrics")
+    async def metrics(self):
+        return await self.api_server_handle.metrics.remote()
+
+    @app.get("/info")
+    async def info(self):
+        # Identifies the judge, clients key their score caches on it
+        return {
+            "model_path": MODEL_PATH,
+            "n_voting": N_VOTING,
+            "temperature": TEMPERATURE,
+            "max_new_tokens": MAX_NEW_TOKENS,
+        }
+
 # deployment graph creation
 def deploy_app():
     # 1. Create DP_SIZE independent vLLM engine deployments
@@ -334,6 +555,7 @@ def deploy_app():
 # You would run this script with `serve run your_script_name:app`
 app_handle = deploy_app()
 
-serve.start(http_options={"host": "::", "port": 8365})
+if __name__ == "__main__":
+    serve.start(http_options={"host": "::", "port": 8365})
 
-serve.run(app_handle)
\ No newline at end of file
+    serve.run(app_handle)
\ No newline at end of file
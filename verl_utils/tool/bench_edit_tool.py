@@ -0,0 +1,96 @@
+"""
+Benchmark of the syntax check run by EditTool on every Python edit: the previous
+`pylint --disable=all --enable=E0001` subprocess against the in-process `check_syntax`
+(and, optionally, pylint in the persistent lint pool).
+
+The edit trace is a jsonl file with one edit per line, {"path": "...", "old_str": "...", "new_str": "..."}
+relative to `--src`. Without a trace, edits are sampled from the Python files under `--src`: a
+line is replaced by itself, by a re-indented copy, or by a line with unbalanced brackets.
+
+Usage:
+    python verl_utils/tool/bench_edit_tool.py --src verl --num_edits 200
+    python verl_utils/tool/bench_edit_tool.py --src /path/to/repo --trace edits.jsonl --full_lint
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+from verl_utils.tool.syntax_check import check_syntax, lint_file
+
+
+def load_trace(path: str, src: str):
+    edits = []
+    with open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                edit = json.loads(line)
+                edits.append((os.path.join(src, edit["path"]), edit["old_str"], edit["new_str"]))
+    return edits
+
+
+def sample_trace(src: str, num_edits: int):
+    files = [path for path in glob.glob(f"{src}/**/*.py", recursive=True) if os.path.getsize(path) > 0]
+    rng = random.Random(0)
+    edits = []
+    while len(edits) < num_edits:
+        path = rng.choice(files)
+        lines = [line for line in open(path).read().split('\n') if line.strip()]
+        if not lines:
+            continue
+        old_str = rng.choice(lines)
+        new_str = rng.choice([old_str, "    " + old_str, old_str + " = (", old_str.rstrip(':') + "  # edited"])
+        edits.append((path, old_str, new_str))
+    return edits
+
+
+def run_pylint_subprocess(content: str, file_name: str, temp_dir: str) -> str:
+    with tempfile.NamedTemporaryFile(mode='w', delete=True, prefix=file_name, suffix='.py', dir=temp_dir) as temp:
+        temp.write(content)
+        temp.flush()
+        result = subprocess.run(f"pylint {temp.name} --disable=all --enable=E0001", shell=True, capture_output=True, text=True)
+        return result.stdout + result.stderr
+
+
+def run_lint_pool(content: str, file_name: str, temp_dir: str) -> str:
+    with tempfile.NamedTemporaryFile(mode='w', delete=True, prefix=file_name, suffix='.py', dir=temp_dir) as temp:
+        temp.write(content)
+        temp.flush()
+        return lint_file(temp.name, ["--disable=all", "--enable=E0001"])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--src", type=str, required=True, help="source tree the edits apply to")
+    parser.add_argument("--trace", type=str, default=None, help="jsonl edit trace")
+    parser.add_argument("--num_edits", type=int, default=200)
+    parser.add_argument("--full_lint", action="store_true", help="also time pylint in the lint pool")
+    args = parser.parse_args()
+
+    edits = load_trace(args.trace, args.src) if args.trace else sample_trace(args.src, args.num_edits)
+    contents = [open(path).read().replace(old_str, new_str, 1) for path, old_str, new_str in edits]
+    temp_dir = tempfile.mkdtemp()
+
+    checkers = [("check_syntax", lambda content, name: check_syntax(content, name) or "")]
+    if shutil.which("pylint"):
+        checkers.insert(0, ("pylint subprocess", lambda content, name: run_pylint_subprocess(content, name, temp_dir)))
+    else:
+        print("pylint is not installed, skipping the subprocess baseline.")
+    if args.full_lint:
+        run_lint_pool("x = 1\n", "warmup", temp_dir) # start the worker and import pylint before timing
+        checkers.append(("pylint lint pool", lambda content, name: run_lint_pool(content, name, temp_dir)))
+
+    print(f"Replaying {len(edits)} edits.")
+    for name, checker in checkers:
+        start = time.perf_counter()
+        rejected = sum('E0001' in checker(content, os.path.basename(path)) for (path, _, _), content in zip(edits, contents))
+        elapsed = time.perf_counter() - start
+        print(f"{name:>17}: {elapsed / len(edits) * 1000:.2f} ms/edit, {rejected} edits rejected")
+    shutil.rmtree(temp_dir)
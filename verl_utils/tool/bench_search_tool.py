@@ -0,0 +1,111 @@
+"""
+Microbenchmark of the codegraph SearchTool: replays a tool-call log against codegraph databases,
+once opening a fresh sqlite connection per call (the old behaviour) and once through the
+per-process connection pool.
+
+The log is a jsonl file with one tool call per line:
+    {"instance_id": "...", "construct": "class", "entity": "CompoundModel"}
+where the database is `{root_dir}/codegraph/{instance_id}.db` (or given directly as "db_path").
+Without a log, calls are sampled from the names stored in `--db`.
+
+Usage:
+    python verl_utils/tool/bench_search_tool.py --root_dir /path/to/root --log tool_calls.jsonl --threads 32
+    python verl_utils/tool/bench_search_tool.py --db /path/to/codegraph/x.db --num_calls 20000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+import verl_utils.tool.search_tool as search_tool
+from verl_utils.data.envs.DB import attach_body_store
+from verl_utils.tool.db_pool import ConnectionPool
+
+
+class FreshConnections:
+    """Stand-in for the pool that connects on every call, as SearchTool did before pooling."""
+
+    @contextmanager
+    def connection(self, db_path: str):
+        db_connection = sqlite3.connect(db_path)
+        attach_body_store(db_connection, db_path)
+        try:
+            yield db_connection
+        finally:
+            db_connection.close()
+
+
+def load_log(path: str, root_dir: str):
+    calls = []
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            call = json.loads(line)
+            db_path = call.get("db_path") or f"{root_dir}/codegraph/{call['instance_id']}.db"
+            calls.append((db_path, call["construct"], call["entity"]))
+    return calls
+
+
+def sample_calls(db_path: str, num_calls: int, miss_rate: float = 0.2):
+    db_connection = sqlite3.connect(db_path)
+    attach_body_store(db_connection, db_path)
+    names = {
+        construct: [row[0] for row in db_connection.execute(f"SELECT DISTINCT name FROM {table}")]
+        for construct, table in [("function", "functions"), ("class", "classes"), ("class_method", "class_methods")]
+    }
+    db_connection.close()
+    constructs = [construct for construct in names if names[construct]]
+    if not constructs:
+        sys.exit(f"No entities found in {db_path}.")
+    rng = random.Random(0)
+    calls = []
+    for i in range(num_calls):
+        construct = rng.choice(constructs)
+        entity = f"missing_{i}" if rng.random() < miss_rate else rng.choice(names[construct])
+        calls.append((db_path, construct, entity))
+    return calls
+
+
+def replay(calls, threads: int) -> float:
+    def run(call):
+        db_path, construct, entity = call
+        tool = search_tool.SearchTool(root_dir=None, instance_id=None)
+        tool.db_path = db_path
+        return tool.execute(construct, entity)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(run, calls))
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--log", type=str, default=None, help="jsonl tool-call log to replay")
+    parser.add_argument("--root_dir", type=str, default=".")
+    parser.add_argument("--db", type=str, default=None, help="codegraph db to sample calls from when no log is given")
+    parser.add_argument("--num_calls", type=int, default=10000)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    if args.log:
+        calls = load_log(args.log, args.root_dir)
+    elif args.db:
+        calls = sample_calls(args.db, args.num_calls)
+    else:
+        sys.exit("Either --log or --db is required.")
+    print(f"Replaying {len(calls)} calls over {len(set(c[0] for c in calls))} databases with {args.threads} threads.")
+
+    pool = ConnectionPool()
+    for name, connections in [("fresh connection", FreshConnections()), ("connection pool", pool)]:
+        search_tool.get_connection_pool = lambda: connections
+        elapsed = replay(calls, args.threads)
+        print(f"{name:>16}: {elapsed:.2f}s, {len(calls) / elapsed:.0f} calls/s, {elapsed / len(calls) * 1e6:.0f} us/call")
+    print(f"Pool stats: {pool.stats}")
@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+from urllib.parse import quote
+
+from verl_utils.data.envs.DB import attach_body_store
+
+DB_POOL_MAX_DATABASES: int = 256 # Databases kept open per process, least recently used are closed first
+DB_POOL_MAX_IDLE: int = 4 # Idle connections kept per database
+DB_MMAP_SIZE: int = 256 * 1024 * 1024
+DB_CACHED_STATEMENTS: int = 64
+
+
+class ConnectionPool:
+    """
+    Per-process pool of read-only connections to the codegraph databases, keyed by db path.
+
+    Codegraph databases are not written once built, so connections are opened with
+    `mode=ro&immutable=1` (no locking or change detection) and memory-mapped. The body store of
+    a deduplicated codegraph is attached with plain `mode=ro`, as builders append to it. Each connection
+    keeps its own prepared statement cache, so the fixed search queries are only parsed once
+    per connection. A database rebuilt on disk is detected by its stat signature and reopened.
+    """
+
+    def __init__(self, max_databases: int = DB_POOL_MAX_DATABASES, max_idle: int = DB_POOL_MAX_IDLE):
+        self.max_databases = max_databases
+        self.max_idle = max_idle
+        self.lock = threading.Lock()
+        # db path -> (stat signature, idle connections), in LRU order
+        self.databases: "OrderedDict[str, Tuple[Tuple[int, int, int], List[sqlite3.Connection]]]" = OrderedDict()
+        self.stats: Dict[str, int] = {"hits": 0, "opens": 0, "evictions": 0}
+
+    def _open(self, db_path: str) -> sqlite3.Connection:
+        uri = f"file:{quote(os.path.abspath(db_path))}?mode=ro&immutable=1"
+        db_connection = sqlite3.connect(
+            uri, uri=True, check_same_thread=False, cached_statements=DB_CACHED_STATEMENTS
+        )
+        db_connection.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+        attach_body_store(db_connection, db_path, uri=True)
+        return db_connection
+
+    def _close_all(self, connections: List[sqlite3.Connection]) -> None:
+        for db_connection in connections:
+            db_connection.close()
+
+    def acquire(self, db_path: str) -> Tuple[sqlite3.Connection, Tuple[int, int, int]]:
+        # Raises OperationalError like sqlite3.connect would for a missing database
+        try:
+            st = os.stat(db_path)
+        except OSError as e:
+            raise sqlite3.OperationalError(f"unable to open database file: {e}")
+        signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+        stale = []
+        with self.lock:
+            entry = self.databases.get(db_path)
+            if entry is not None and entry[0] != signature:
+                stale = entry[1]
+                entry = None
+                del self.databases[db_path]
+            if entry is not None:
+                self.databases.move_to_end(db_path)
+                if entry[1]:
+                    self.stats["hits"] += 1
+                    return entry[1].pop(), signature
+            self.stats["opens"] += 1
+        self._close_all(stale)
+        return self._open(db_path), signature
+
+    def release(self, db_path: str, db_connection: sqlite3.Connection, signature: Tuple[int, int, int]) -> None:
+        evicted = []
+        with self.lock:
+            entry = self.databases.get(db_path)
+            if entry is None:
+                entry = (signature, [])
+                self.databases[db_path] = entry
+            if entry[0] == signature and len(entry[1]) < self.max_idle:
+                entry[1].append(db_connection)
+            else:
+                evicted.append(db_connection)
+            while len(self.databases) > self.max_databases:
+                _, (_, idle) = self.databases.popitem(last=False)
+                self.stats["evictions"] += 1
+                evicted.extend(idle)
+        self._close_all(evicted)
+
+    @contextmanager
+    def connection(self, db_path: str):
+        db_connection, signature = self.acquire(db_path)
+        try:
+            yield db_connection
+        except BaseException:
+            # Do not return a connection in an unknown state
+            db_connection.close()
+            raise
+        else:
+            self.release(db_path, db_connection, signature)
+
+    def close(self) -> None:
+        with self.lock:
+            databases, self.databases = self.databases, OrderedDict()
+        for _, idle in databases.values():
+            self._close_all(idle)
+
+
+_connection_pool = None
+_connection_pool_lock = threading.Lock()
+
+def get_connection_pool() -> ConnectionPool:
+    global _connection_pool
+    if _connection_pool is None:
+        with _connection_pool_lock:
+            if _connection_pool is None:
+                _connection_pool = ConnectionPool()
+    return _connection_pool
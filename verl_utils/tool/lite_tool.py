@@ -1,14 +1,15 @@
 import asyncio
 import sqlite3
 import os
-import subprocess
-import tempfile
 from pathlib import Path
 from typing import Any, Dict, Optional, Tuple
 
 from verl.tools.base_tool import BaseTool
 from verl.tools.schemas import OpenAIFunctionToolSchema, ToolResponse
-from verl_utils.data.envs.WS import WorkSpace
+from verl_utils.data.envs.WS import WorkSpace, get_workspace_pool
+from verl_utils.tool.syntax_check import lint_edit
+from verl_utils.tool.db_pool import get_connection_pool
+from verl_utils.tool.name_search import lookup_entity
 
 MAX_RESPONSE_LEN: int = 16000
 SNIPPET_LINES: int = 4
@@ -83,7 +84,7 @@ class SearchTool(BaseTool):
             return "`entity` argument is empty. Please ensure the function calling format is valid."
         
         try:
-            with sqlite3.connect(db_path) as db_connection:
+            with get_connection_pool().connection(db_path) as db_connection:
                 match construct:
                     case "function":
                         return self._search_function(db_connection, entity)
@@ -99,14 +100,9 @@ class SearchTool(BaseTool):
             return f"An unexpected error occurred during search: {e}"
 
     def _search_function(self, db_connection: sqlite3.Connection, entity: str) -> str:
-        entries = db_connection.execute(
-            "SELECT file_path, start_line, end_line, body FROM functions WHERE name = ?", (entity,)
-        ).fetchall()
-        if not entries:
-            msg = f"No function named `{entity}` found."
-            if '.' in entity:
-                return f"{msg} Please use **simple name** rather than full qualified name."
-            return f"{msg} Maybe you are looking for a class method or a class?"
+        entries, not_found = lookup_entity(db_connection, "function", entity)
+        if not_found:
+            return not_found
         output = ""
         for entry in entries:
             file_path, start_line, end_line, body = entry
@@ -118,14 +114,9 @@ class SearchTool(BaseTool):
         return output
 
     def _search_class(self, db_connection: sqlite3.Connection, entity: str) -> str:
-        entries = db_connection.execute(
-            "SELECT file_path, start_line, end_line, fields, methods, body FROM classes WHERE name = ?", (entity,)
-        ).fetchall()
-        if not entries:
-            msg = f"No class named `{entity}` found."
-            if '.' in entity:
-                return f"{msg} Please use **simple name** rather than full qualified name."
-            return f"{msg} Maybe you are looking for a function or a class method?"
+        entries, not_found = lookup_entity(db_connection, "class", entity)
+        if not_found:
+            return not_found
         output = ""
         for entry in entries:
             file_path, start_line, end_line, fields, methods, body = entry
@@ -140,14 +131,9 @@ class SearchTool(BaseTool):
         return output
 
     def _search_class_method(self, db_connection: sqlite3.Connection, entity: str) -> str:
-        entries = db_connection.execute(
-            "SELECT file_path, start_line, end_line, body, class_name FROM class_methods WHERE name = ?", (entity,)
-        ).fetchall()
-        if not entries:
-            msg = f"No class method named `{entity}` found."
-            if '.' in entity:
-                return f"{msg} Please use **simple name** rather than full qualified name."
-            return f"{msg} Maybe you are looking for a function or a class?"
+        entries, not_found = lookup_entity(db_connection, "class_method", entity)
+        if not_found:
+            return not_found
         output = ""
         for entry in entries:
             file_path, start_line, end_line, body, class_name = entry
@@ -169,6 +155,9 @@ class EditTool(BaseTool):
         
         if not os.path.exists(self.temp_dir):
             os.makedirs(self.temp_dir, exist_ok=True)
+        self.workspace_pool = get_workspace_pool(self.temp_dir)
+        # Run pylint on top of the in-process syntax check
+        self.full_lint = self.config.get("full_lint", False)
 
     def get_openai_tool_schema(self) -> OpenAIFunctionToolSchema:
         return self.tool_schema
@@ -177,7 +166,7 @@ class EditTool(BaseTool):
         if await self.workspace_manager.get(instance_id):
             await self.release(instance_id)
 
-        workspace = WorkSpace(self.root_dir, self.temp_dir, id)
+        workspace = WorkSpace(self.root_dir, self.temp_dir, id, pool=self.workspace_pool, track_edits=True)
 
         await self.workspace_manager.register(instance_id, workspace)
 
@@ -208,7 +197,7 @@ class EditTool(BaseTool):
 
         response = await asyncio.to_thread(
             self._blocking_execute,
-            workspace.path,
+            workspace,
             path,
             old_str,
             new_str
@@ -225,7 +214,8 @@ class EditTool(BaseTool):
             await asyncio.to_thread(workspace.del_ws)
         await super().release(instance_id, **kwargs)
 
-    def _blocking_execute(self, workspace_path: str, path: str, old_str: str, new_str: Optional[str]) -> str:
+    def _blocking_execute(self, workspace: WorkSpace, path: str, old_str: str, new_str: Optional[str]) -> str:
+        workspace_path = workspace.path
         # get absolute path from relative path
         short_path = path
         if not path:
@@ -271,22 +261,15 @@ class EditTool(BaseTool):
 
         # Check for linter errors before writing
         if path.endswith('.py'):
-            original_file_name = os.path.basename(path)
-            with tempfile.NamedTemporaryFile(mode='w', delete=True, prefix=original_file_name, suffix='.py', dir=workspace_path) as temp:
-                temp.write(new_file_content)
-                temp.flush()
-                
-                command_options = f"pylint {temp.name} --disable=all --enable=E0001"
-                result = subprocess.run(command_options, shell=True, capture_output=True, text=True)
-                
-                if 'E0001' in result.stdout or 'E0001' in result.stderr:
-                    error_msg = f"No edit was performed. Be careful! Your edit would introduce syntax errors!\nSpecifically, this is your intended edit:\n"
-                    error_msg += f"{short_path}:{replacement_start_line}-{replacement_end_line}{snippet}\n\n"
-                    error_msg += f"However, Pylint finds the following errors:\n{result.stdout + result.stderr}\n"
-                    error_msg += "Thus, your edit has been aborted. Please fix these errors and retry."
-                    return error_msg
-
-        self._write_file(path, new_file_content)
+            lint_output = lint_edit(workspace_path, short_path, path, new_file_content, self.full_lint)
+            if lint_output:
+                error_msg = f"No edit was performed. Be careful! Your edit would introduce syntax errors!\nSpecifically, this is your intended edit:\n"
+                error_msg += f"{short_path}:{replacement_start_line}-{replacement_end_line}{snippet}\n\n"
+                error_msg += f"However, Pylint finds the following errors:\n{lint_output}\n"
+                error_msg += "Thus, your edit has been aborted. Please fix these errors and retry."
+                return error_msg
+
+        self._write_file(workspace, path, new_file_content)
         
         if len(snippet) > MAX_RESPONSE_LEN:
             snippet = remove_last_function(snippet[:MAX_RESPONSE_LEN]) + "\n[response clipped due to overlong]"
@@ -305,9 +288,9 @@ class EditTool(BaseTool):
             print(f"Error reading file {path}: {str(e)}")
             return ""
 
-    def _write_file(self, path: str, content: str) -> None:
+    def _write_file(self, workspace: WorkSpace, path: str, content: str) -> None:
         """Writes content to a file."""
         try:
-            Path(path).write_text(content)
+            workspace.edit_file(path, content)
         except Exception as e:
             print(f"Error writing to file {path}: {str(e)}")
\ No newline at end of file
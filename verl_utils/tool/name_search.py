@@ -0,0 +1,104 @@
+import difflib
+import sqlite3
+from typing import List, Optional, Tuple
+
+from verl_utils.data.envs.DB import qualified_name
+
+NAME_SUGGESTIONS: int = 5 # Near matches listed when a name is not found
+NAME_CANDIDATES: int = 50 # Trigram matches re-ranked for the suggestions
+NAME_MIN_SIMILARITY: float = 0.6
+
+# The exact lookups of the search tools
+EXACT_SQLS = {
+    "function": "SELECT file_path, start_line, end_line, body FROM functions WHERE name = ?",
+    "class": "SELECT file_path, start_line, end_line, fields, methods, body FROM classes WHERE name = ?",
+    "class_method": "SELECT file_path, start_line, end_line, body, class_name FROM class_methods WHERE name = ?",
+}
+# Name of each construct in messages, and the hint given when nothing similar is found
+CONSTRUCT_LABELS = {"function": "function", "class": "class", "class_method": "class method"}
+NOT_FOUND_HINTS = {
+    "function": "Maybe you are looking for a class method or a class?",
+    "class": "Maybe you are looking for a function or a class method?",
+    "class_method": "Maybe you are looking for a function or a class?",
+}
+
+
+def search_qualified(db_connection: sqlite3.Connection, construct: str, entity: str) -> List[tuple]:
+    """
+    Entities of `construct` whose qualified name (`module.Class.method`) is `entity` or ends with
+    `.{entity}`, e.g. `Session.get` or `requests.sessions.Session.get`, as rows of the exact lookup.
+    """
+    name = entity.rsplit('.', 1)[-1]
+    rows = db_connection.execute(EXACT_SQLS[construct], (name,)).fetchall()
+    matches = []
+    for row in rows:
+        qualified = qualified_name(row[0], name, row[-1] if construct == "class_method" else None)
+        if qualified == entity or qualified.endswith(f".{entity}"):
+            matches.append(row)
+    return matches
+
+
+def _suggest(db_connection: sqlite3.Connection, column: str, target: str) -> List[Tuple[str, str, str]]:
+    """Suggestions whose `column` (the simple or the qualified name) is closest to `target`."""
+    trigrams = {target[i:i + 3] for i in range(len(target) - 2)}
+    if not trigrams:
+        return []
+    query = f"{column} : (" + " OR ".join('"' + trigram.replace('"', '""') + '"' for trigram in sorted(trigrams)) + ")"
+    try:
+        rows = db_connection.execute(
+            "SELECT construct, name, qualified_name FROM names WHERE names MATCH ? ORDER BY rank LIMIT ?",
+            (query, NAME_CANDIDATES),
+        ).fetchall()
+    except sqlite3.OperationalError: # no name index, or one without the qualified names
+        return []
+
+    # `Session.get` is compared with the last two parts of `requests.sessions.Session.get`
+    depth = target.count('.') + 1
+    scored = {}
+    matcher = difflib.SequenceMatcher(None, b=target.lower())
+    for construct, name, qualified in rows:
+        candidate = name if column == "name" else '.'.join(qualified.split('.')[-depth:])
+        matcher.set_seq1(candidate.lower())
+        if matcher.real_quick_ratio() < NAME_MIN_SIMILARITY or matcher.quick_ratio() < NAME_MIN_SIMILARITY:
+            continue
+        score = matcher.ratio()
+        if score >= NAME_MIN_SIMILARITY:
+            scored[(construct, name, qualified)] = score
+    return sorted(scored, key=lambda suggestion: (-scored[suggestion], suggestion))[:NAME_SUGGESTIONS]
+
+
+def suggest_names(db_connection: sqlite3.Connection, entity: str) -> List[Tuple[str, str, str]]:
+    """
+    (construct, name, qualified name) of the entities closest to `entity`, best first: by qualified
+    name for a dotted entity such as `Sesion.get`, then by simple name.
+    """
+    target = entity.rstrip('()')
+    if '.' in target:
+        suggestions = _suggest(db_connection, "qualified_name", target)
+        if suggestions:
+            return suggestions
+    return _suggest(db_connection, "name", target.rsplit('.', 1)[-1])
+
+
+def lookup_entity(db_connection: sqlite3.Connection, construct: str, entity: str) -> Tuple[List[tuple], Optional[str]]:
+    """
+    The rows of the exact lookup of `entity` as a `construct`, falling back to its qualified name.
+    When nothing matches, no rows and the message for the agent, with near matches if any.
+    """
+    entries = db_connection.execute(EXACT_SQLS[construct], (entity,)).fetchall()
+    if not entries and '.' in entity:
+        entries = search_qualified(db_connection, construct, entity)
+    if entries:
+        return entries, None
+    msg = f"No {CONSTRUCT_LABELS[construct]} named `{entity}` found."
+    suggestions = suggest_names(db_connection, entity)
+    if suggestions:
+        return [], f"{msg} {format_suggestions(suggestions)}"
+    if '.' in entity:
+        return [], f"{msg} Please use **simple name** rather than full qualified name."
+    return [], f"{msg} {NOT_FOUND_HINTS[construct]}"
+
+
+def format_suggestions(suggestions: List[Tuple[str, str, str]]) -> str:
+    lines = [f"- {construct} `{name}` ({qualified})" for construct, name, qualified in suggestions]
+    return "Similar entities in the codebase:\n" + "\n".join(lines)
@@ -1,4 +1,5 @@
-import sqlite3
+from verl_utils.tool.db_pool import get_connection_pool
+from verl_utils.tool.name_search import lookup_entity
 
 MAX_RESPONSE_LEN: int = 16000
 
@@ -51,19 +52,11 @@ class SearchTool():
 
     def _search_function(self, entity) -> str:
         """Search for a function in the ckg database."""
-        db_connection = sqlite3.connect(self.db_path)
-        entries = db_connection.execute(
-            """
-            SELECT file_path, start_line, end_line, body FROM functions WHERE name = ?
-            """,
-            (entity,),
-        ).fetchall()
+        with get_connection_pool().connection(self.db_path) as db_connection:
+            entries, not_found = lookup_entity(db_connection, "function", entity)
 
-        if len(entries) == 0:
-            msg = f"No function named `{entity}` found."
-            if '.' in entity:
-                return f"{msg} Please use **simple name** rather than full qualified name."
-            return f"{msg} Maybe you are looking for a class method or a class?"
+        if not_found:
+            return not_found
 
         output = ""
         for entry in entries:
@@ -79,19 +72,11 @@ class SearchTool():
 
     def _search_class(self, entity) -> str:
         """Search for a class in the ckg database."""
-        db_connection = sqlite3.connect(self.db_path)
-        entries = db_connection.execute(
-            """
-            SELECT file_path, start_line, end_line, fields, methods, body FROM classes WHERE name = ?
-            """,
-            (entity,),
-        ).fetchall()
+        with get_connection_pool().connection(self.db_path) as db_connection:
+            entries, not_found = lookup_entity(db_connection, "class", entity)
 
-        if len(entries) == 0:
-            msg = f"No class named `{entity}` found."
-            if '.' in entity:
-                return f"{msg} Please use **simple name** rather than full qualified name."
-            return f"{msg} Maybe you are looking for a function or a class method?"
+        if not_found:
+            return not_found
 
         output = ""
         for entry in entries:
@@ -111,19 +96,11 @@ class SearchTool():
 
     def _search_class_method(self, entity) -> str:
         """Search for a class method in the ckg database."""
-        db_connection = sqlite3.connect(self.db_path)
-        entries = db_connection.execute(
-            """
-            SELECT file_path, start_line, end_line, body, class_name FROM class_methods WHERE name = ?
-            """,
-            (entity,),
-        ).fetchall()
+        with get_connection_pool().connection(self.db_path) as db_connection:
+            entries, not_found = lookup_entity(db_connection, "class_method", entity)
 
-        if len(entries) == 0:
-            msg = f"No class method named `{entity}` found."
-            if '.' in entity:
-                return f"{msg} Please use **simple name** rather than full qualified name."
-            return f"{msg} Maybe you are looking for a function or a class?"
+        if not_found:
+            return not_found
 
         output = ""
         for entry in entries:
@@ -144,13 +121,13 @@ class SearchTool():
         else:
             directory_path = '.'
         
-        db_connection = sqlite3.connect(self.db_path)
-        entries = db_connection.execute(
-            """
-            SELECT path, files FROM directories WHERE path = ?
-            """,
-            (directory_path,),
-        ).fetchall()
+        with get_connection_pool().connection(self.db_path) as db_connection:
+            entries = db_connection.execute(
+                """
+                SELECT path, files FROM directories WHERE path = ?
+                """,
+                (directory_path,),
+            ).fetchall()
 
         if len(entries) == 0:
             msg = f"No directory named `{directory_path}` found."
@@ -168,13 +145,13 @@ class SearchTool():
 
     def _search_file(self, entity) -> str:
         """Search for a file in the ckg database."""
-        db_connection = sqlite3.connect(self.db_path)
-        entries = db_connection.execute(
-            """
-            SELECT path, entities FROM files WHERE path = ?
-            """,
-            (entity,),
-        ).fetchall()
+        with get_connection_pool().connection(self.db_path) as db_connection:
+            entries = db_connection.execute(
+                """
+                SELECT path, entities FROM files WHERE path = ?
+                """,
+                (entity,),
+            ).fetchall()
 
         if len(entries) == 0:
             msg = f"No file named `{entity}` found."
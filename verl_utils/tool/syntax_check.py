@@ -0,0 +1,73 @@
+import ast
+import atexit
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+from typing import List, Optional
+
+EDIT_LINT_OPTIONS: List[str] = ["--disable=all", "--enable=E0001"]
+EDIT_LINT_WORKERS: int = 2
+EDIT_LINT_TIMEOUT: float = 60.0
+
+
+def check_syntax(source: str, file_name: str) -> Optional[str]:
+    """
+    Parse `source` in-process, the way pylint/astroid does, and return a pylint style E0001
+    report for `file_name` if it does not parse, else None.
+    """
+    module_name = os.path.splitext(os.path.basename(file_name))[0]
+    try:
+        ast.parse(source + "\n", filename=module_name)
+        return None
+    except SyntaxError as e:
+        lineno, offset, error = e.lineno or 0, e.offset or 0, str(e)
+    except ValueError as e: # null bytes on older Python versions
+        lineno, offset, error = 1, 0, f"{e} ({module_name}, line 1)"
+    return (
+        f"************* Module {module_name}\n"
+        f"{file_name}:{lineno}:{offset}: E0001: Parsing failed: '{error}' (syntax-error)\n"
+    )
+
+
+def _pylint_worker(path: str, options: List[str]) -> str:
+    from pylint.lint import Run
+    from pylint.reporters.text import TextReporter
+
+    output = StringIO()
+    Run([path, *options], reporter=TextReporter(output), exit=False)
+    return output.getvalue()
+
+
+_lint_pool = None
+
+def lint_file(path: str, options: Optional[List[str]] = None) -> str:
+    """Run pylint on `path` in a persistent worker process, so pylint is imported only once."""
+    global _lint_pool
+    if _lint_pool is None:
+        _lint_pool = ProcessPoolExecutor(EDIT_LINT_WORKERS)
+        atexit.register(_lint_pool.shutdown, wait=False, cancel_futures=True)
+    future = _lint_pool.submit(_pylint_worker, path, options or EDIT_LINT_OPTIONS)
+    return future.result(timeout=EDIT_LINT_TIMEOUT)
+
+
+def lint_edit(workspace_path: str, short_path: str, path: str, content: str, full_lint: bool = False) -> str:
+    """
+    The error report of the edited `content` of `path` (`short_path` in the workspace), or "" if it
+    has no syntax errors and, with `full_lint`, no pylint errors. Pylint runs on a temporary copy
+    in `workspace_path`, so the file is only written once the edit is accepted.
+    """
+    syntax_error = check_syntax(content, short_path)
+    if syntax_error or not full_lint:
+        return syntax_error or ""
+    original_file_name = os.path.basename(path)
+    with tempfile.NamedTemporaryFile(mode='w', delete=True, prefix=original_file_name, suffix='.py', dir=workspace_path) as temp:
+        temp.write(content)
+        temp.flush()
+        try:
+            result = lint_file(temp.name)
+        except Exception as e:
+            print(f"Pylint failed on {short_path}: {str(e)}")
+            return ""
+    return result if re.search(r": E\d{4}: ", result) else ""
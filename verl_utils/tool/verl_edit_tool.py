@@ -1,13 +1,12 @@
 import asyncio
 import os
-import subprocess
-import tempfile
 from pathlib import Path
 from typing import Any, Dict, Optional, Tuple
 
 from verl.tools.base_tool import BaseTool
 from verl.tools.schemas import OpenAIFunctionToolSchema
-from verl_utils.data.envs.WS import WorkSpace
+from verl_utils.data.envs.WS import WorkSpace, get_workspace_pool
+from verl_utils.tool.syntax_check import lint_edit
 
 SNIPPET_LINES: int = 4
 MAX_RESPONSE_LEN: int = 16000
@@ -24,13 +23,16 @@ class EditTool(BaseTool):
         
         if not os.path.exists(self.temp_dir):
             os.makedirs(self.temp_dir, exist_ok=True)
+        self.workspace_pool = get_workspace_pool(self.temp_dir)
+        # Run pylint on top of the in-process syntax check
+        self.full_lint = self.config.get("full_lint", False)
 
 
     async def create(self, instance_id: str, id: str, sha: str, **kwargs) -> str:
         if await self.workspace_manager.get(instance_id):
             await self.release(instance_id)
 
-        workspace = WorkSpace(self.root_dir, self.temp_dir, id)
+        workspace = WorkSpace(self.root_dir, self.temp_dir, id, pool=self.workspace_pool, track_edits=True)
 
         await self.workspace_manager.register(instance_id, workspace)
 
@@ -62,7 +64,7 @@ class EditTool(BaseTool):
 
         response = await asyncio.to_thread(
             self._blocking_execute,
-            workspace.path,
+            workspace,
             path,
             start_line,
             end_line,
@@ -80,7 +82,8 @@ class EditTool(BaseTool):
             await asyncio.to_thread(workspace.del_ws)
         await super().release(instance_id, **kwargs)
 
-    def _blocking_execute(self, workspace_path: str, path: str, start_line: str, end_line: str, new_str: str) -> str:
+    def _blocking_execute(self, workspace: WorkSpace, path: str, start_line: str, end_line: str, new_str: str) -> str:
+        workspace_path = workspace.path
         # get absolute path from relative path
         short_path = path
         full_path_obj = Path(workspace_path) / path
@@ -145,22 +148,15 @@ class EditTool(BaseTool):
 
         # Check for linter errors before writing
         if path.endswith('.py'):
-            original_file_name = os.path.basename(path)
-            with tempfile.NamedTemporaryFile(mode='w', delete=True, prefix=original_file_name, suffix='.py', dir=workspace_path) as temp:
-                temp.write(new_file_content)
-                temp.flush()
-                
-                command_options = f"pylint {temp.name} --disable=all --enable=E0001"
-                result = subprocess.run(command_options, shell=True, capture_output=True, text=True)
-                
-                if 'E0001' in result.stdout or 'E0001' in result.stderr:
-                    error_msg = f"No edit was performed. This is because your edit would introduce syntax errors in {short_path}.\n"
-                    error_msg += f"Specifically, this is a snapshot of your intended edit (lines {start_line}-{end_line} edited):\n{snippet}\n"
-                    error_msg += f"However, Pylint finds the following syntax errors:\n{result.stdout + result.stderr}\n"
-                    error_msg += "Thus, your edit has been aborted. Please fix these errors and retry."
-                    return error_msg
-
-        self._write_file(path, new_file_content)
+            lint_output = lint_edit(workspace_path, short_path, path, new_file_content, self.full_lint)
+            if lint_output:
+                error_msg = f"No edit was performed. This is because your edit would introduce syntax errors in {short_path}.\n"
+                error_msg += f"Specifically, this is a snapshot of your intended edit (lines {start_line}-{end_line} edited):\n{snippet}\n"
+                error_msg += f"However, Pylint finds the following syntax errors:\n{lint_output}\n"
+                error_msg += "Thus, your edit has been aborted. Please fix these errors and retry."
+                return error_msg
+
+        self._write_file(workspace, path, new_file_content)
         
         if len(snippet) > MAX_RESPONSE_LEN:
             snippet = snippet[:MAX_RESPONSE_LEN] + "\n<response clipped>"
@@ -179,9 +175,9 @@ class EditTool(BaseTool):
             print(f"Error reading file {path}: {str(e)}")
             return ""
 
-    def _write_file(self, path: str, content: str) -> None:
+    def _write_file(self, workspace: WorkSpace, path: str, content: str) -> None:
         """Writes content to a file."""
         try:
-            Path(path).write_text(content)
+            workspace.edit_file(path, content)
         except Exception as e:
             print(f"Error writing to file {path}: {str(e)}")
\ No newline at end of file
@@ -4,6 +4,8 @@ from typing import Any, Dict, Optional, Tuple
 
 from verl.tools.base_tool import BaseTool
 from verl.tools.schemas import OpenAIFunctionToolSchema
+from verl_utils.tool.db_pool import get_connection_pool
+from verl_utils.tool.name_search import lookup_entity
 
 MAX_RESPONSE_LEN: int = 16000
 
@@ -68,7 +70,7 @@ class SearchTool(BaseTool):
             return "`entity` argument is empty. Please ensure the function calling format is valid."
         
         try:
-            with sqlite3.connect(db_path) as db_connection:
+            with get_connection_pool().connection(db_path) as db_connection:
                 match construct:
                     case "directory":
                         return self._search_directory(db_connection, entity)
@@ -100,14 +102,9 @@ class SearchTool(BaseTool):
         return '\n'.join(numbered_lines)
 
     def _search_function(self, db_connection: sqlite3.Connection, entity: str) -> str:
-        entries = db_connection.execute(
-            "SELECT file_path, start_line, end_line, body FROM functions WHERE name = ?", (entity,)
-        ).fetchall()
-        if not entries:
-            msg = f"No function named `{entity}` found."
-            if '.' in entity:
-                return f"{msg} Please use **simple name** rather than full qualified name."
-            return f"{msg} Maybe you are looking for a class method or a class?"
+        entries, not_found = lookup_entity(db_connection, "function", entity)
+        if not_found:
+            return not_found
         output = ""
         for entry in entries:
             file_path, start_line, end_line, body = entry
@@ -119,14 +116,9 @@ class SearchTool(BaseTool):
         return output
 
     def _search_class(self, db_connection: sqlite3.Connection, entity: str) -> str:
-        entries = db_connection.execute(
-            "SELECT file_path, start_line, end_line, fields, methods, body FROM classes WHERE name = ?", (entity,)
-        ).fetchall()
-        if not entries:
-            msg = f"No class named `{entity}` found."
-            if '.' in entity:
-                return f"{msg} Please use **simple name** rather than full qualified name."
-            return f"{msg} Maybe you are looking for a function or a class method?"
+        entries, not_found = lookup_entity(db_connection, "class", entity)
+        if not_found:
+            return not_found
         output = ""
         for entry in entries:
             file_path, start_line, end_line, fields, methods, body = entry
@@ -141,14 +133,9 @@ class SearchTool(BaseTool):
         return output
 
     def _search_class_method(self, db_connection: sqlite3.Connection, entity: str) -> str:
-        entries = db_connection.execute(
-            "SELECT file_path, start_line, end_line, body, class_name FROM class_methods WHERE name = ?", (entity,)
-        ).fetchall()
-        if not entries:
-            msg = f"No class method named `{entity}` found."
-            if '.' in entity:
-                return f"{msg} Please use **simple name** rather than full qualified name."
-            return f"{msg} Maybe you are looking for a function or a class?"
+        entries, not_found = lookup_entity(db_connection, "class_method", entity)
+        if not_found:
+            return not_found
         output = ""
         for entry in entries:
             file_path, start_line, end_line, body, class_name = entry